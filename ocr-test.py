@@ -2,12 +2,14 @@ import os
 import re
 import cv2
 import numpy as np
-import pytesseract
+import ocr_tesseract
 import ttkbootstrap as ttk
 from tkinter import Label, Frame, filedialog, messagebox, Text
 from tkinterdnd2 import TkinterDnD, DND_FILES
 from PIL import Image, ImageEnhance
-from pdf2image import convert_from_path
+from ocr_qr import ocr_con_qr, datos_con_qr
+from ocr_trabajos import ColaTrabajos, VistaLote, imagenes_de_archivo
+from ocr_visual import DPI_HUELLA, DetectorRepetidas
 
 # Configuración de rutas
 base_directory = os.path.dirname(os.path.abspath(__file__))
@@ -19,24 +21,31 @@ if not os.path.exists(output_folder):
 # Mejorar calidad de imagen
 
 # Deskew usando Tesseract OSD
+# Todas las paginas de un escaneo suelen tener la misma orientacion: OSD corre una
+# vez por documento, sobre una miniatura, y solo se repite si el OCR de una pagina
+# sale con confianza muy baja (pagina girada distinto al resto).
 
-def deskew_with_tesseract(image: Image.Image) -> Image.Image:
-    try:
-        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
-        angle = osd.get("rotate", 0)
-
-        if angle != 0:
-            return image.rotate(-angle, expand=True)
+ANCHO_OSD = 1250     # px; ~150 DPI sobre A4 alcanza para OSD
+CONF_MINIMA = 40     # confianza media de palabras por debajo de la cual se revisa la orientacion
 
+def detectar_orientacion(image: Image.Image, completa=False) -> int:
+    """Grados que informa OSD para la pagina, medidos sobre una miniatura (o la pagina completa)."""
+    factor = 1 if completa else round(image.width / ANCHO_OSD)
+    miniatura = image.reduce(factor) if factor > 1 else image
+    try:
+        return ocr_tesseract.image_to_osd(miniatura).get("rotate", 0)
     except Exception:
-        pass  # Si OSD falla, seguimos sin deskew
+        return 0  # Si OSD falla, seguimos sin deskew
 
+def deskew_with_tesseract(image: Image.Image, angle=0) -> Image.Image:
+    if angle != 0:
+        return image.rotate(-angle, expand=True)
     return image
 
 
-def preprocess_image(image):
-    # 1. Deskew
-    image = deskew_with_tesseract(image)
+def preprocess_image(image, angle=0):
+    # 1. Deskew (orientacion ya detectada para el documento)
+    image = deskew_with_tesseract(image, angle)
 
     # 2. Grayscale
     gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
@@ -134,73 +143,93 @@ def extraer_datos_factura(texto):
 
     return datos
 
-def procesar_y_guardar(file_path, text_completo, suffix=""):
-    """Genera el .txt con los datos extraídos arriba para fácil copiado."""
-    file_name = os.path.splitext(os.path.basename(file_path))[0]
-    info = extraer_datos_factura(text_completo)
-    
-    output_path = os.path.join(output_folder, f"{file_name}{suffix}.txt")
-    
-    contenido = "=== DATOS EXTRAÍDOS (COPIAR AQUÍ) ===\n"
-    for campo, valor in info.items():
-        contenido += f"{campo}: {valor}\n"
-    contenido += "="*40 + "\n\n"
-    contenido += "--- TEXTO COMPLETO DEL OCR ---\n"
-    contenido += text_completo
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(contenido)
-
 # --- Funciones de procesamiento de archivos ---
 
-def extract_text_from_png(png_path):
-    image = Image.open(png_path)
-    enhanced = preprocess_image(image)
-    text = pytesseract.image_to_string(enhanced)
-    procesar_y_guardar(png_path, text)
-    show_success_message(png_path)
+def ocr_y_extraccion(image, angle=0):
+    """El QR AFIP se lee antes de preprocesar; Tesseract de pagina completa solo si no hay QR.
 
-def extract_text_from_pdf(pdf_path):
-    pages = convert_from_path(pdf_path, 300)
-    progress_bar["maximum"] = len(pages)
-    
-    for i, page in enumerate(pages):
-        enhanced = preprocess_image(page)
-        text = pytesseract.image_to_string(enhanced)
-        suffix = f"_pag_{i+1}" if len(pages) > 1 else ""
-        procesar_y_guardar(pdf_path, text, suffix)
-        
-        progress_bar["value"] = i + 1
-        root.update_idletasks()
-        
-    show_success_message(pdf_path)
+    Devuelve (texto, datos, confiable): no confiable si el OCR salio con confianza muy baja.
+    """
+    text, palabras, qr = ocr_con_qr(image, lambda img: ocr_tesseract.reconocer(preprocess_image(img, angle)))
+    info = datos_con_qr(qr, text, extraer_datos_factura) if qr else None
+    confianzas = [conf for *_, conf in palabras if conf >= 0]
+    if confianzas:
+        confiable = sum(confianzas) / len(confianzas) >= CONF_MINIMA
+    else:
+        confiable = qr is not None
+    return text, info, confiable
+
+def huella(image: Image.Image) -> np.ndarray:
+    """Pagina en grises a ~DPI_HUELLA para compararla con las anteriores (paginas a 300 DPI)."""
+    factor = round(300 / DPI_HUELLA)
+    return np.asarray(image.convert("L").reduce(factor))
+
+def ocr_documento(paginas):
+    """Genera (texto, datos) por pagina detectando la orientacion una sola vez por documento.
+
+    Las paginas en blanco y las copias (DUPLICADO, TRIPLICADO) de una pagina
+    anterior no se OCRean: la copia repite el texto y los datos de la original.
+    """
+    angle = None
+    detector = DetectorRepetidas()
+    resultados = {}
+    for i, page in enumerate(paginas):
+        repetida = detector.revisar(i, huella(page))
+        if repetida:
+            motivo, original = repetida
+            if motivo == "blanca":
+                yield "", {**extraer_datos_factura(""), "Pagina en blanco": "Si"}
+            else:
+                text, info = resultados[original]
+                yield text, {**(info or extraer_datos_factura(text)), "Copia de": f"Pagina {original + 1}"}
+            continue
+        if angle is None:
+            angle = detectar_orientacion(page)
+        text, info, confiable = ocr_y_extraccion(page, angle)
+        if not confiable:
+            # Confianza desplomada: puede ser una pagina girada distinto, se revisa completa
+            nuevo = detectar_orientacion(page, completa=True)
+            if nuevo != angle:
+                angle = nuevo
+                text, info, _ = ocr_y_extraccion(page, angle)
+        resultados[i] = (text, info)
+        yield text, info
+
+def procesar_archivo(path):
+    """(total, paginas) del archivo para la cola de trabajos: el OCR corre fuera del hilo de Tk."""
+    total, imagenes = imagenes_de_archivo(path, 300)
+    return total, paginas_ocr(imagenes)
+
+def paginas_ocr(imagenes):
+    # Las paginas se renderizan de a una mientras se OCRea la anterior
+    for i, (text, info) in enumerate(ocr_documento(page for _, page in imagenes)):
+        yield i, text, info or extraer_datos_factura(text)
 
 # --- Interfaz Gráfica (Mantenida y adaptada) ---
 
-def on_drop(event):
-    path = event.data.strip('{}')
-    if path.lower().endswith('.pdf'): extract_text_from_pdf(path)
-    elif path.lower().endswith(('.png', '.jpg', '.jpeg')): extract_text_from_png(path)
-
-def show_success_message(file_path):
-    res = messagebox.askyesno("Proceso Exitoso", f"Se extrajeron los datos de:\n{os.path.basename(file_path)}\n\n¿Abrir carpeta de salida?")
+def show_success_message(resumen):
+    res = messagebox.askyesno("Proceso Exitoso", f"{resumen}\n\n¿Abrir carpeta de salida?")
     if res: os.startfile(output_folder)
 
+# El OCR corre en hilos de fondo: la ventana responde y se puede cancelar el lote
+trabajos = ColaTrabajos(procesar=procesar_archivo)
+
 root = TkinterDnD.Tk()
 root.title("DatacenterTDF | Extractor Inteligente")
-root.geometry("550x400")
+root.geometry("550x480")
 style = ttk.Style("superhero")
 
 Label(root, text="Arrastre Facturas (PDF/PNG) aquí", font=("Segoe UI", 14), bg="#343a40", fg="white").pack(pady=20)
 
 btn_frame = Frame(root, bg="#343a40")
 btn_frame.pack(pady=10)
-ttk.Button(btn_frame, text="Cargar PDFs", command=lambda: [extract_text_from_pdf(p) for p in filedialog.askopenfilenames(filetypes=[("PDF", "*.pdf")])]).grid(row=0, column=0, padx=5)
+ttk.Button(btn_frame, text="Cargar PDFs", command=lambda: vista.encolar(filedialog.askopenfilenames(filetypes=[("PDF", "*.pdf")]))).grid(row=0, column=0, padx=5)
 ttk.Button(btn_frame, text="Abrir Salida", command=lambda: os.startfile(output_folder)).grid(row=0, column=1, padx=5)
+ttk.Button(btn_frame, text="Cancelar", bootstyle="danger", command=trabajos.cancelar).grid(row=0, column=2, padx=5)
 
-progress_bar = ttk.Progressbar(root, length=400, mode='determinate')
-progress_bar.pack(pady=20)
+# Barra de progreso, estado y avance por archivo; cada pagina se guarda con guardar_resultado
+vista = VistaLote(root, trabajos, output_folder, al_terminar=show_success_message, alto_tabla=6)
 
 root.drop_target_register(DND_FILES)
-root.dnd_bind('<<Drop>>', on_drop)
-root.mainloop()
\ No newline at end of file
+root.dnd_bind('<<Drop>>', vista.encolar_soltados)
+root.mainloop()
@@ -0,0 +1,137 @@
+"""Procesamiento por lotes sin interfaz grafica.
+
+Uso:
+    python ocr_batch.py facturas/ "entrada/**/*.pdf" remito.pdf --motor tesseract --workers 8
+
+Corre el mismo pipeline que las ventanas (render, preprocesado, OCR y extraccion)
+y escribe los mismos .txt en la carpeta de salida. No importa Tk.
+
+Con --reextraer no se OCRea nada: se vuelven a correr solo las reglas de
+extraccion sobre todos los artefactos de OCR archivados en la cache, por
+ejemplo despues de corregir un regex en ocr_extraccion.py. Las paginas que
+se desalojaron por OCR_CACHE_MB no estan: hay que volver a procesarlas.
+"""
+import argparse
+import os
+import sys
+import time
+import ocr_tesseract
+from ocr_cache import CacheResultados
+from ocr_extraccion import EXTRACTORES
+from ocr_paralelo import WORKERS, expandir_entradas, procesar_en_paralelo, tareas_de_archivos
+from ocr_pipeline import (MOTORES, extraer_datos, guardar_resultado, plantilla_de, texto_de, usa_qr,
+                          version_ocr, version_pipeline)
+from ocr_plantillas import PLANTILLAS
+
+# Los motores neuronales cargan el modelo en cada worker: por defecto uno solo
+MOTORES_PESADOS = {"paddle", "trocr"}
+
+base_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def reextraer(cache, extractor, dpi, motor, salida, plantilla=None):
+    """Re-corre la extraccion sobre el archivo de artefactos y reescribe las salidas."""
+    version_art = version_ocr(dpi, motor, usa_qr(extractor, motor), plantilla_de(extractor, plantilla))
+    version = version_pipeline(extractor, dpi, motor, plantilla)
+    total = 0
+    for huella, pagina, ruta, paginas, artefacto in cache.iterar_artefactos(version_art):
+        datos = extraer_datos(artefacto, extractor)
+        cache.guardar(huella, pagina, version, texto_de(artefacto), datos)
+        suffix = f"_pag_{pagina+1}" if paginas > 1 else ""
+        guardar_resultado(ruta, texto_de(artefacto), datos, salida, suffix)
+        total += 1
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extractor OCR por lotes (sin interfaz).")
+    parser.add_argument("entradas", nargs="*", help="Carpetas, patrones glob o archivos PDF/PNG/JPG")
+    parser.add_argument("--motor", choices=sorted(MOTORES), default="tesseract",
+                        help="tesseract, texto (solo capa de texto PDF), paddle o trocr")
+    parser.add_argument("--extractor", choices=sorted(EXTRACTORES) + ["auto"], default="factura",
+                        help="auto: clasifica cada pagina y usa el extractor y la plantilla de su tipo")
+    parser.add_argument("--plantilla", choices=sorted(PLANTILLAS),
+                        help="OCRear solo las regiones de este tipo de documento (solo tesseract)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help=f"Procesos en paralelo (por defecto {WORKERS}; 1 para paddle/trocr)")
+    parser.add_argument("--dpi", type=int, default=300,
+                        help="Con tesseract los escaneos se OCRean a 200 DPI y solo los campos que faltan "
+                             "o no validan a max(400, dpi); OCR_DPI_ADAPTATIVO=0 usa este DPI para todo")
+    parser.add_argument("--modo", choices=sorted(ocr_tesseract.MODOS), default=ocr_tesseract.MODO,
+                        help="Modelos de Tesseract: fast (tessdata_fast, por defecto) o best (tessdata_best, "
+                             "mas lento y preciso); carpetas en OCR_TESSDATA_FAST / OCR_TESSDATA_BEST")
+    parser.add_argument("--salida", default=os.path.join(base_directory, "output"))
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="No usar ni actualizar la cache de resultados (ni los layouts aprendidos por emisor)")
+    parser.add_argument("--reextraer", action="store_true",
+                        help="Solo re-extraer campos de todas las paginas ya OCReadas (sin OCR)")
+    args = parser.parse_args(argv)
+    # Antes de crear el pool: los workers heredan el modo
+    ocr_tesseract.elegir_modo(args.modo)
+
+    if args.reextraer:
+        os.makedirs(args.salida, exist_ok=True)
+        inicio = time.perf_counter()
+        total = reextraer(CacheResultados(), args.extractor, args.dpi, args.motor, args.salida, args.plantilla)
+        duracion = time.perf_counter() - inicio
+        print(f"{total} paginas re-extraidas en {duracion:.1f} s")
+        return 0
+    if not args.entradas:
+        parser.error("indicar al menos una entrada (o --reextraer)")
+
+    rutas = expandir_entradas(args.entradas)
+    if not rutas:
+        print("No se encontraron archivos PDF/PNG/JPG en las entradas indicadas.", file=sys.stderr)
+        return 1
+    os.makedirs(args.salida, exist_ok=True)
+    workers = args.workers or (1 if args.motor in MOTORES_PESADOS else WORKERS)
+
+    inicio = time.perf_counter()
+    # Un archivo ilegible (PDF danado, sin permisos) se informa y no corta el lote
+    errores = 0
+    tareas = []
+    for ruta in rutas:
+        try:
+            tareas.extend(tareas_de_archivos([ruta]))
+        except Exception as exc:
+            errores += 1
+            print(f"{os.path.basename(ruta)}: {exc}", file=sys.stderr)
+    paginas_por_archivo = {}
+    for ruta, _ in tareas:
+        paginas_por_archivo[ruta] = paginas_por_archivo.get(ruta, 0) + 1
+
+    repetidas = 0
+    cache = None if args.sin_cache else CacheResultados()
+    resultados = procesar_en_paralelo(tareas, args.extractor, args.dpi, workers, args.motor, cache,
+                                      args.plantilla, tolerar_errores=True)
+    for numero, (ruta, indice, texto, datos) in enumerate(resultados, 1):
+        suffix = f"_pag_{indice+1}" if paginas_por_archivo[ruta] > 1 else ""
+        nombre = os.path.basename(ruta) + (f" (pág. {indice+1})" if suffix else "")
+        if texto is None:
+            # Pagina que fallo: en lugar de los datos viene la excepcion
+            errores += 1
+            print(f"[{numero}/{len(tareas)}] {nombre}: {datos}", file=sys.stderr)
+            continue
+        try:
+            guardar_resultado(ruta, texto, datos, args.salida, suffix)
+        except OSError as exc:
+            errores += 1
+            print(f"[{numero}/{len(tareas)}] {nombre}: {exc}", file=sys.stderr)
+            continue
+        if "Copia de" in datos or "Pagina en blanco" in datos:
+            repetidas += 1
+            nombre += " (copia, sin OCR)" if "Copia de" in datos else " (en blanco, sin OCR)"
+        print(f"[{numero}/{len(tareas)}] {nombre}")
+
+    duracion = time.perf_counter() - inicio
+    print(f"\n{len(rutas)} archivos, {len(tareas)} paginas en {duracion:.1f} s "
+          f"({len(tareas) / duracion:.2f} paginas/s, {workers} workers, motor {args.motor})")
+    if repetidas:
+        print(f"{repetidas} paginas en blanco o copias de otra no se OCRearon")
+    if errores:
+        print(f"{errores} archivos o paginas con error (ver arriba)", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
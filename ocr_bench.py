@@ -0,0 +1,634 @@
+"""Mediciones de rendimiento del pipeline OCR.
+
+Uso:
+    python ocr_bench.py deskew [facturas/] [--todas] [--angulos -3,-1.2,0.7,2.5]
+    python ocr_bench.py render [facturas/] [--todas]
+    python ocr_bench.py visual [facturas/] [--todas]
+    python ocr_bench.py mosaico [facturas/] [--todas] [--plantilla factura]
+    python ocr_bench.py trocr [facturas/] [--lotes 1,8,16] [--hilos 4] [--int8 | --onnx]
+    python ocr_bench.py onnx [facturas/] [--motores trocr,paddle] [--tolerancia 0.02]
+    python ocr_bench.py arranque [scripts...] [--limite 1500]
+    python ocr_bench.py emisores [facturas/]
+
+deskew: compara el deskew actual (perfil de proyeccion sobre copia reducida)
+con el anterior (minAreaRect sobre todos los pixeles de tinta) en tiempo,
+memoria pico y error sobre las muestras rotadas un angulo conocido.
+
+render: render + preprocesado hasta la entrada de Tesseract, por el camino
+RGB/PIL anterior y por el Pixmap en grises envuelto como array.
+
+visual: clasificacion visual (miniatura + dHash + ORB) de cada muestra contra
+un indice armado con las demas (la muestra queda fuera), y de copias
+corridas/escaladas con ruido. El tipo esperado sale del nombre del archivo; si
+no queda otra referencia con la misma plantilla y extractor, lo correcto es no
+reconocerla. Informa aciertos, paginas sin reconocer (van al OCR del
+encabezado), confusiones de tipo, error de la alineacion y tiempos.
+
+mosaico: OCR de las regiones de bloque de una plantilla de a una contra todas
+juntas en un mosaico (de la pagina y de todas las paginas a la vez); informa
+tiempos y cuantas palabras coinciden. Necesita Tesseract.
+
+trocr: lineas por segundo de TrOCR en CPU con cada tamano de tanda (y con
+cuantizacion int8), sobre las lineas segmentadas de las muestras, para
+dimensionar los servidores. Necesita torch y transformers (y con --onnx,
+onnxruntime y optimum).
+
+onnx: chequeo de regresion del backend ONNX Runtime (ocr_onnx) contra el
+original de cada motor neuronal: sobre cada pagina, distancia entre los textos
+(1 - similitud por caracteres) y tiempos. Sale con error si alguna pagina pasa
+la tolerancia.
+
+arranque: tiempo de los imports de nivel superior de cada ventana y de
+ocr_batch (lo que corre antes de mostrar la ventana), cada uno en un proceso
+nuevo. Sale con error si algun script importa un motor pesado (torch,
+transformers, paddle, onnxruntime), crea un modelo al importarse o pasa el limite.
+
+emisores: chequeo de los layouts por emisor sobre una cache temporal. Cada
+factura OCReada entera (o con capa de texto) con CUIT Remitente valido tiene que
+dejar ("guardar", cuit, layout) en artefacto["emisores_pendientes"]; sale con
+error si alguna no lo deja. Las paginas que no se pueden OCRear se saltean.
+"""
+import argparse
+import ast
+import difflib
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from PIL import Image
+from ocr_paralelo import expandir_entradas
+from ocr_pipeline import estimar_inclinacion, preprocess_image
+from ocr_clasificador import TIPO_DESCONOCIDO, TIPOS
+from ocr_plantillas import PLANTILLAS
+
+base_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def paginas_de_muestra(rutas, dpi=300, todas=False):
+    """Genera (nombre, imagen PIL RGB) de la primera pagina de cada archivo (o de todas)."""
+    import fitz  # PyMuPDF
+    from ocr_pdf import renderizar
+    for ruta in rutas:
+        nombre = os.path.basename(ruta)
+        if not ruta.lower().endswith(".pdf"):
+            yield nombre, Image.open(ruta).convert("RGB")
+            continue
+        with fitz.open(ruta) as doc:
+            for indice in range(len(doc) if todas else 1):
+                yield f"{nombre} p{indice+1}", renderizar(doc[indice], dpi)
+
+
+def medir(funcion, *args):
+    """(resultado, milisegundos, MB pico de memoria numpy/Python)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    ms = (time.perf_counter() - inicio) * 1000
+    pico = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return resultado, ms, pico
+
+
+# --- Deskew ---
+
+def inclinacion_min_area_rect(image):
+    """Angulo del deskew anterior (minAreaRect sobre la nube de puntos a resolucion completa)."""
+    cv_img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    gray = cv2.cvtColor(cv_img, cv2.COLOR_BGR2GRAY)
+    gray = cv2.bitwise_not(gray)
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    coords = np.column_stack(np.where(thresh > 0))
+    if len(coords) == 0:
+        return 0.0
+    angle = cv2.minAreaRect(coords)[-1]
+    return -(90 + angle) if angle < -45 else -angle
+
+
+def bench_deskew(args):
+    angulos = [float(a) for a in args.angulos.split(",")]
+    metodos = {"anterior": inclinacion_min_area_rect, "perfil": estimar_inclinacion}
+    tiempos = {m: [] for m in metodos}
+    picos = {m: [] for m in metodos}
+    errores = {m: [] for m in metodos}
+
+    print(f"{'pagina':40} {'metodo':9} {'ms':>7} {'MB':>7}  angulo base / error medio rotada")
+    for nombre, image in paginas_de_muestra(expandir_entradas(args.entradas), args.dpi, args.todas):
+        for metodo, funcion in metodos.items():
+            base, ms, pico = medir(funcion, image)
+            tiempos[metodo].append(ms)
+            picos[metodo].append(pico)
+            # Rotando la pagina un angulo conocido, la correccion esperada es base - angulo
+            errs = []
+            for angulo in angulos:
+                rotada = image.rotate(angulo, expand=True, resample=Image.BICUBIC, fillcolor=(255, 255, 255))
+                errs.append(abs(funcion(rotada) - (base - angulo)))
+            errores[metodo].extend(errs)
+            print(f"{nombre[:40]:40} {metodo:9} {ms:7.1f} {pico:7.1f}  {base:6.2f} / {np.mean(errs):.2f}")
+
+    if not tiempos["perfil"]:
+        print("No se encontraron archivos PDF/PNG/JPG en las entradas indicadas.", file=sys.stderr)
+        return 1
+    print()
+    for metodo in metodos:
+        errs = np.array(errores[metodo])
+        print(f"{metodo:9} mediana {np.median(tiempos[metodo]):7.1f} ms  pico {np.median(picos[metodo]):6.1f} MB  "
+              f"error medio {errs.mean():.2f}°  (<0.5°: {np.mean(errs < 0.5):.0%})")
+    return 0
+
+
+# --- Render y preprocesado ---
+
+def preproceso_rgb_anterior(page, dpi):
+    """Camino anterior: Pixmap RGB -> PIL -> numpy BGR -> gris (deskew) -> PIL rotada -> gris -> PIL."""
+    from ocr_pdf import renderizar
+    image = renderizar(page, dpi)
+    gray = cv2.cvtColor(cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR), cv2.COLOR_BGR2GRAY)
+    angle = estimar_inclinacion(gray)
+    if abs(angle) > 0.5:
+        image = image.rotate(angle, expand=True, resample=Image.BICUBIC, fillcolor=(255, 255, 255))
+    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    return Image.fromarray(cv2.medianBlur(binary, 3))
+
+
+def preproceso_gris(page, dpi):
+    from ocr_pdf import renderizar_gris
+    return preprocess_image(renderizar_gris(page, dpi))
+
+
+def bench_render(args):
+    import fitz  # PyMuPDF
+    metodos = {"rgb": preproceso_rgb_anterior, "gris": preproceso_gris}
+    tiempos = {m: [] for m in metodos}
+    picos = {m: [] for m in metodos}
+    print(f"{'pagina':40} {'metodo':7} {'ms':>7} {'MB':>7}")
+    for ruta in expandir_entradas(args.entradas):
+        if not ruta.lower().endswith(".pdf"):
+            continue
+        with fitz.open(ruta) as doc:
+            for indice in range(len(doc) if args.todas else 1):
+                nombre = f"{os.path.basename(ruta)} p{indice+1}"
+                for metodo, funcion in metodos.items():
+                    _, ms, pico = medir(funcion, doc[indice], args.dpi)
+                    tiempos[metodo].append(ms)
+                    picos[metodo].append(pico)
+                    print(f"{nombre[:40]:40} {metodo:7} {ms:7.1f} {pico:7.1f}")
+    if not tiempos["gris"]:
+        print("No se encontraron PDF en las entradas indicadas.", file=sys.stderr)
+        return 1
+    print()
+    for metodo in metodos:
+        print(f"{metodo:7} mediana {np.median(tiempos[metodo]):7.1f} ms  pico {np.median(picos[metodo]):6.1f} MB")
+    return 0
+
+
+# --- Clasificacion visual ---
+
+# Desplazamientos y escalas conocidos (escala, dx, dy relativos) aplicados a las miniaturas
+_PERTURBACIONES = [(1.0, 0.0, 0.0), (0.9, 0.05, 0.06), (1.08, -0.06, -0.015), (0.95, 0.02, -0.03)]
+
+
+def _indice_sin(referencias, excluir):
+    """IndiceVisual con las referencias de todos los archivos salvo los de `excluir`."""
+    from ocr_visual import IndiceVisual
+    partes = [indice for ruta, indice in referencias.items() if ruta not in excluir]
+    return IndiceVisual([t for i in partes for t in i.tipos], [f for i in partes for f in i.formas],
+                        np.concatenate([i.hashes for i in partes]), [p for i in partes for p in i.puntos],
+                        [d for i in partes for d in i.descriptores])
+
+
+def _tratamiento(tipo):
+    # Variantes con la misma plantilla y extractor: la visual no las distingue (ver refinar_tipo)
+    return TIPOS[tipo]["plantilla"], TIPOS[tipo]["extractor"]
+
+
+def bench_visual(args):
+    import hashlib
+    import fitz  # PyMuPDF
+    from ocr_pipeline import indice_visual, miniatura
+    from ocr_visual import IndiceVisual, tipo_por_nombre
+    _, ms_indice, _ = medir(indice_visual, "texto")
+    print(f"indice: {len(indice_visual('texto').tipos)} referencias, {ms_indice:.0f} ms (carga o construccion)\n")
+
+    def miniatura_archivo(ruta):
+        with fitz.open(ruta) as doc:
+            return miniatura(doc[0])
+
+    # Cada muestra se clasifica contra un indice armado con las demas (y sin sus
+    # duplicados): el tipo esperado es el del nombre del archivo
+    rutas = [r for r in expandir_entradas(args.entradas) if r.lower().endswith(".pdf")]
+    referencias, contenidos = {}, {}
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            contenidos[ruta] = hashlib.md5(f.read()).hexdigest()
+        referencias[ruta] = IndiceVisual.construir([ruta], miniatura_archivo, lambda _: TIPO_DESCONOCIDO)
+    rng = np.random.default_rng(0)
+    t_mini, t_clasif, errores, confusiones = [], [], [], []
+    aciertos = sin_reconocer = total = aciertos_mov = total_mov = 0
+    print(f"{'pagina':40} {'esperado':20} {'obtenido':20} {'mini ms':>7} {'clasif ms':>9}  perturbadas")
+    for ruta in rutas:
+        esperado = tipo_por_nombre(ruta)
+        if esperado not in TIPOS:
+            print(f"{os.path.basename(ruta)}: el nombre no indica un tipo conocido, se saltea", file=sys.stderr)
+            continue
+        indice = _indice_sin(referencias, {r for r in rutas if contenidos[r] == contenidos[ruta]})
+        # Sin otra referencia con el mismo tratamiento, lo correcto es no reconocerla
+        reconocible = any(_tratamiento(t) == _tratamiento(esperado) for t in indice.tipos)
+
+        def correcto(r):
+            return _tratamiento(r[0]) == _tratamiento(esperado) if r else not reconocible
+
+        with fitz.open(ruta) as doc:
+            for indice_pag in range(len(doc) if args.todas else 1):
+                nombre = f"{os.path.basename(ruta)} p{indice_pag+1}"
+                gray, ms_mini, _ = medir(miniatura, doc[indice_pag])
+                resultado, ms_clasif, _ = medir(indice.clasificar, gray)
+                t_mini.append(ms_mini)
+                t_clasif.append(ms_clasif)
+                total += 1
+                if correcto(resultado):
+                    aciertos += 1
+                elif resultado is None:
+                    sin_reconocer += 1
+                else:
+                    confusiones.append(f"{nombre}: {esperado} -> {resultado[0]}")
+                alto, ancho = gray.shape
+                reconocidas = 0
+                for escala, dx, dy in _PERTURBACIONES:
+                    matriz = np.float32([[escala, 0, dx * ancho], [0, escala, dy * alto]])
+                    movida = cv2.warpAffine(gray, matriz, (ancho, alto), borderValue=255)
+                    ruido = rng.integers(-20, 20, movida.shape)
+                    movida = np.clip(movida.astype(np.int16) + ruido, 0, 255).astype(np.uint8)
+                    r = indice.clasificar(movida)
+                    total_mov += 1
+                    if not correcto(r):
+                        continue
+                    aciertos_mov += 1
+                    reconocidas += 1
+                    if r and resultado and r[0] == resultado[0]:
+                        # Alineacion esperada = perturbacion compuesta con la de la pagina sin mover
+                        a = resultado[1]
+                        esperada = (escala * a.escala_x, escala * a.escala_y, escala * a.dx + dx, escala * a.dy + dy)
+                        errores.append(max(abs(x - e) for x, e in zip(r[1], esperada)))
+                obtenido = resultado[0] if resultado else "-"
+                print(f"{nombre[:40]:40} {esperado[:20]:20} {obtenido[:20]:20} {ms_mini:7.1f} {ms_clasif:9.1f}  "
+                      f"{reconocidas}/{len(_PERTURBACIONES)}")
+    if not t_clasif:
+        print("No se encontraron PDF en las entradas indicadas.", file=sys.stderr)
+        return 1
+    print(f"\nminiatura mediana {np.median(t_mini):.1f} ms  clasificacion mediana {np.median(t_clasif):.1f} ms")
+    print(f"paginas fuera del indice: bien {aciertos}/{total}, sin reconocer {sin_reconocer} "
+          f"(van al OCR del encabezado), confundidas {len(confusiones)}")
+    print(f"perturbadas bien {aciertos_mov}/{total_mov}  "
+          f"error max. de alineacion mediano {np.median(errores) if errores else 0:.4f} (relativo)")
+    for confusion in confusiones:
+        print(f"  {confusion}")
+    return 0
+
+
+# --- Mosaico de recortes ---
+
+def bench_mosaico(args):
+    import fitz  # PyMuPDF
+    import ocr_tesseract
+    from ocr_mosaico import reconocer_mosaico
+    from ocr_pdf import renderizar_gris
+    from ocr_pipeline import binarizar, deskew_fast
+    from ocr_plantillas import PSM_BLOQUE, recortar
+    regiones = [r for r in PLANTILLAS[args.plantilla]["regiones"] if r.psm == PSM_BLOQUE]
+    todos, t_uno, t_mosaico, coincidencias = [], [], [], []
+    print(f"{'pagina':40} {'recortes':>8} {'de a uno ms':>11} {'mosaico ms':>10}  palabras iguales")
+    for ruta in expandir_entradas(args.entradas):
+        if not ruta.lower().endswith(".pdf"):
+            continue
+        with fitz.open(ruta) as doc:
+            for indice in range(len(doc) if args.todas else 1):
+                nombre = f"{os.path.basename(ruta)} p{indice+1}"
+                gray = deskew_fast(np.ascontiguousarray(renderizar_gris(doc[indice], args.dpi)))
+                recortes = [binarizar(recortar(gray, r.caja)) for r in regiones]
+                todos.extend(recortes)
+                inicio = time.perf_counter()
+                solos = [ocr_tesseract.reconocer(recorte, psm=PSM_BLOQUE) for recorte in recortes]
+                ms_uno = (time.perf_counter() - inicio) * 1000
+                inicio = time.perf_counter()
+                juntos = reconocer_mosaico(recortes, lambda m: ocr_tesseract.reconocer(m, psm=PSM_BLOQUE))
+                ms_mosaico = (time.perf_counter() - inicio) * 1000
+                a = [p[4] for _, palabras in solos for p in palabras]
+                b = [p[4] for _, palabras in juntos for p in palabras]
+                iguales = difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() if a or b else 1.0
+                t_uno.append(ms_uno)
+                t_mosaico.append(ms_mosaico)
+                coincidencias.append(iguales)
+                print(f"{nombre[:40]:40} {len(recortes):8} {ms_uno:11.1f} {ms_mosaico:10.1f}  {iguales:.1%}")
+    if not t_uno:
+        print("No se encontraron PDF en las entradas indicadas.", file=sys.stderr)
+        return 1
+    print(f"\nde a uno mediana {np.median(t_uno):.1f} ms  mosaico mediana {np.median(t_mosaico):.1f} ms  "
+          f"palabras iguales {np.mean(coincidencias):.1%}")
+    # Todas las paginas en los mismos mosaicos
+    inicio = time.perf_counter()
+    reconocer_mosaico(todos, lambda m: ocr_tesseract.reconocer(m, psm=PSM_BLOQUE))
+    ms_todas = (time.perf_counter() - inicio) * 1000
+    print(f"todas las paginas juntas: {len(todos)} recortes en {ms_todas:.0f} ms "
+          f"(de a uno {sum(t_uno):.0f} ms)")
+    return 0
+
+
+# --- TrOCR por lineas ---
+
+def bench_trocr(args):
+    import fitz  # PyMuPDF
+    import ocr_motores
+    from ocr_pdf import renderizar
+    recortes = []
+    inicio = time.perf_counter()
+    for ruta in expandir_entradas(args.entradas):
+        if not ruta.lower().endswith(".pdf"):
+            continue
+        with fitz.open(ruta) as doc:
+            for indice in range(len(doc) if args.todas else 1):
+                rgb = np.asarray(renderizar(doc[indice], args.dpi))
+                gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+                lineas = ocr_motores.segmentar_lineas(gray)
+                recortes.extend(Image.fromarray(rgb[y0:y1, x0:x1]) for x0, y0, x1, y1 in lineas)
+    recortes = recortes[:args.max_lineas]
+    if not recortes:
+        print("No se encontraron lineas en las entradas indicadas.", file=sys.stderr)
+        return 1
+    print(f"{len(recortes)} lineas segmentadas en {time.perf_counter() - inicio:.1f} s\n")
+
+    ocr_motores.TROCR_HILOS = args.hilos
+    ocr_motores.TROCR_INT8 = args.int8
+    _, ms_carga, _ = medir(ocr_motores._cargar_trocr, args.onnx)
+    import torch
+    backend = "onnx" if args.onnx else "int8" if args.int8 else "pytorch"
+    if args.onnx:
+        from ocr_onnx import HILOS_ONNX as hilos
+    else:
+        hilos = torch.get_num_threads()
+    print(f"modelo {ocr_motores.TROCR_MODELO} ({backend}): {ms_carga / 1000:.1f} s de carga, {hilos} hilos\n")
+    # Calentamiento: la primera llamada reserva memoria y elige kernels
+    ocr_motores.trocr_lineas(recortes[:2], args.onnx)
+    print(f"{'tanda':>5} {'s':>7} {'lineas/s':>9}")
+    referencia = None
+    for lote in [int(n) for n in args.lotes.split(",")]:
+        ocr_motores.TROCR_LOTE = lote
+        inicio = time.perf_counter()
+        textos = [texto for texto, _ in ocr_motores.trocr_lineas(recortes, args.onnx)]
+        segundos = time.perf_counter() - inicio
+        # El relleno de cada tanda puede cambiar levemente el texto: lineas iguales a la primera medicion
+        referencia = referencia or textos
+        iguales = np.mean([a == b for a, b in zip(referencia, textos)])
+        print(f"{lote:5} {segundos:7.1f} {len(recortes) / segundos:9.1f}  (lineas iguales a la primera tanda: "
+              f"{iguales:.0%})")
+    return 0
+
+
+# --- Regresion ONNX Runtime ---
+
+def distancia_texto(a, b):
+    """1 - similitud por caracteres (0: iguales), sin contar espacios repetidos."""
+    a, b = " ".join(a.split()), " ".join(b.split())
+    return 1 - difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() if a or b else 0.0
+
+
+def bench_onnx(args):
+    import fitz  # PyMuPDF
+    import ocr_motores
+    from ocr_pdf import renderizar
+    motores = {"trocr": lambda image, onnx: ocr_motores.trocr_reconocer(image, onnx=onnx),
+               "paddle": lambda image, onnx: ocr_motores.paddle_reconocer(image, onnx=onnx)}
+    elegidos = args.motores.split(",")
+    paginas = []
+    for ruta in expandir_entradas(args.entradas):
+        if not ruta.lower().endswith(".pdf"):
+            continue
+        with fitz.open(ruta) as doc:
+            for indice in range(len(doc) if args.todas else 1):
+                paginas.append((f"{os.path.basename(ruta)} p{indice+1}", renderizar(doc[indice], args.dpi)))
+    if not paginas:
+        print("No se encontraron PDF en las entradas indicadas.", file=sys.stderr)
+        return 1
+    fuera = 0
+    for motor in elegidos:
+        reconocer = motores[motor]
+        # Carga y exportacion (la primera vez) fuera de la medicion
+        reconocer(paginas[0][1], onnx=False)
+        reconocer(paginas[0][1], onnx=True)
+        print(f"\n{motor}\n{'pagina':40} {'original ms':>11} {'onnx ms':>8}  distancia")
+        t_original, t_onnx, distancias = [], [], []
+        for nombre, image in paginas:
+            (texto, _), ms_original, _ = medir(reconocer, image, False)
+            (texto_onnx, _), ms_onnx, _ = medir(reconocer, image, True)
+            distancia = distancia_texto(texto, texto_onnx)
+            t_original.append(ms_original)
+            t_onnx.append(ms_onnx)
+            distancias.append(distancia)
+            marca = "  FUERA DE TOLERANCIA" if distancia > args.tolerancia else ""
+            fuera += distancia > args.tolerancia
+            print(f"{nombre[:40]:40} {ms_original:11.0f} {ms_onnx:8.0f}  {distancia:.3f}{marca}")
+        print(f"mediana original {np.median(t_original):.0f} ms  onnx {np.median(t_onnx):.0f} ms  "
+              f"distancia media {np.mean(distancias):.3f} max {np.max(distancias):.3f}")
+    if fuera:
+        print(f"\n{fuera} paginas con distancia mayor a {args.tolerancia}", file=sys.stderr)
+        return 1
+    return 0
+
+
+# --- Arranque ---
+
+SCRIPTS_ARRANQUE = ["ocr-test.py", "ocr-test cpe.py", "ocr-test pymupdf.py", "ocr-test pymupdf-ventana.py",
+                    "ocr_test_original.py", "ocr_test deep.py", "ocr_test_paddle.py", "ocr_batch.py"]
+# Se importan solo en el primer uso de su motor (ocr_motores, ocr_onnx)
+MODULOS_PESADOS = ["torch", "transformers", "paddle", "paddleocr", "onnxruntime", "optimum"]
+# Llamadas que cargan un modelo: no deben correr al importar un script
+CARGAS_DE_MODELO = {"PaddleOCR", "from_pretrained", "PyTessBaseAPI"}
+
+# Corre en un proceso nuevo: cada import por separado, para medir aunque falte alguna dependencia
+_MEDIR_IMPORTS = """
+import json, sys, time
+faltan = []
+inicio = time.perf_counter()
+for sentencia in json.loads(sys.argv[1]):
+    try:
+        exec(sentencia, {})
+    except ImportError as exc:
+        faltan.append(exc.name or str(exc))
+ms = (time.perf_counter() - inicio) * 1000
+cargados = {nombre.split(".")[0] for nombre in sys.modules}
+print(json.dumps({"ms": ms, "faltan": faltan, "pesados": sorted(cargados & set(json.loads(sys.argv[2])))}))
+"""
+
+
+def analizar_script(ruta):
+    """(imports del nivel superior, modulos pesados que importan directamente,
+    llamadas que cargan un modelo fuera de funciones)."""
+    with open(ruta, encoding="utf-8") as f:
+        fuente = f.read()
+    arbol = ast.parse(fuente)
+    imports, pesados = [], set()
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos = [alias.name for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom):
+            modulos = [nodo.module or ""]
+        else:
+            continue
+        imports.append(ast.get_source_segment(fuente, nodo))
+        # Aunque no este instalado aca, el import pesado cuesta donde si lo esta
+        pesados.update(m.split(".")[0] for m in modulos if m.split(".")[0] in MODULOS_PESADOS)
+    cargas = []
+    for nodo in arbol.body:
+        if isinstance(nodo, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        for llamada in ast.walk(nodo):
+            if isinstance(llamada, ast.Call):
+                nombre = getattr(llamada.func, "attr", None) or getattr(llamada.func, "id", None)
+                if nombre in CARGAS_DE_MODELO:
+                    cargas.append(f"{nombre} (linea {llamada.lineno})")
+    return imports, pesados, cargas
+
+
+def bench_arranque(args):
+    scripts = args.scripts or SCRIPTS_ARRANQUE
+    fallas = 0
+    print(f"{'script':30} {'ms':>7}  observaciones")
+    for script in scripts:
+        ruta = os.path.join(base_directory, script)
+        imports, pesados, cargas = analizar_script(ruta)
+        tiempos = []
+        for _ in range(args.repeticiones):
+            salida = subprocess.run([sys.executable, "-c", _MEDIR_IMPORTS, json.dumps(imports),
+                                     json.dumps(MODULOS_PESADOS)], cwd=base_directory, capture_output=True,
+                                    text=True, check=True)
+            medicion = json.loads(salida.stdout.strip().splitlines()[-1])
+            tiempos.append(medicion["ms"])
+        ms = float(np.median(tiempos))
+        observaciones = []
+        pesados = sorted(pesados | set(medicion["pesados"]))
+        if pesados:
+            observaciones.append(f"importa {', '.join(pesados)}")
+        if cargas:
+            observaciones.append(f"carga modelo al importar: {', '.join(cargas)}")
+        if ms > args.limite:
+            observaciones.append(f"pasa el limite de {args.limite:.0f} ms")
+        fallas += bool(observaciones)
+        if medicion["faltan"]:
+            # Sin la dependencia no se mide su costo: el tiempo queda por debajo del real
+            observaciones.append(f"no instalado: {', '.join(medicion['faltan'])}")
+        print(f"{script[:30]:30} {ms:7.0f}  {'; '.join(observaciones)}")
+    if fallas:
+        print(f"\n{fallas} scripts con arranque lento o cargas al importar", file=sys.stderr)
+        return 1
+    return 0
+
+
+# --- Layouts por emisor ---
+
+def bench_emisores(args):
+    import tempfile
+    import ocr_cache
+    from ocr_extraccion import VALIDADORES
+    from ocr_pipeline import procesar_pagina
+    fallas = probadas = 0
+    with tempfile.TemporaryDirectory() as carpeta:
+        # Cache vacia: un layout ya aprendido en la cache real haria que no se vuelva a aprender
+        ocr_cache._cache = ocr_cache.CacheResultados(os.path.join(carpeta, "ocr_cache.sqlite"))
+        ocr_cache._cache_pid = os.getpid()
+        print(f"{'pagina':40} {'origen':8} {'CUIT Remitente':15} pendientes")
+        for ruta in expandir_entradas(args.entradas):
+            if not os.path.basename(ruta).startswith("Factura"):
+                continue
+            nombre = os.path.basename(ruta)
+            indice = 0 if ruta.lower().endswith(".pdf") else None
+            try:
+                _, datos, artefacto = procesar_pagina(ruta, indice, "factura", args.dpi, "tesseract")
+            except Exception as exc:
+                print(f"{nombre[:40]:40} salteada: {exc.__class__.__name__}")
+                continue
+            pendientes = artefacto["emisores_pendientes"]
+            cuit = datos["CUIT Remitente"]
+            print(f"{nombre[:40]:40} {artefacto['origen']:8} {cuit:15} {[p[:2] for p in pendientes]}")
+            if artefacto["origen"] in ("ocr", "regiones", "texto") and VALIDADORES["CUIT Remitente"](cuit):
+                probadas += 1
+                if not any(accion == "guardar" and cuit_p == cuit and layout
+                           for accion, cuit_p, layout in pendientes):
+                    fallas += 1
+                    print("  sin layout para aprender", file=sys.stderr)
+        ocr_cache._cache.cerrar()
+        ocr_cache._cache = None
+    print(f"\n{probadas - fallas}/{probadas} facturas OCReadas enteras dejan su layout para aprender")
+    return 1 if fallas or not probadas else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mediciones de rendimiento del pipeline OCR.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("deskew", help="Deskew actual contra el anterior (minAreaRect)")
+    p.add_argument("entradas", nargs="*", default=[os.path.join(base_directory, "facturas")])
+    p.add_argument("--dpi", type=int, default=300)
+    p.add_argument("--todas", action="store_true", help="Todas las paginas (por defecto solo la primera)")
+    p.add_argument("--angulos", default="-3,-1.2,0.7,2.5",
+                   help="Rotaciones conocidas aplicadas a cada pagina, en grados")
+    p.set_defaults(funcion=bench_deskew)
+
+    p = sub.add_parser("render", help="Render + preprocesado: camino RGB/PIL contra grises sin copia")
+    p.add_argument("entradas", nargs="*", default=[os.path.join(base_directory, "facturas")])
+    p.add_argument("--dpi", type=int, default=300)
+    p.add_argument("--todas", action="store_true", help="Todas las paginas (por defecto solo la primera)")
+    p.set_defaults(funcion=bench_render)
+
+    p = sub.add_parser("visual", help="Clasificacion visual y alineacion contra las referencias")
+    p.add_argument("entradas", nargs="*", default=[os.path.join(base_directory, "facturas")])
+    p.add_argument("--todas", action="store_true", help="Todas las paginas (por defecto solo la primera)")
+    p.set_defaults(funcion=bench_visual)
+
+    p = sub.add_parser("mosaico", help="Regiones de una plantilla de a una contra un mosaico por llamada")
+    p.add_argument("entradas", nargs="*", default=[os.path.join(base_directory, "facturas")])
+    p.add_argument("--dpi", type=int, default=200)
+    p.add_argument("--todas", action="store_true", help="Todas las paginas (por defecto solo la primera)")
+    p.add_argument("--plantilla", choices=sorted(PLANTILLAS), default="factura")
+    p.set_defaults(funcion=bench_mosaico)
+
+    p = sub.add_parser("trocr", help="Lineas por segundo de TrOCR en CPU segun tanda, hilos e int8")
+    p.add_argument("entradas", nargs="*", default=[os.path.join(base_directory, "facturas")])
+    p.add_argument("--dpi", type=int, default=300)
+    p.add_argument("--todas", action="store_true", help="Todas las paginas (por defecto solo la primera)")
+    p.add_argument("--lotes", default="1,8,16,32", help="Tamanos de tanda a medir")
+    p.add_argument("--hilos", type=int, default=0, help="Hilos de torch (0: los de torch)")
+    p.add_argument("--int8", action="store_true", help="Cuantizacion dinamica int8 de las capas lineales (PyTorch)")
+    p.add_argument("--onnx", action="store_true", help="Sobre ONNX Runtime (ocr_onnx) en lugar de PyTorch")
+    p.add_argument("--max-lineas", type=int, default=256)
+    p.set_defaults(funcion=bench_trocr)
+
+    p = sub.add_parser("onnx", help="Regresion del backend ONNX Runtime contra el original de cada motor")
+    p.add_argument("entradas", nargs="*", default=[os.path.join(base_directory, "facturas")])
+    p.add_argument("--dpi", type=int, default=300)
+    p.add_argument("--todas", action="store_true", help="Todas las paginas (por defecto solo la primera)")
+    p.add_argument("--motores", default="trocr,paddle", help="Motores a comparar (trocr, paddle)")
+    p.add_argument("--tolerancia", type=float, default=0.02,
+                   help="Distancia maxima por pagina entre los textos (1 - similitud por caracteres)")
+    p.set_defaults(funcion=bench_onnx)
+
+    p = sub.add_parser("arranque", help="Tiempo de arranque (imports) de las ventanas y del lote")
+    p.add_argument("scripts", nargs="*", help="Scripts a medir (por defecto las ventanas y ocr_batch)")
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--limite", type=float, default=1500, help="ms maximos de imports por script")
+    p.set_defaults(funcion=bench_arranque)
+
+    p = sub.add_parser("emisores", help="Las facturas OCReadas enteras dejan su layout por emisor para aprender")
+    p.add_argument("entradas", nargs="*", default=[os.path.join(base_directory, "facturas")])
+    p.add_argument("--dpi", type=int, default=300)
+    p.set_defaults(funcion=bench_emisores)
+
+    args = parser.parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- Cache de resultados por contenido ---
+# Clave: hash SHA-256 del archivo + pagina + version del pipeline (motor, DPI,
+# extractor, preprocesado). Un PDF re-arrastrado o repetido por mail devuelve
+# el texto y los campos guardados sin volver a renderizar ni OCRear.
+# Aparte se archivan los artefactos de OCR de cada pagina (texto crudo y palabras
+# con posicion) para re-extraer campos sin re-OCRear; cuentan en el mismo limite.
+
+base_directory = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("OCR_CACHE_DIR", os.path.join(base_directory, "cache"))
+# Tamano maximo de resultados + artefactos; al pasarlo se descartan las paginas menos
+# usadas (el resultado junto con sus artefactos) y despues los artefactos mas viejos
+MAX_MB = float(os.environ.get("OCR_CACHE_MB", "512"))
+# Emisores con layout aprendido (ocr_emisores); al pasarlo se descartan los menos usados
+MAX_EMISORES = int(os.environ.get("OCR_CACHE_EMISORES", "2000"))
+# Segundos que se espera a otro proceso que tiene la base tomada
+ESPERA_BLOQUEO = 30
+
+_esquema = """
+CREATE TABLE IF NOT EXISTS resultados (
+    huella TEXT NOT NULL,
+    pagina INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    texto TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    ultimo_uso REAL NOT NULL,
+    PRIMARY KEY (huella, pagina, version)
+);
+CREATE INDEX IF NOT EXISTS resultados_uso ON resultados (ultimo_uso);
+CREATE TABLE IF NOT EXISTS artefactos (
+    huella TEXT NOT NULL,
+    pagina INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    paginas INTEGER NOT NULL,
+    artefacto TEXT NOT NULL,
+    fecha REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (huella, pagina, version)
+);
+CREATE INDEX IF NOT EXISTS artefactos_fecha ON artefactos (fecha);
+CREATE TABLE IF NOT EXISTS emisores (
+    cuit TEXT PRIMARY KEY,
+    layout TEXT NOT NULL,
+    ultimo_uso REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emisores_uso ON emisores (ultimo_uso);
+"""
+
+
+def huella_archivo(ruta, bloque=1 << 20):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for chunk in iter(lambda: f.read(bloque), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class CacheResultados:
+    def __init__(self, ruta=None, max_mb=MAX_MB, max_emisores=MAX_EMISORES):
+        if ruta is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            ruta = os.path.join(CACHE_DIR, "ocr_cache.sqlite")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_emisores = max_emisores
+        self._lock = threading.Lock()
+        # La GUI consulta desde su hilo de trabajo: una conexion compartida con lock
+        # Los workers del pool leen los layouts por emisor mientras el proceso principal escribe:
+        # se espera al que tiene la base tomada en lugar de fallar con "database is locked"
+        self._con = sqlite3.connect(ruta, check_same_thread=False, timeout=ESPERA_BLOQUEO)
+        self._migrar()
+        self._con.executescript(_esquema)
+        self._huellas = {}
+
+    def _migrar(self):
+        """Agrega la columna bytes a una tabla de artefactos creada sin ella."""
+        columnas = [c[1] for c in self._con.execute("PRAGMA table_info(artefactos)")]
+        if columnas and "bytes" not in columnas:
+            self._con.execute("ALTER TABLE artefactos ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0")
+            self._con.execute("UPDATE artefactos SET bytes=LENGTH(CAST(artefacto AS BLOB))")
+            self._con.commit()
+
+    def huella(self, ruta):
+        """Hash del archivo, recalculado solo si cambio su tamano o fecha."""
+        st = os.stat(ruta)
+        clave = (os.path.abspath(ruta), st.st_size, st.st_mtime_ns)
+        if clave not in self._huellas:
+            self._huellas[clave] = huella_archivo(ruta)
+        return self._huellas[clave]
+
+    def obtener(self, huella, pagina, version):
+        """(texto, datos) guardados, o None."""
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT texto, datos FROM resultados WHERE huella=? AND pagina=? AND version=?",
+                (huella, pagina, version)).fetchone()
+            if fila is None:
+                return None
+            self._con.execute(
+                "UPDATE resultados SET ultimo_uso=? WHERE huella=? AND pagina=? AND version=?",
+                (time.time(), huella, pagina, version))
+            self._con.commit()
+        return fila[0], json.loads(fila[1])
+
+    def guardar(self, huella, pagina, version, texto, datos):
+        datos_json = json.dumps(datos, ensure_ascii=False)
+        tamano = len(texto.encode("utf-8")) + len(datos_json.encode("utf-8"))
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (huella, pagina, version, texto, datos_json, tamano, time.time()))
+            self._desalojar()
+            self._con.commit()
+
+    def _desalojar(self):
+        total = self._con.execute(
+            "SELECT (SELECT COALESCE(SUM(bytes), 0) FROM resultados)"
+            " + (SELECT COALESCE(SUM(bytes), 0) FROM artefactos)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Bajamos al 90% del limite para no desalojar en cada insercion
+        sobrante = total - int(self.max_bytes * 0.9)
+        # Primero las paginas menos usadas: el resultado y los artefactos de esa pagina
+        filas = self._con.execute("SELECT rowid, huella, pagina, bytes FROM resultados ORDER BY ultimo_uso")
+        for rowid, huella, pagina, tamano in filas.fetchall():
+            sobrante -= tamano + self._con.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM artefactos WHERE huella=? AND pagina=?",
+                (huella, pagina)).fetchone()[0]
+            self._con.execute("DELETE FROM resultados WHERE rowid=?", (rowid,))
+            self._con.execute("DELETE FROM artefactos WHERE huella=? AND pagina=?", (huella, pagina))
+            if sobrante <= 0:
+                return
+        # Quedan artefactos sin resultado (versiones viejas): los mas viejos primero
+        borrar = []
+        for rowid, tamano in self._con.execute("SELECT rowid, bytes FROM artefactos ORDER BY fecha"):
+            borrar.append((rowid,))
+            sobrante -= tamano
+            if sobrante <= 0:
+                break
+        self._con.executemany("DELETE FROM artefactos WHERE rowid=?", borrar)
+
+    # --- Artefactos de OCR (se desalojan con su resultado, ver _desalojar) ---
+
+    def guardar_artefacto(self, huella, pagina, version, ruta, paginas, artefacto):
+        artefacto_json = json.dumps(artefacto, ensure_ascii=False)
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO artefactos (huella, pagina, version, ruta, paginas, artefacto, fecha, bytes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (huella, pagina, version, os.path.abspath(ruta), paginas,
+                 artefacto_json, time.time(), len(artefacto_json.encode("utf-8"))))
+            self._desalojar()
+            self._con.commit()
+
+    def obtener_artefacto(self, huella, pagina, version):
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT artefacto FROM artefactos WHERE huella=? AND pagina=? AND version=?",
+                (huella, pagina, version)).fetchone()
+        return None if fila is None else json.loads(fila[0])
+
+    def iterar_artefactos(self, version):
+        """Genera (huella, pagina, ruta, paginas, artefacto) de todo el archivo para una version de OCR."""
+        with self._lock:
+            filas = self._con.execute(
+                "SELECT huella, pagina, ruta, paginas FROM artefactos WHERE version=? ORDER BY ruta, pagina",
+                (version,)).fetchall()
+        for huella, pagina, ruta, paginas in filas:
+            artefacto = self.obtener_artefacto(huella, pagina, version)
+            if artefacto is not None:
+                yield huella, pagina, ruta, paginas, artefacto
+
+    # --- Layouts por emisor (ocr_emisores) ---
+
+    def obtener_emisor(self, cuit):
+        """Layout aprendido para el CUIT ({"cajas", "campos"}), o None. Solo lee (ver usar_emisor)."""
+        with self._lock:
+            fila = self._con.execute("SELECT layout FROM emisores WHERE cuit=?", (cuit,)).fetchone()
+        return None if fila is None else json.loads(fila[0])
+
+    def usar_emisor(self, cuit):
+        """Marca el layout del emisor como recien usado (los menos usados se descartan primero)."""
+        with self._lock:
+            self._con.execute("UPDATE emisores SET ultimo_uso=? WHERE cuit=?", (time.time(), cuit))
+            self._con.commit()
+
+    def guardar_emisor(self, cuit, layout):
+        with self._lock:
+            self._con.execute("INSERT OR REPLACE INTO emisores VALUES (?, ?, ?)",
+                              (cuit, json.dumps(layout), time.time()))
+            self._con.execute(
+                "DELETE FROM emisores WHERE cuit NOT IN "
+                "(SELECT cuit FROM emisores ORDER BY ultimo_uso DESC LIMIT ?)", (self.max_emisores,))
+            self._con.commit()
+
+    def olvidar_emisor(self, cuit):
+        """Descarta el layout de un emisor cuyas cajas dejaron de coincidir."""
+        with self._lock:
+            self._con.execute("DELETE FROM emisores WHERE cuit=?", (cuit,))
+            self._con.commit()
+
+    def cerrar(self):
+        with self._lock:
+            self._con.close()
+
+
+_cache = None
+_cache_pid = None
+
+
+def obtener_cache():
+    """Cache compartida del proceso (se abre en el primer uso).
+
+    Un worker del pool creado con fork hereda `_cache` del proceso padre: la conexion
+    sqlite y su lock no se comparten entre procesos, asi que cada proceso abre la suya.
+    """
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        _cache = CacheResultados()
+        _cache_pid = os.getpid()
+    return _cache
@@ -0,0 +1,87 @@
+import re
+
+# --- Clasificacion del tipo de documento ---
+# Primera pasada barata: sobre la capa de texto del PDF o sobre el OCR de la franja
+# superior a baja resolucion. Con el tipo se elige el extractor y la plantilla de
+# regiones (ocr_plantillas), y el OCR caro solo corre donde ese tipo lo necesita.
+# Los patrones toleran acentos perdidos por el OCR y van de los mas especificos
+# a los mas generales: el primero que coincide decide.
+
+TIPO_DESCONOCIDO = "Desconocido"
+
+_PATRONES = [
+    ("CPE", r"Carta\s+de\s+Porte|\bCTG\s*:"),
+    ("DTVe", r"\bDTVe\b|Tr[aá]nsito\s+Sanitario\s+Vegetal"),
+    ("DT-e", r"\bDT\s*-\s*e\b|Documento\s+de\s+Tr[aá]nsito\s+Electr[oó]nico"),
+    ("MIC", r"Manifiesto\s+Internacional\s+de\s+Carga|\bMIC\s*/\s*DTA\b"),
+    ("Permiso de Tránsito", r"Permiso\s+de\s+Tr[aá]nsito"),
+    ("Remito Cárnico", r"Remito\s+Electr[oó]nico\s+C[aá]rnico|C[oó]digo\s*995\b"),
+    ("Remito Harinero", r"Remito\s+Electr[oó]nico\s+Harinero|C[oó]digo\s*:?\s*993\b"),
+    ("Remito Tabacalero", r"Tabaco\s+en\s+Hebras|Remito\s+Electr[oó]nico\s+de\s+Tabaco|C[oó]digo\s*991\b"),
+    ("Remito R", r"C[oó]d(?:igo)?\.?\s*(?:N[°º]?\s*)?0?91\b"),
+]
+
+# Codigo AFIP del comprobante -> letra de la factura
+_LETRAS = {1: "A", 6: "B", 11: "C", 19: "E", 51: "M"}
+_CODIGO_FACTURA = re.compile(r"C[OÓ]D(?:IGO)?\.?\s*(?:N[°º]?\s*)?0*(1|6|11|19|51)\b", re.IGNORECASE)
+_LETRA_FACTURA = re.compile(r"FACTURA\s*(?:/\s*REMITO\s*)?[\"“]?([ABCEM])\b", re.IGNORECASE)
+# Remito sin codigo legible: "REMITO" suelto, pero solo si no es una factura
+_REMITO = re.compile(r"\bREMITO\b", re.IGNORECASE)
+
+# Que plantilla de regiones y que extractor usa cada tipo
+TIPOS = {
+    "Factura A": {"plantilla": "factura", "extractor": "factura"},
+    "Factura B": {"plantilla": "factura", "extractor": "factura"},
+    "Factura C": {"plantilla": "factura", "extractor": "factura"},
+    "Factura E": {"plantilla": "factura", "extractor": "factura"},
+    "Factura M": {"plantilla": "factura", "extractor": "factura"},
+    "CPE": {"plantilla": "cpe", "extractor": "cpe"},
+    "Remito R": {"plantilla": "remito", "extractor": "remito"},
+    "Remito Cárnico": {"plantilla": "remito_rubro", "extractor": "remito"},
+    "Remito Harinero": {"plantilla": "remito_rubro", "extractor": "remito"},
+    "Remito Tabacalero": {"plantilla": "remito_rubro", "extractor": "remito"},
+    "DTVe": {"plantilla": "senasa", "extractor": "remito"},
+    "DT-e": {"plantilla": "senasa", "extractor": "remito"},
+    "Permiso de Tránsito": {"plantilla": "senasa", "extractor": "remito"},
+    "MIC": {"plantilla": None, "extractor": "remito"},
+    TIPO_DESCONOCIDO: {"plantilla": None, "extractor": "factura"},
+}
+
+_PATRONES = [(tipo, re.compile(patron, re.IGNORECASE)) for tipo, patron in _PATRONES]
+
+
+def es_factura(tipo) -> bool:
+    """Tipos que pueden traer QR AFIP (el desconocido puede ser una factura)."""
+    return tipo.startswith("Factura") or tipo == TIPO_DESCONOCIDO
+
+
+def refinar_tipo(tipo, texto) -> str:
+    """Precisa el tipo con el texto OCReado de la pagina.
+
+    La clasificacion visual no distingue variantes con el mismo layout (letra de
+    la factura, rubro del remito): si el texto reconoce otro tipo que se procesa
+    igual (misma plantilla y extractor), gana el texto.
+    """
+    por_texto = clasificar_texto(texto)
+    if por_texto != TIPO_DESCONOCIDO and TIPOS[por_texto] == TIPOS[tipo]:
+        return por_texto
+    return tipo
+
+
+def clasificar_texto(texto) -> str:
+    """Tipo de documento a partir del texto (capa nativa u OCR del encabezado)."""
+    texto = texto or ""
+    # Los remitos y documentos de transito se reconocen por su titulo o codigo
+    for tipo, patron in _PATRONES:
+        if patron.search(texto):
+            return tipo
+    # Factura: por el codigo AFIP del recuadro central o por la letra junto al titulo
+    codigo = _CODIGO_FACTURA.search(texto)
+    if codigo:
+        return f"Factura {_LETRAS[int(codigo.group(1))]}"
+    letra = _LETRA_FACTURA.search(texto)
+    if letra:
+        return f"Factura {letra.group(1).upper()}"
+    if _REMITO.search(texto):
+        return "Remito R"
+    return TIPO_DESCONOCIDO
@@ -0,0 +1,145 @@
+import re
+from ocr_plantillas import PSM_AUTO, PSM_BLOQUE, Region
+
+# --- Layouts aprendidos por emisor (CUIT Remitente) ---
+# Cada emisor imprime sus facturas siempre igual: la primera vez que se extraen
+# los campos de una factura suya se guardan las cajas donde aparecieron los
+# valores (palabras de Tesseract o de la capa de texto). En las siguientes se
+# OCRea solo el encabezado para leer el CUIT y despues solo esas cajas. Si algun
+# campo aprendido ya no aparece, la entrada se descarta y se OCRea la pagina.
+#
+# Cajas (x0, y0, x1, y1) relativas a la pagina enderezada, como las plantillas.
+
+# Franja superior donde va el CUIT del emisor en los comprobantes AFIP
+REGION_ENCABEZADO = Region("encabezado", (0.0, 0.0, 1.0, 0.20), PSM_AUTO)
+# La etiqueta suele ir a la izquierda del valor ("Fecha de Emision: 01/02/2024"):
+# la caja del campo se extiende hacia la izquierda para que el extractor la encuentre
+CONTEXTO_IZQUIERDA = 0.25
+# Si con la etiqueta a la izquierda no alcanza se prueba la linea completa y, despues,
+# la linea con las de arriba (encabezados de columna de la tabla de importes)
+LINEAS_ARRIBA = 3
+MARGEN = 0.01
+# Valores con menos digitos (p. ej. punto de venta "3") son ambiguos en la pagina
+MIN_DIGITOS = 4
+# Sin estos campos la factura no alcanza para aprender el layout
+CAMPOS_MINIMOS = ("Fecha de Comprobante", "Nro. Comprobante", "CUIT Remitente")
+
+
+def _digitos(texto):
+    return re.sub(r"\D", "", texto)
+
+
+def cajas_de_valor(valor, palabras):
+    """Cajas de cada aparicion de `valor` (hasta tres palabras seguidas en la misma linea).
+
+    Un importe puede aparecer en el detalle y en los totales: no se sabe de cual lo
+    tomo el extractor, asi que se guardan todas.
+    """
+    buscado = _digitos(valor)
+    if len(buscado) < MIN_DIGITOS:
+        return []
+    cajas = []
+    for i, palabra in enumerate(palabras):
+        x0, y0, x1, y1 = palabra[:4]
+        digitos = ""
+        for siguiente in palabras[i:i + 3]:
+            # Misma linea: el centro vertical cae dentro de la primera palabra
+            if not y0 <= (siguiente[1] + siguiente[3]) / 2 <= y1:
+                break
+            digitos += _digitos(siguiente[4])
+            x1, y1 = max(x1, siguiente[2]), max(y1, siguiente[3])
+            if digitos == buscado or (len(buscado) >= 8 and buscado in digitos):
+                cajas.append((x0, min(y0, siguiente[1]), x1, y1))
+                break
+            if not buscado.startswith(digitos):
+                break
+    return cajas
+
+
+def _ampliar(caja, nivel=0):
+    """Caja del valor con margen y contexto: 0 etiqueta a la izquierda, 1 linea completa,
+    2 linea completa y LINEAS_ARRIBA lineas por encima."""
+    x0, y0, x1, y1 = caja
+    alto = y1 - y0
+    if nivel >= 1:
+        x0, x1 = 0.0, 1.0
+    if nivel >= 2:
+        y0 -= alto * 1.5 * LINEAS_ARRIBA
+    return (max(x0 - CONTEXTO_IZQUIERDA, 0.0), max(y0 - alto / 2 - MARGEN, 0.0),
+            min(x1 + MARGEN, 1.0), min(y1 + alto / 2 + MARGEN, 1.0))
+
+
+def _se_tocan(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _fusionar(cajas):
+    fusionadas = []
+    for caja in sorted(cajas):
+        for i, otra in enumerate(fusionadas):
+            if _se_tocan(caja, otra):
+                fusionadas[i] = (min(caja[0], otra[0]), min(caja[1], otra[1]),
+                                 max(caja[2], otra[2]), max(caja[3], otra[3]))
+                break
+        else:
+            fusionadas.append(caja)
+    return fusionadas
+
+
+def regiones_de_emisor(cajas):
+    """Regiones a OCRear despues del encabezado (las que caen dentro no se repiten)."""
+    return [Region(f"campo{n}", tuple(caja), PSM_BLOQUE) for n, caja in enumerate(cajas)
+            if caja[3] > REGION_ENCABEZADO.caja[3]]
+
+
+def texto_de_palabras(palabras):
+    """Texto por lineas a partir de palabras con posicion (como lo devolveria el OCR)."""
+    lineas = []
+    for palabra in sorted(palabras, key=lambda p: (p[1], p[0])):
+        centro = (palabra[1] + palabra[3]) / 2
+        if lineas and lineas[-1][0] <= centro <= lineas[-1][1]:
+            lineas[-1][2].append(palabra)
+        else:
+            lineas.append((palabra[1], palabra[3], [palabra]))
+    return "\n".join(" ".join(p[4] for p in sorted(linea, key=lambda p: p[0])) for _, _, linea in lineas)
+
+
+def _dentro(palabra, caja):
+    cx, cy = (palabra[0] + palabra[2]) / 2, (palabra[1] + palabra[3]) / 2
+    return caja[0] <= cx <= caja[2] and caja[1] <= cy <= caja[3]
+
+
+def _reproduce(cajas, palabras, datos, extraer):
+    """True si el texto de encabezado + cajas alcanza para extraer los mismos datos."""
+    encabezado = [p for p in palabras if _dentro(p, REGION_ENCABEZADO.caja)]
+    resto = [p for p in palabras if any(_dentro(p, r.caja) for r in regiones_de_emisor(cajas))]
+    texto = texto_de_palabras(encabezado) + "\n" + texto_de_palabras(resto)
+    extraidos = extraer(texto)
+    return all(extraidos.get(campo) == valor for campo, valor in datos.items())
+
+
+def aprender_layout(datos, palabras, extraer):
+    """Layout del emisor {"cajas", "campos"} a partir de una factura extraida entera.
+
+    Las cajas salen de las palabras que forman cada valor, ampliadas para incluir
+    la etiqueta. Antes de guardarlo se comprueba con las mismas palabras que el
+    encabezado y las cajas alcanzan para extraer los mismos datos; si no, se
+    amplian las cajas (ver `_ampliar`) y, si nunca alcanza, None.
+    """
+    encontrados = {campo: valor for campo, valor in datos.items()
+                   if campo != "Tipo Documento" and valor != "No encontrado"}
+    if any(campo not in encontrados for campo in CAMPOS_MINIMOS):
+        return None
+    valores = [caja for valor in encontrados.values() for caja in cajas_de_valor(valor, palabras)]
+    for nivel in range(3):
+        cajas = _fusionar(_ampliar(caja, nivel) for caja in valores)
+        if _reproduce(cajas, palabras, encontrados, extraer):
+            return {"cajas": [list(caja) for caja in cajas], "campos": list(encontrados)}
+    return None
+
+
+def layout_vigente(datos, emisor):
+    """False si el CUIT cambio o falta algun campo que el layout del emisor tenia."""
+    if datos.get("CUIT Remitente") != emisor["cuit"]:
+        return False
+    return all(datos.get(campo, "No encontrado") != "No encontrado" for campo in emisor["campos"])
@@ -0,0 +1,237 @@
+import re
+from datetime import datetime
+
+# --- Extraccion de datos ---
+
+
+def extraer_datos_factura(texto):
+    datos = {
+        "Fecha de Comprobante": "No encontrado",
+        "Pto. de Venta": "No encontrado",
+        "Nro. Comprobante": "No encontrado",
+        "CUIT Remitente": "No encontrado",
+        "CUIT Destinatario": "No encontrado",
+        "Base Imponible": "No encontrado"
+    }
+
+    # 1. Fecha
+    patrones_fecha = [
+        r'(?:FECHA|Emisión|Fecha)(?:\s+de)?(?:\s+Emisión)?[:\s]*(\d{2}[/-]\d{2}[/-]\d{4})',
+        r'(\d{2}[/-]\d{2}[/-]\d{4})'
+    ]
+    for patron in patrones_fecha:
+        fecha_match = re.search(patron, texto, re.IGNORECASE)
+        if fecha_match:
+            datos["Fecha de Comprobante"] = fecha_match.group(1)
+            break
+
+    # 2. Punto de Venta y Número
+    comp_unido = re.search(r'(\d{4,5})-(\d{8})', texto)
+    if comp_unido:
+        datos["Pto. de Venta"] = comp_unido.group(1).lstrip('0') or "0"
+        datos["Nro. Comprobante"] = comp_unido.group(2)
+    else:
+        pv_match = re.search(r'(?:Punto de Venta|P.V.|P.Venta)[:\s]*(\d+)', texto, re.IGNORECASE)
+        nro_match = re.search(r'(?:Comp\.?\s*Nro\.?|Comprobante\s*Nro\.?|Nro\.?\s*Comprobante)[:\s]*(\d+)', texto, re.IGNORECASE)
+        if pv_match: datos["Pto. de Venta"] = pv_match.group(1).lstrip('0') or "0"
+        if nro_match: datos["Nro. Comprobante"] = nro_match.group(1)
+
+    # 3. CUITs
+    cuits_encontrados = re.findall(r'(\d{2}-?\d{8}-?\d{1})', texto)
+    cuits_limpios = []
+    for c in [c.replace("-", "") for c in cuits_encontrados]:
+        if c not in cuits_limpios:
+            cuits_limpios.append(c)
+
+    if len(cuits_limpios) >= 1: datos["CUIT Remitente"] = cuits_limpios[0]
+    if len(cuits_limpios) >= 2: datos["CUIT Destinatario"] = cuits_limpios[1]
+
+    # 4. Base Imponible
+    patrones_base = [
+        r'(?:Neto Gravado|Neto|Subtotal|Gravado).*?[:\$]?\s*([\d\.,]+)',
+        r'TOTAL NETO.*?[:\$]?\s*([\d\.,]+)'
+    ]
+    for patron in patrones_base:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            valor = match.group(1).strip()
+            if len(valor.replace(",", "").replace(".", "")) > 4:
+                datos["Base Imponible"] = valor
+                break
+    return datos
+
+
+def extraer_todo(texto):
+    # Diccionario con todos los campos solicitados para asegurar su visibilidad en la UI
+    datos = {
+        "Tipo Documento": "Desconocido",
+        "Fecha de Comprobante": "No encontrado",
+        "CTG": "No encontrado",
+        "Pto. de Venta": "No encontrado",
+        "Nro. Comprobante": "No encontrado",
+        "CUIT Remitente": "No encontrado",
+        "CUIT Destinatario": "No encontrado",
+        "CUIT Destino": "No encontrado",
+        "Base Imponible / Tarifa": "No encontrado"
+    }
+
+    # Lógica para Carta de Porte Electrónica (CPE)
+    if "Carta de Porte" in texto or "CPE" in texto or "CTG" in texto:
+        datos["Tipo Documento"] = "Carta de Porte Electrónica"
+        
+        # 1. Fecha [cite: 11, 13]
+        f = re.search(r'Fecha:\s*(\d{2}/\d{2}/\d{4})', texto)
+        if f: datos["Fecha de Comprobante"] = f.group(1)
+
+        # 2. CTG 
+        ctg = re.search(r'CTG:\s*(\d+)', texto)
+        if ctg: datos["CTG"] = ctg.group(1)
+
+        # 3. Punto de Venta y Nro CPE [cite: 12, 14]
+        cpe = re.search(r'(?:N° CPE|CPE)[:\s]*(\d{5})-(\d{8})', texto)
+        if cpe:
+            datos["Pto. de Venta"] = cpe.group(1)
+            datos["Nro. Comprobante"] = cpe.group(2)
+
+        # 4. CUITs específicos [cite: 10, 18, 20]
+        # Remitente [cite: 10]
+        r = re.search(r'(?:Titular Carta de Porte|Remitente Comercial Productor)[:\s]*(\d{11})', texto)
+        if r: datos["CUIT Remitente"] = r.group(1)
+
+        # Destinatario [cite: 18]
+        dt = re.search(r'Destinatario[:\s]*(\d{11})', texto)
+        if dt: datos["CUIT Destinatario"] = dt.group(1)
+
+        # Destino 
+        ds = re.search(r'Destino[:\s]*(\d{11})', texto)
+        if ds: datos["CUIT Destino"] = ds.group(1)
+
+        # 5. Tarifa [cite: 56]
+        t = re.search(r'Tarifa:\s*(\d+)', texto)
+        if t: datos["Base Imponible / Tarifa"] = t.group(1)
+
+    else:
+        # Lógica para Facturas Estándar (A, B, C)
+        datos["Tipo Documento"] = "Factura / Comprobante"
+        fecha = re.search(r'(?:FECHA|Emisión|Fecha)[:\s]*(\d{2}[/-]\d{2}[/-]\d{4})', texto, re.IGNORECASE)
+        if fecha: datos["Fecha de Comprobante"] = fecha.group(1)
+
+        comp = re.search(r'(\d{4,5})-(\d{8})', texto)
+        if comp:
+            datos["Pto. de Venta"] = comp.group(1).lstrip('0') or "0"
+            datos["Nro. Comprobante"] = comp.group(2)
+
+        cuits = list(dict.fromkeys(re.findall(r'(\d{2}-?\d{8}-?\d{1})', texto)))
+        if len(cuits) >= 1: datos["CUIT Remitente"] = cuits[0].replace("-", "")
+        if len(cuits) >= 2: datos["CUIT Destinatario"] = cuits[1].replace("-", "")
+
+        base = re.search(r'(?:Neto Gravado|Neto|Subtotal).*?[:\$]?\s*([\d\.,]+)', texto, re.IGNORECASE)
+        if base: datos["Base Imponible / Tarifa"] = base.group(1)
+
+    return datos
+
+
+def extraer_datos_remito(texto):
+    # Remitos y documentos de transito: mismos campos que la factura, sin importes
+    datos = extraer_datos_factura(texto)
+    del datos["Base Imponible"]
+    return datos
+
+
+# --- Validacion de campos ---
+# Un digito mal leido por el OCR suele dejar un valor con la forma esperada: los
+# CUIT se comprueban con su digito verificador y las fechas contra el calendario.
+
+_PESOS_CUIT = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+
+
+def cuit_valido(cuit) -> bool:
+    if not re.fullmatch(r"\d{11}", cuit):
+        return False
+    resto = sum(int(d) * peso for d, peso in zip(cuit, _PESOS_CUIT)) % 11
+    return (11 - resto) % 11 == int(cuit[10])
+
+
+def fecha_valida(fecha) -> bool:
+    try:
+        return 2000 <= datetime.strptime(fecha.replace("-", "/"), "%d/%m/%Y").year <= 2099
+    except ValueError:
+        return False
+
+
+def importe_valido(importe) -> bool:
+    return re.fullmatch(r"\d[\d.]*,\d{2}|\d[\d,]*\.\d{2}|\d+", importe) is not None
+
+
+VALIDADORES = {
+    "Fecha de Comprobante": fecha_valida,
+    "Pto. de Venta": lambda valor: re.fullmatch(r"\d{1,5}", valor) is not None,
+    "Nro. Comprobante": lambda valor: re.fullmatch(r"\d{1,8}", valor) is not None,
+    "CUIT Remitente": cuit_valido,
+    "CUIT Destinatario": cuit_valido,
+    "CUIT Destino": cuit_valido,
+    "Base Imponible": importe_valido,
+}
+
+
+# Caracteres que puede tener el valor de cada campo numerico: el OCR de la caja del
+# valor solo a una linea (PSM_LINEA) y con esta lista blanca no confunde O/0, l/1, S/5
+CARACTERES_CAMPO = {
+    "Fecha de Comprobante": "0123456789/-",
+    "Pto. de Venta": "0123456789-",
+    "Nro. Comprobante": "0123456789-",
+    "CTG": "0123456789",
+    "CUIT Remitente": "0123456789-",
+    "CUIT Destinatario": "0123456789-",
+    "CUIT Destino": "0123456789-",
+    "Base Imponible": "0123456789.,$",
+    "Base Imponible / Tarifa": "0123456789.,$",
+}
+
+# Valor de cada campo en el texto de su caja, con el formato que dan los extractores
+_LECTURAS = {
+    "Fecha de Comprobante": (r"(\d{2}[/-]\d{2}[/-]\d{4})", lambda valor: valor),
+    "Pto. de Venta": (r"(\d{1,5})(?=-\d{8})|^(\d{1,5})$", lambda valor: valor.lstrip("0") or "0"),
+    "Nro. Comprobante": (r"(\d{8})(?!\d)", lambda valor: valor),
+    "CTG": (r"(\d{6,})", lambda valor: valor),
+    "CUIT Remitente": (r"(\d{2}-?\d{8}-?\d)", lambda valor: valor.replace("-", "")),
+    "CUIT Destinatario": (r"(\d{2}-?\d{8}-?\d)", lambda valor: valor.replace("-", "")),
+    "CUIT Destino": (r"(\d{2}-?\d{8}-?\d)", lambda valor: valor.replace("-", "")),
+    "Base Imponible": (r"(\d[\d.,]*\d)", lambda valor: valor),
+    "Base Imponible / Tarifa": (r"(\d[\d.,]*)", lambda valor: valor),
+}
+
+
+def leer_valor(campo, texto):
+    """Valor de `campo` en el texto OCReado de la caja de su valor, o "No encontrado"."""
+    patron, normalizar = _LECTURAS[campo]
+    encontrado = re.search(patron, texto.strip())
+    if not encontrado:
+        return "No encontrado"
+    return normalizar(next(grupo for grupo in encontrado.groups() if grupo))
+
+
+def campos_invalidos(datos):
+    """Campos que no se encontraron o cuyo valor no pasa la validacion."""
+    return [campo for campo, valor in datos.items()
+            if valor == "No encontrado" or (campo in VALIDADORES and not VALIDADORES[campo](valor))]
+
+
+def requeridos_invalidos(datos, extractor):
+    """Campos obligatorios del extractor (REQUERIDOS) que no se encontraron o no validan."""
+    return [campo for campo in campos_invalidos(datos) if campo in REQUERIDOS[extractor]]
+
+
+EXTRACTORES = {
+    "factura": extraer_datos_factura,
+    "cpe": extraer_todo,
+    "remito": extraer_datos_remito,
+}
+
+# Campos que todo documento del extractor trae (los "requeridos" de sus plantillas);
+# los demas pueden faltar de verdad: destinatario consumidor final, CUIT Destino de una CPE...
+REQUERIDOS = {
+    "factura": ("Fecha de Comprobante", "Nro. Comprobante", "CUIT Remitente"),
+    "cpe": ("CTG", "Nro. Comprobante"),
+    "remito": ("Fecha de Comprobante", "Nro. Comprobante", "CUIT Remitente"),
+}
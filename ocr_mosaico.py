@@ -0,0 +1,90 @@
+import numpy as np
+from ocr_emisores import texto_de_palabras
+
+# --- Mosaico de recortes ---
+# Con el OCR limitado a recuadros chicos (regiones de la plantilla, cajas de un
+# emisor) el costo de cada llamada a Tesseract lo pone el
+# propio motor (preparar la imagen, analisis de layout, armar el resultado) mas
+# que los pixeles. Los recortes se apilan en una sola imagen, separados por una
+# franja blanca, se reconocen en una pasada y cada palabra vuelve al recorte del
+# que salio por la posicion de su centro.
+#
+# El mosaico se lee como un bloque (PSM_BLOQUE): los recortes de una sola linea
+# (valores que se releen con lista blanca) van de a uno, con su modo.
+#
+# El mosaico no sabe de donde vienen los recortes: pueden ser de una pagina o de
+# varias (mismo DPI, para que el tamano de letra sea parejo).
+
+SEPARACION = 40          # px de blanco entre recortes (el layout no une lineas de recortes vecinos)
+MARGEN_MOSAICO = 10      # px de blanco alrededor
+MAX_ALTO_MOSAICO = 8000  # px; mas recortes se reparten en varios mosaicos
+
+
+def armar_mosaico(recortes):
+    """Apila los recortes (arrays en grises) a la izquierda de una imagen blanca.
+
+    Devuelve (mosaico, posiciones) con la posicion (x, y, ancho, alto) en px de
+    cada recorte dentro del mosaico.
+    """
+    ancho = max(recorte.shape[1] for recorte in recortes) + 2 * MARGEN_MOSAICO
+    alto = sum(recorte.shape[0] for recorte in recortes) + SEPARACION * (len(recortes) - 1) + 2 * MARGEN_MOSAICO
+    mosaico = np.full((alto, ancho), 255, dtype=np.uint8)
+    posiciones = []
+    y = MARGEN_MOSAICO
+    for recorte in recortes:
+        alto_recorte, ancho_recorte = recorte.shape[:2]
+        mosaico[y:y + alto_recorte, MARGEN_MOSAICO:MARGEN_MOSAICO + ancho_recorte] = recorte
+        posiciones.append((MARGEN_MOSAICO, y, ancho_recorte, alto_recorte))
+        y += alto_recorte + SEPARACION
+    return mosaico, posiciones
+
+
+def repartir_palabras(palabras, posiciones, tamano):
+    """Palabras relativas al mosaico -> una lista por recorte, relativas al recorte."""
+    ancho, alto = tamano
+    por_recorte = [[] for _ in posiciones]
+    for x0, y0, x1, y1, palabra, conf in palabras:
+        x0, x1, y0, y1 = x0 * ancho, x1 * ancho, y0 * alto, y1 * alto
+        centro = (y0 + y1) / 2
+        for n, (x, y, ancho_recorte, alto_recorte) in enumerate(posiciones):
+            # La franja de separacion se reparte entre los dos recortes vecinos
+            if y - SEPARACION / 2 <= centro < y + alto_recorte + SEPARACION / 2:
+                por_recorte[n].append((
+                    round(min(max((x0 - x) / ancho_recorte, 0.0), 1.0), 4),
+                    round(min(max((y0 - y) / alto_recorte, 0.0), 1.0), 4),
+                    round(min(max((x1 - x) / ancho_recorte, 0.0), 1.0), 4),
+                    round(min(max((y1 - y) / alto_recorte, 0.0), 1.0), 4),
+                    palabra, conf))
+                break
+    return por_recorte
+
+
+def _tandas(recortes):
+    """Indices de los recortes agrupados en tandas de hasta MAX_ALTO_MOSAICO px."""
+    tanda, alto = [], 0
+    for n, recorte in enumerate(recortes):
+        if tanda and alto + recorte.shape[0] > MAX_ALTO_MOSAICO:
+            yield tanda
+            tanda, alto = [], 0
+        tanda.append(n)
+        alto += recorte.shape[0] + SEPARACION
+    if tanda:
+        yield tanda
+
+
+def reconocer_mosaico(recortes, reconocer):
+    """OCR de varios recortes con una llamada a `reconocer` por mosaico.
+
+    `reconocer(imagen)` devuelve (texto, palabras) con palabras relativas a la
+    imagen, como ocr_tesseract.reconocer. Devuelve un (texto, palabras) por
+    recorte, en el mismo orden, con el texto armado por lineas a partir de sus
+    palabras y las palabras relativas al recorte.
+    """
+    resultados = [("", [])] * len(recortes)
+    for tanda in _tandas(recortes):
+        mosaico, posiciones = armar_mosaico([recortes[n] for n in tanda])
+        _, palabras = reconocer(mosaico)
+        repartidas = repartir_palabras(palabras, posiciones, (mosaico.shape[1], mosaico.shape[0]))
+        for n, palabras_recorte in zip(tanda, repartidas):
+            resultados[n] = (texto_de_palabras(palabras_recorte), palabras_recorte)
+    return resultados
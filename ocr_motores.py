@@ -0,0 +1,253 @@
+import os
+import sys
+import threading
+import cv2
+import numpy as np
+
+# --- Motores OCR neuronales (PaddleOCR, TrOCR) ---
+# Se cargan en el primer uso: importar este modulo no descarga ni inicializa modelos.
+# Con OCR_ONNX=1 corren sobre ONNX Runtime (ocr_onnx) en lugar de PyTorch / Paddle.
+
+USAR_ONNX = os.environ.get("OCR_ONNX", "0") == "1"
+
+TROCR_MODELO = "microsoft/trocr-base-handwritten"
+
+# TrOCR reconoce una sola linea de texto: la pagina (o cada region) se corta en
+# lineas con OpenCV y los recortes se pasan a generate() de a tandas.
+TROCR_LOTE = int(os.environ.get("OCR_TROCR_LOTE", "16"))       # lineas por llamada a generate()
+TROCR_HILOS = int(os.environ.get("OCR_TROCR_HILOS", "0"))      # hilos de torch en CPU (0: los de torch)
+TROCR_INT8 = os.environ.get("OCR_TROCR_INT8", "0") == "1"      # int8 dinamico de las capas lineales (PyTorch)
+TROCR_MAX_TOKENS = 48                                          # una linea de factura no pasa de ~40 tokens
+
+# Segmentacion en lineas sobre la pagina en grises
+ALTO_MIN_LINEA = 8         # px; menos es ruido o una regla
+ANCHO_MIN_LINEA = 6
+ABERTURA_PALABRAS = 0.02   # fraccion del ancho: une letras y palabras pero no columnas
+LARGO_REGLA = 0.02         # fraccion del ancho: trazos rectos mas largos son reglas o recuadros
+
+PADDLE_PARAMETROS = {"lang": "es", "use_textline_orientation": True}
+
+# Motores cargados por backend (True: ONNX Runtime)
+_paddle = {}
+_trocr = {}
+# Una sola carga por motor aunque lo pidan a la vez la ventana y el precalentamiento
+_carga = threading.RLock()
+
+
+def _cargar_paddle(onnx=None):
+    onnx = USAR_ONNX if onnx is None else onnx
+    with _carga:
+        if onnx not in _paddle:
+            if onnx:
+                from ocr_onnx import cargar_paddle
+                _paddle[onnx] = cargar_paddle(**PADDLE_PARAMETROS)
+            else:
+                from paddleocr import PaddleOCR
+                _paddle[onnx] = PaddleOCR(**PADDLE_PARAMETROS)
+        return _paddle[onnx]
+
+
+def _cargar_trocr(onnx=None):
+    """(processor, model, device) de TrOCR; `onnx` None: segun OCR_ONNX."""
+    onnx = USAR_ONNX if onnx is None else onnx
+    with _carga:
+        if onnx not in _trocr:
+            _trocr[onnx] = _crear_trocr(onnx)
+        return _trocr[onnx]
+
+
+def _crear_trocr(onnx):
+    if onnx:
+        from ocr_onnx import cargar_trocr
+        return cargar_trocr(TROCR_MODELO)
+    import torch
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if TROCR_HILOS:
+        torch.set_num_threads(TROCR_HILOS)
+    processor = TrOCRProcessor.from_pretrained(TROCR_MODELO)
+    model = VisionEncoderDecoderModel.from_pretrained(TROCR_MODELO)
+    model.eval()
+    if TROCR_INT8 and device == "cpu":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return processor, model.to(device), device
+
+
+def paddle_reconocer(pil_image, onnx=None):
+    """Texto y lineas con posicion (x0, y0, x1, y1, texto, confianza) relativas a la imagen."""
+    img = cv2.cvtColor(np.array(pil_image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    alto, ancho = img.shape[:2]
+    result = _cargar_paddle(onnx).ocr(img)
+
+    lines = []
+    cajas = []
+    for block in result or []:
+        for line in block or []:
+            texto, conf = line[1][0], line[1][1]
+            xs = [p[0] for p in line[0]]
+            ys = [p[1] for p in line[0]]
+            lines.append(texto)
+            cajas.append((round(min(xs) / ancho, 4), round(min(ys) / alto, 4),
+                          round(max(xs) / ancho, 4), round(max(ys) / alto, 4), texto, round(conf * 100, 1)))
+
+    return "\n".join(lines), cajas
+
+
+def paddle_ocr_image(pil_image):
+    return paddle_reconocer(pil_image)[0]
+
+
+def segmentar_lineas(gray, caja=None):
+    """Cajas (x0, y0, x1, y1) en px de los renglones de texto, de arriba hacia abajo.
+
+    La tinta se une en horizontal con una abertura chica (letras y palabras de una
+    misma linea, no las columnas separadas). Con `caja` (relativa) solo dentro de ella.
+    """
+    alto, ancho = gray.shape
+    x0, y0, x1, y1 = (0.0, 0.0, 1.0, 1.0) if caja is None else caja
+    ox, oy = int(x0 * ancho), int(y0 * alto)
+    zona = gray[oy:int(y1 * alto), ox:int(x1 * ancho)]
+    if zona.size == 0:
+        return []
+    tinta = cv2.threshold(zona, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    # Sin reglas ni recuadros: unirian todo lo que encierran en un solo contorno
+    for forma in ((max(int(ancho * LARGO_REGLA), 3), 1), (1, max(int(ancho * LARGO_REGLA), 3))):
+        reglas = cv2.morphologyEx(tinta, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, forma))
+        tinta = cv2.subtract(tinta, reglas)
+    union = cv2.getStructuringElement(cv2.MORPH_RECT, (max(int(ancho * ABERTURA_PALABRAS), 3), 1))
+    contornos, _ = cv2.findContours(cv2.dilate(tinta, union), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    lineas = []
+    for contorno in contornos:
+        x, y, w, h = cv2.boundingRect(contorno)
+        # Un contorno alto son varios renglones que se tocaron: se separan por las filas sin tinta
+        for y0, y1 in _filas_con_tinta(tinta[y:y + h, x:x + w]):
+            columnas = np.flatnonzero(tinta[y + y0:y + y1, x:x + w].any(axis=0))
+            x0, x1 = x + columnas[0], x + columnas[-1] + 1
+            if y1 - y0 >= ALTO_MIN_LINEA and x1 - x0 >= max(ANCHO_MIN_LINEA, (y1 - y0) / 2):
+                lineas.append((ox + int(x0), oy + y + y0, ox + int(x1), oy + y + y1))
+    return sorted(lineas, key=lambda linea: (linea[1], linea[0]))
+
+
+def _filas_con_tinta(tinta):
+    """Tramos (y0, y1) de filas seguidas con tinta."""
+    filas = np.concatenate(([0], tinta.any(axis=1).astype(np.int8), [0]))
+    cambios = np.flatnonzero(np.diff(filas))
+    return list(zip(cambios[::2], cambios[1::2]))
+
+
+def _renglones(cajas):
+    """Agrupa las cajas (x0, y0, x1, y1, texto, conf) en renglones (centro dentro del primero)."""
+    renglones = []
+    for caja in sorted(cajas, key=lambda c: (c[1], c[0])):
+        centro = (caja[1] + caja[3]) / 2
+        if renglones and renglones[-1][0][1] <= centro <= renglones[-1][0][3]:
+            renglones[-1].append(caja)
+        else:
+            renglones.append([caja])
+    return "\n".join(" ".join(c[4] for c in sorted(renglon, key=lambda c: c[0])) for renglon in renglones)
+
+
+def trocr_lineas(recortes, onnx=None):
+    """Texto y confianza (0-100) de cada recorte RGB de una linea, en tandas de TROCR_LOTE."""
+    import torch
+    processor, model, device = _cargar_trocr(onnx)
+    resultados = []
+    for inicio in range(0, len(recortes), TROCR_LOTE):
+        tanda = recortes[inicio:inicio + TROCR_LOTE]
+        pixel_values = processor(images=tanda, return_tensors="pt").pixel_values.to(device)
+        with torch.inference_mode():
+            salida = model.generate(pixel_values, max_new_tokens=TROCR_MAX_TOKENS,
+                                    return_dict_in_generate=True, output_scores=True)
+            puntajes = model.compute_transition_scores(salida.sequences, salida.scores, normalize_logits=True)
+        textos = processor.batch_decode(salida.sequences, skip_special_tokens=True)
+        # Confianza: probabilidad media de los tokens generados, sin el relleno de las lineas
+        # que terminaron antes que las demas de la tanda
+        generados = salida.sequences[:, -puntajes.shape[1]:]
+        relleno = generados == processor.tokenizer.pad_token_id
+        probabilidades = torch.exp(puntajes).masked_fill(relleno, float("nan"))
+        for texto, fila in zip(textos, probabilidades):
+            resultados.append((texto.strip(), round(float(torch.nanmean(fila)) * 100, 1)))
+    return resultados
+
+
+def trocr_reconocer(image, cajas=None, onnx=None):
+    """Texto y lineas con posicion (x0, y0, x1, y1, texto, confianza) relativas a la imagen.
+
+    La imagen (PIL o array) se corta en lineas (en toda la pagina o en cada caja
+    relativa de `cajas`, p. ej. las regiones de una plantilla) y cada linea se
+    reconoce por separado.
+    """
+    rgb = np.asarray(image.convert("RGB")) if hasattr(image, "convert") else image
+    if rgb.ndim == 2:
+        rgb = cv2.cvtColor(rgb, cv2.COLOR_GRAY2RGB)
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    alto, ancho = gray.shape
+    lineas = [linea for caja in (cajas or [None]) for linea in segmentar_lineas(gray, caja)]
+    if not lineas:
+        return "", []
+    from PIL import Image
+    recortes = [Image.fromarray(rgb[y0:y1, x0:x1]) for x0, y0, x1, y1 in lineas]
+    resultado = []
+    for (x0, y0, x1, y1), (texto, conf) in zip(lineas, trocr_lineas(recortes, onnx)):
+        if texto:
+            resultado.append((round(x0 / ancho, 4), round(y0 / alto, 4), round(x1 / ancho, 4),
+                              round(y1 / alto, 4), texto, conf))
+    return _renglones(resultado), resultado
+
+
+def trocr_ocr_image(pil_image):
+    return trocr_reconocer(pil_image)[0]
+
+
+# --- Registro de motores ---
+# Cada motor se importa e inicializa en su primer uso. Las ventanas pueden adelantar
+# la carga en un hilo de fondo apenas se muestran (precalentar): si se procesa antes
+# de que termine, se espera esa misma carga en lugar de repetirla.
+# OCR_PRECALENTAR=0 deja la carga para el primer uso.
+
+PRECALENTAR = os.environ.get("OCR_PRECALENTAR", "1") != "0"
+
+CARGADORES = {"paddle": _cargar_paddle, "trocr": _cargar_trocr}
+_CARGADOS = {"paddle": _paddle, "trocr": _trocr}
+
+
+def _calentar_paddle():
+    from PIL import Image
+    paddle_reconocer(Image.new("RGB", (320, 64), "white"))
+
+
+def _calentar_trocr():
+    from PIL import Image
+    trocr_lineas([Image.new("RGB", (256, 32), "white")])
+
+
+# Carga mas una inferencia de prueba (reserva memoria y elige kernels)
+_CALENTADORES = {"paddle": _calentar_paddle, "trocr": _calentar_trocr}
+
+
+def motor_cargado(nombre) -> bool:
+    """True si el motor ya esta en memoria (con el backend de OCR_ONNX)."""
+    return USAR_ONNX in _CARGADOS[nombre]
+
+
+def obtener_motor(nombre):
+    """Motor neuronal por nombre, importado e inicializado en el primer uso."""
+    return CARGADORES[nombre]()
+
+
+def precalentar(*nombres):
+    """Carga los motores `nombres` en un hilo de fondo; devuelve el hilo (None si esta desactivado)."""
+    if not PRECALENTAR:
+        return None
+
+    def calentar():
+        for nombre in nombres:
+            try:
+                _CALENTADORES[nombre]()
+            except Exception as exc:
+                # El error vuelve a aparecer, con la ventana, en el primer uso real
+                print(f"No se pudo precargar {nombre}: {exc}", file=sys.stderr)
+
+    hilo = threading.Thread(target=calentar, name="precalentar", daemon=True)
+    hilo.start()
+    return hilo
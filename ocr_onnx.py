@@ -0,0 +1,108 @@
+import json
+import os
+from ocr_cache import CACHE_DIR
+
+# --- Motores neuronales sobre ONNX Runtime ---
+# En los servidores sin GPU, TrOCR en PyTorch eager y PaddleOCR con su runtime por
+# defecto son mucho mas lentos que el mismo modelo exportado a ONNX y corrido con
+# ONNX Runtime: el grafo se optimiza una vez (fusion de capas, constantes plegadas)
+# y cada sesion usa un numero fijo de hilos en lugar de competir por todos los
+# nucleos con los workers. La exportacion se hace la primera vez y queda en disco.
+#
+# Requiere onnxruntime; para exportar TrOCR, optimum, y para PaddleOCR, paddle2onnx.
+
+CARPETA_ONNX = os.environ.get("OCR_ONNX_DIR", os.path.join(CACHE_DIR, "onnx"))
+# Hilos de cada operador (intra-op); los operadores se corren en secuencia
+HILOS_ONNX = int(os.environ.get("OCR_ONNX_HILOS", "4"))
+OPSET_PADDLE = 11
+
+
+def opciones_sesion():
+    """Opciones de sesion: todas las optimizaciones de grafo y HILOS_ONNX hilos por operador."""
+    import onnxruntime as ort
+    opciones = ort.SessionOptions()
+    opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opciones.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opciones.intra_op_num_threads = HILOS_ONNX
+    opciones.inter_op_num_threads = 1
+    return opciones
+
+
+def sesion(ruta):
+    """Sesion de ONNX Runtime en CPU para un modelo exportado."""
+    import onnxruntime as ort
+    return ort.InferenceSession(ruta, sess_options=opciones_sesion(), providers=["CPUExecutionProvider"])
+
+
+def _carpeta(*partes):
+    carpeta = os.path.join(CARPETA_ONNX, *partes)
+    os.makedirs(os.path.dirname(carpeta), exist_ok=True)
+    return carpeta
+
+
+# --- TrOCR ---
+
+def cargar_trocr(modelo):
+    """(processor, modelo, "cpu") de TrOCR sobre ONNX Runtime, como ocr_motores._cargar_trocr.
+
+    El modelo (encoder y decoder con cache de claves/valores) se exporta con optimum
+    la primera vez; ORTModelForVision2Seq expone el mismo generate() que el de PyTorch.
+    """
+    from optimum.onnxruntime import ORTModelForVision2Seq
+    from transformers import TrOCRProcessor
+    carpeta = _carpeta("trocr", modelo.replace("/", "--"))
+    if not os.path.exists(os.path.join(carpeta, "config.json")):
+        exportado = ORTModelForVision2Seq.from_pretrained(modelo, export=True)
+        exportado.save_pretrained(carpeta)
+        TrOCRProcessor.from_pretrained(modelo).save_pretrained(carpeta)
+    processor = TrOCRProcessor.from_pretrained(carpeta)
+    model = ORTModelForVision2Seq.from_pretrained(carpeta, session_options=opciones_sesion(),
+                                                  provider="CPUExecutionProvider")
+    return processor, model, "cpu"
+
+
+# --- PaddleOCR ---
+# PaddleOCR corre modelos ONNX con use_onnx=True (deteccion, orientacion de linea y
+# reconocimiento), pero crea las sesiones sin opciones: se exportan sus modelos de
+# inferencia con paddle2onnx y despues se reemplazan sus sesiones por las nuestras.
+
+_PREDICTORES_PADDLE = {"det": "text_detector", "rec": "text_recognizer", "cls": "text_classifier"}
+
+
+def _exportar_paddle(carpeta_modelo, destino):
+    import paddle2onnx
+    paddle2onnx.export(os.path.join(carpeta_modelo, "inference.pdmodel"),
+                       os.path.join(carpeta_modelo, "inference.pdiparams"),
+                       destino, opset_version=OPSET_PADDLE)
+
+
+def cargar_paddle(**parametros):
+    """PaddleOCR(**parametros) con sus modelos sobre ONNX Runtime (exportados la primera vez)."""
+    from paddleocr import PaddleOCR
+    indice = _carpeta("paddle", "modelos.json")
+    clave = json.dumps(parametros, sort_keys=True)
+    modelos = {}
+    if os.path.exists(indice):
+        with open(indice, encoding="utf-8") as f:
+            modelos = json.load(f)
+    rutas = modelos.get(clave)
+    if rutas is None or not all(os.path.exists(ruta) for ruta in rutas.values()):
+        # Primera vez: PaddleOCR descarga sus modelos de inferencia y se exportan a ONNX
+        original = PaddleOCR(**parametros)
+        rutas = {}
+        for tipo in _PREDICTORES_PADDLE:
+            carpeta_modelo = getattr(original.args, f"{tipo}_model_dir")
+            nombre = os.path.basename(os.path.normpath(carpeta_modelo))
+            rutas[tipo] = _carpeta("paddle", f"{tipo}-{nombre}.onnx")
+            if not os.path.exists(rutas[tipo]):
+                _exportar_paddle(carpeta_modelo, rutas[tipo])
+        modelos[clave] = rutas
+        with open(indice, "w", encoding="utf-8") as f:
+            json.dump(modelos, f, indent=1)
+    ocr = PaddleOCR(**parametros, use_onnx=True, use_angle_cls=parametros.get("use_textline_orientation", False),
+                    **{f"{tipo}_model_dir": ruta for tipo, ruta in rutas.items()})
+    for tipo, atributo in _PREDICTORES_PADDLE.items():
+        predictor = getattr(ocr, atributo, None)
+        if predictor is not None:
+            predictor.predictor = sesion(rutas[tipo])
+    return ocr
@@ -0,0 +1,204 @@
+import atexit
+import glob
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from ocr_pipeline import (aplicar_emisores, artefacto_repetido, extraer_datos, plantilla_de, procesar_pagina,
+                          revisar_pagina, texto_de, usa_qr, version_ocr, version_pipeline)
+from ocr_visual import DetectorRepetidas
+
+# --- OCR en paralelo por pagina y por archivo ---
+
+# Cantidad de procesos; OCR_WORKERS=1 procesa todo en el proceso actual
+WORKERS = int(os.environ.get("OCR_WORKERS", "0")) or os.cpu_count() or 1
+# Hilos OpenMP/OpenCV por worker: Tesseract usa ~1 nucleo por pagina, mas hilos solo compiten
+HILOS_POR_WORKER = int(os.environ.get("OCR_HILOS_POR_WORKER", "1"))
+# Paginas en blanco y copias (DUPLICADO, TRIPLICADO) de una anterior: no se OCRean (OCR_REPETIDAS=0 las OCRea)
+DETECTAR_REPETIDAS = os.environ.get("OCR_REPETIDAS", "1") != "0"
+
+EXTENSIONES = (".pdf", ".png", ".jpg", ".jpeg")
+
+_pool = None
+_pool_workers = None
+# La cola de las ventanas pide el pool desde varios hilos a la vez
+_pool_lock = threading.Lock()
+
+
+def _inicializar_worker(hilos):
+    os.environ["OMP_THREAD_LIMIT"] = str(hilos)
+    os.environ["OMP_NUM_THREADS"] = str(hilos)
+    import cv2
+    cv2.setNumThreads(hilos)
+
+
+def obtener_pool(workers=None):
+    """Pool compartido entre archivos: los workers conservan sus motores Tesseract cargados."""
+    global _pool, _pool_workers
+    workers = workers or WORKERS
+    with _pool_lock:
+        if _pool is not None and _pool_workers == workers:
+            return _pool
+        cerrar_pool()
+        # Los workers heredan el entorno al crearse: el limite tiene que estar antes de cargar Tesseract
+        os.environ["OMP_THREAD_LIMIT"] = str(HILOS_POR_WORKER)
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                                    initargs=(HILOS_POR_WORKER,))
+        _pool_workers = workers
+        return _pool
+
+
+def cerrar_pool():
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_workers = None
+
+
+atexit.register(cerrar_pool)
+
+
+def expandir_entradas(entradas):
+    """Archivos a procesar a partir de carpetas, patrones glob y rutas sueltas (sin repetir)."""
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = sorted(os.path.join(entrada, n) for n in os.listdir(entrada))
+        elif glob.has_magic(entrada):
+            candidatos = sorted(glob.glob(entrada, recursive=True))
+        else:
+            candidatos = [entrada]
+        for ruta in candidatos:
+            if ruta.lower().endswith(EXTENSIONES) and os.path.isfile(ruta) and ruta not in rutas:
+                rutas.append(ruta)
+    return rutas
+
+
+def tareas_de_archivos(rutas):
+    """Lista de (ruta, indice) con una tarea por pagina de cada PDF y una por imagen."""
+    from ocr_render import contar_paginas
+    tareas = []
+    for ruta in rutas:
+        if ruta.lower().endswith(".pdf"):
+            tareas.extend((ruta, i) for i in range(contar_paginas(ruta, "pymupdf")))
+        else:
+            tareas.append((ruta, None))
+    return tareas
+
+
+def procesar_en_paralelo(tareas, extractor="factura", dpi=300, workers=None, motor="tesseract",
+                         cache=None, plantilla=None, tolerar_errores=False):
+    """Procesa las tareas (ruta, indice) en el pool.
+
+    Genera (ruta, indice, texto, datos) en el mismo orden de `tareas`, asi los
+    `_pag_N` salen igual que en el procesamiento secuencial. Con `cache`
+    (ocr_cache.CacheResultados) las paginas ya procesadas no se vuelven a OCRear:
+    se devuelve el resultado guardado o, si solo cambiaron las reglas de
+    extraccion, se re-extrae desde el artefacto de OCR archivado. `plantilla`
+    limita el OCR de los escaneos a las regiones de ese tipo de documento.
+    Las paginas en blanco y las copias de una pagina anterior del mismo PDF no
+    se OCRean: la copia repite el resultado de la original (ver
+    ocr_visual.DetectorRepetidas). Sin `cache` tampoco se usan ni aprenden los
+    layouts por emisor. Con `tolerar_errores` una pagina que falla no corta el
+    lote: se genera (ruta, indice, None, excepcion) y se sigue con las demas.
+    """
+    workers = workers or WORKERS
+    version = version_pipeline(extractor, dpi, motor, plantilla)
+    version_art = version_ocr(dpi, motor, usa_qr(extractor, motor), plantilla_de(extractor, plantilla))
+    paginas = {}
+    for ruta, _ in tareas:
+        paginas[ruta] = paginas.get(ruta, 0) + 1
+
+    # Consultar la cache primero; solo lo que falta va al pool
+    claves = [None] * len(tareas)
+    guardados = {}
+    if cache is not None:
+        for n, (ruta, indice) in enumerate(tareas):
+            try:
+                claves[n] = (cache.huella(ruta), -1 if indice is None else indice)
+                resultado = cache.obtener(*claves[n], version)
+                if resultado is None:
+                    artefacto = cache.obtener_artefacto(*claves[n], version_art)
+                    if artefacto is not None:
+                        resultado = (texto_de(artefacto), extraer_datos(artefacto, extractor))
+                        cache.guardar(*claves[n], version, *resultado)
+            except Exception:
+                if not tolerar_errores:
+                    raise
+                # Archivo ilegible: el error se informa al procesar la pagina
+                claves[n] = resultado = None
+            if resultado is not None:
+                guardados[n] = resultado
+
+    # PDFs con paginas por OCRear: cada pagina se compara con las anteriores del mismo
+    # archivo, tambien con las ya guardadas (pueden ser la original de una copia)
+    revisar = {ruta for n, (ruta, indice) in enumerate(tareas)
+               if DETECTAR_REPETIDAS and n not in guardados and indice is not None and paginas[ruta] > 1}
+    pool = obtener_pool(workers) if workers > 1 else None
+    futuros = {}
+    repetidas = {}      # n -> ("blanca", None) o ("copia", n de la original)
+    try:
+        # Las paginas nuevas van al pool apenas se revisan: el OCR arranca mientras se revisan las siguientes
+        detector, numeros = None, {}
+        for n, (ruta, indice) in enumerate(tareas):
+            if ruta in revisar:
+                if ruta not in numeros:
+                    detector, numeros = DetectorRepetidas(), {ruta: {}}
+                numeros[ruta][indice] = n
+                try:
+                    repetida = revisar_pagina(detector, ruta, indice, motor)
+                except Exception:
+                    if not tolerar_errores:
+                        raise
+                    repetida = None
+                if repetida:
+                    motivo, original = repetida
+                    if n not in guardados:
+                        repetidas[n] = (motivo, None if original is None else numeros[ruta][original])
+                    continue
+            if pool is not None and n not in guardados:
+                futuros[n] = pool.submit(procesar_pagina, ruta, indice, extractor, dpi, motor, plantilla,
+                                         cache is not None)
+
+        # Artefactos de las originales de alguna copia, para repetir su resultado
+        originales = {original for _, original in repetidas.values() if original is not None}
+        artefactos = {}
+        for n, (ruta, indice) in enumerate(tareas):
+            if n in guardados:
+                if n in originales:
+                    artefactos[n] = cache.obtener_artefacto(*claves[n], version_art) or {
+                        "texto": guardados[n][0], "palabras": [], "qr": None, "origen": "ocr"}
+                yield (ruta, indice) + guardados[n]
+                continue
+            try:
+                if n in repetidas:
+                    motivo, original = repetidas[n]
+                    if original is None:
+                        artefacto = artefacto_repetido(motivo)
+                    else:
+                        # KeyError si la original fallo: la copia se informa como error
+                        artefacto = artefacto_repetido(motivo, artefactos[original], tareas[original][1])
+                    texto, datos = texto_de(artefacto), extraer_datos(artefacto, extractor)
+                elif n in futuros:
+                    texto, datos, artefacto = futuros[n].result()
+                else:
+                    texto, datos, artefacto = procesar_pagina(ruta, indice, extractor, dpi, motor, plantilla,
+                                                              cache is not None)
+            except Exception as exc:
+                if not tolerar_errores:
+                    raise
+                yield ruta, indice, None, exc
+                continue
+            # Los layouts por emisor los escribe solo este proceso; sin cache no se aprenden
+            if cache is not None:
+                aplicar_emisores(cache, artefacto)
+            artefacto.pop("emisores_pendientes", None)
+            if n in originales:
+                artefactos[n] = artefacto
+            if claves[n] is not None:
+                cache.guardar_artefacto(*claves[n], version_art, ruta, paginas[ruta], artefacto)
+                cache.guardar(*claves[n], version, texto, datos)
+            yield ruta, indice, texto, datos
+    finally:
+        for futuro in futuros.values():
+            futuro.cancel()
@@ -0,0 +1,220 @@
+import ctypes
+import io
+import re
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+# --- Capa de texto nativa ---
+
+# Minimo de caracteres utiles para confiar en la capa de texto de una pagina
+MIN_CARACTERES = 40
+# Proporcion minima de caracteres "normales" (letras, digitos, puntuacion comun)
+MIN_PROPORCION_VALIDA = 0.85
+# Una imagen sin texto encima que ocupe mas de esta fraccion de la pagina se OCRea aparte
+MIN_AREA_REGION = 0.15
+
+_CARACTER_VALIDO = re.compile(r"[\wÁÉÍÓÚÜÑáéíóúüñ°º$%&/().,:;+\-*#'\"@\s]")
+
+
+def texto_es_valido(texto: str) -> bool:
+    """Descarta capas de texto vacias o basura (fuentes sin ToUnicode, glifos sueltos)."""
+    util = texto.strip()
+    if len(util) < MIN_CARACTERES or "�" in util:
+        return False
+    validos = len(_CARACTER_VALIDO.findall(util))
+    return validos / len(util) >= MIN_PROPORCION_VALIDA
+
+
+def leer_capa_texto(page):
+    """Devuelve el texto nativo de la pagina y sus palabras con posicion.
+
+    Cada palabra es una tupla (x0, y0, x1, y1, palabra, bloque, linea, nro) en puntos PDF.
+    """
+    texto = page.get_text("text", sort=True)
+    palabras = page.get_text("words", sort=True)
+    return texto, palabras
+
+
+def pagina_escaneada(page) -> bool:
+    """True si la pagina no tiene una capa de texto aprovechable."""
+    return not texto_es_valido(page.get_text("text", sort=True))
+
+
+def regiones_sin_texto(page, palabras):
+    """Rectangulos de imagenes grandes que no tienen texto nativo encima (escaneos pegados, fotos)."""
+    area_pagina = abs(page.rect)
+    regiones = []
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if rect.is_empty or abs(rect) / area_pagina < MIN_AREA_REGION:
+            continue
+        if any(fitz.Rect(p[:4]).intersects(rect) for p in palabras):
+            continue
+        regiones.append(rect)
+    return regiones
+
+
+# --- Imagen embebida de las paginas escaneadas ---
+# Un escaneo suele ser una pagina con una sola imagen (JPEG, CCITT, JBIG2) que la
+# cubre entera. En lugar de renderizar la pagina (MuPDF decodifica la imagen en
+# color y la vuelve a muestrear) se decodifica la imagen sola: los JPEG directo en
+# grises y, si su resolucion sobra, reducidos en la misma decodificacion (draft de
+# libjpeg, 1/2 a 1/8). El resultado tiene el tamano del render a ese DPI.
+
+# Diferencia tolerada entre la imagen y la pagina, por borde (fraccion del lado mayor)
+TOLERANCIA_IMAGEN = 0.01
+_GIROS_CV = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+_GIROS_PIL = {90: Image.Transpose.ROTATE_270, 180: Image.Transpose.ROTATE_180, 270: Image.Transpose.ROTATE_90}
+
+
+def imagen_de_escaneo(page):
+    """xref de la unica imagen de la pagina si la cubre entera sin nada encima, o None."""
+    # Lo que dibuja la pagina, sin decodificar nada: una sola imagen, sin texto ni trazos
+    dibujado = page.get_bboxlog()
+    if page.first_annot is not None or len(dibujado) != 1 or dibujado[0][0] != "fill-image":
+        return None
+    imagenes = page.get_images(full=True)
+    infos = page.get_image_info()
+    if len(imagenes) != 1 or len(infos) != 1:
+        return None
+    xref, _, ancho, alto = imagenes[0][:4]
+    a, b, c, d, _, _ = infos[0]["transform"]
+    if b or c or a <= 0 or d <= 0 or (infos[0]["width"], infos[0]["height"]) != (ancho, alto):
+        return None     # girada o espejada dentro de la pagina
+    caja, pagina = fitz.Rect(infos[0]["bbox"]), page.cropbox
+    tolerancia = TOLERANCIA_IMAGEN * max(pagina.width, pagina.height)
+    if any(abs(x - y) > tolerancia for x, y in zip(caja, pagina)):
+        return None
+    doc = page.parent
+    if any(doc.xref_get_key(xref, clave)[0] != "null" for clave in ("SMask", "Mask", "ImageMask", "Decode")):
+        return None
+    return xref
+
+
+def _jpeg(doc, xref):
+    """La imagen PIL sin decodificar si el stream es un JPEG en grises o RGB (no CMYK), o None."""
+    if doc.xref_get_key(xref, "Filter") != ("name", "/DCTDecode"):
+        return None
+    image = Image.open(io.BytesIO(doc.xref_stream_raw(xref)))
+    return image if image.mode in ("L", "RGB") else None
+
+
+def imagen_escaneada(page, dpi=300, gris=True):
+    """La imagen de una pagina escaneada (ver `imagen_de_escaneo`) al tamano del render a `dpi`.
+
+    Devuelve un array en grises (`gris`) o una imagen PIL RGB, o None si la pagina
+    no es una sola imagen y hay que renderizarla.
+    """
+    xref = imagen_de_escaneo(page)
+    if xref is None:
+        return None
+    doc = page.parent
+    # Mismo tamano que el Pixmap de get_pixmap a este DPI
+    irect = (page.cropbox * fitz.Matrix(dpi / 72, dpi / 72)).irect
+    tamano = (irect.width, irect.height)
+    modo = "L" if gris else "RGB"
+    image = _jpeg(doc, xref)
+    if image is not None:
+        # El draft decodifica a la escala mas chica que no baje de `tamano`
+        image.draft(modo, tamano)
+        image = image.convert(modo)
+    else:
+        pix = fitz.Pixmap(doc, xref)
+        if pix.colorspace is None:
+            return None
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        espacio = fitz.csGRAY if gris else fitz.csRGB
+        if pix.colorspace.n != espacio.n:
+            pix = fitz.Pixmap(espacio, pix)
+        image = Image.frombytes(modo, (pix.width, pix.height), pix.samples)
+    if gris:
+        gray = np.asarray(image)
+        if gray.shape[::-1] != tamano:
+            achicar = gray.shape[1] > tamano[0]
+            gray = cv2.resize(gray, tamano, interpolation=cv2.INTER_AREA if achicar else cv2.INTER_LINEAR)
+        return cv2.rotate(gray, _GIROS_CV[page.rotation]) if page.rotation in _GIROS_CV else gray
+    if image.size != tamano:
+        image = image.resize(tamano, Image.BILINEAR)
+    return image.transpose(_GIROS_PIL[page.rotation]) if page.rotation in _GIROS_PIL else image
+
+
+def renderizar(page, dpi=300, clip=None) -> Image.Image:
+    if clip is None:
+        image = imagen_escaneada(page, dpi, gris=False)
+        if image is not None:
+            return image
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def renderizar_gris(page, dpi=300, clip=None) -> np.ndarray:
+    """Renderiza en escala de grises directo a un array numpy (alto, ancho) uint8, sin copiar.
+
+    Una pagina escaneada se toma de la imagen embebida (`imagen_escaneada`).
+    """
+    if clip is None:
+        gray = imagen_escaneada(page, dpi)
+        if gray is not None:
+            return gray
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=fitz.csGRAY, alpha=False)
+    # samples_mv no retiene el Pixmap. numpy apunta el .base de cualquier vista (reshape,
+    # recorte, ascontiguousarray) al objeto que exporto el buffer: ese objeto es un array
+    # ctypes que guarda el Pixmap, asi vive mientras viva alguna vista
+    buffer = (ctypes.c_ubyte * (pix.stride * pix.height)).from_address(pix.samples_ptr)
+    buffer.pixmap = pix
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def franja_superior(page, fraccion):
+    """Rectangulo con la parte superior de la pagina (encabezado)."""
+    rect = fitz.Rect(page.rect)
+    rect.y1 = rect.y0 + rect.height * fraccion
+    return rect
+
+
+def palabras_relativas(page, palabras):
+    """Palabras de PyMuPDF como (x0, y0, x1, y1, palabra, confianza) relativas a la pagina."""
+    ancho, alto = page.rect.width, page.rect.height
+    return [(round(p[0] / ancho, 4), round(p[1] / alto, 4), round(p[2] / ancho, 4),
+             round(p[3] / alto, 4), p[4], 100.0) for p in palabras]
+
+
+def _palabras_de_region(page, rect, palabras):
+    """Pasa palabras relativas a un recorte `rect` a coordenadas relativas de la pagina."""
+    ancho, alto = page.rect.width, page.rect.height
+    fx0, fy0 = (rect.x0 - page.rect.x0) / ancho, (rect.y0 - page.rect.y0) / alto
+    fw, fh = rect.width / ancho, rect.height / alto
+    return [(round(fx0 + x0 * fw, 4), round(fy0 + y0 * fh, 4), round(fx0 + x1 * fw, 4),
+             round(fy0 + y1 * fh, 4), palabra, conf) for x0, y0, x1, y1, palabra, conf in palabras]
+
+
+def extraer_texto_pagina(page, ocr_imagen, dpi=300, gris=False):
+    """Texto de la pagina usando la capa nativa cuando sirve y OCR solo donde falta.
+
+    `ocr_imagen` recibe una imagen PIL (o un array en grises si `gris`) y devuelve
+    (texto, palabras) con las palabras relativas a esa imagen. Devuelve
+    (texto, palabras, origen) con las palabras relativas a la pagina y origen
+    "texto", "mixto" u "ocr".
+    """
+    render = renderizar_gris if gris else renderizar
+    texto, palabras = leer_capa_texto(page)
+    if not texto_es_valido(texto):
+        texto, palabras = ocr_imagen(render(page, dpi))
+        return texto, palabras, "ocr"
+
+    regiones = regiones_sin_texto(page, palabras)
+    palabras_pagina = palabras_relativas(page, palabras)
+    if not regiones:
+        return texto, palabras_pagina, "texto"
+
+    partes = [texto]
+    for rect in regiones:
+        texto_region, palabras_region = ocr_imagen(render(page, dpi, clip=rect))
+        partes.append(texto_region)
+        palabras_pagina.extend(_palabras_de_region(page, rect, palabras_region))
+    return "\n".join(partes), palabras_pagina, "mixto"
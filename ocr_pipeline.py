@@ -0,0 +1,687 @@
+import os
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+import ocr_tesseract
+from ocr_cache import CACHE_DIR, obtener_cache
+from ocr_clasificador import TIPO_DESCONOCIDO, TIPOS, clasificar_texto, es_factura, refinar_tipo
+from ocr_emisores import REGION_ENCABEZADO, aprender_layout, cajas_de_valor, layout_vigente, regiones_de_emisor
+from ocr_extraccion import CARACTERES_CAMPO, EXTRACTORES, campos_invalidos, leer_valor, requeridos_invalidos
+from ocr_mosaico import reconocer_mosaico
+from ocr_motores import TROCR_INT8, USAR_ONNX
+from ocr_pdf import (extraer_texto_pagina, franja_superior, leer_capa_texto, pagina_escaneada,
+                     palabras_relativas, regiones_sin_texto, renderizar, renderizar_gris, texto_es_valido)
+from ocr_plantillas import (PLANTILLA_DE_EXTRACTOR, PLANTILLAS, PSM_BLOQUE, PSM_LINEA, faltan_campos, ocr_de_regiones,
+                            ocr_por_regiones, recortar, regiones_de_campos)
+from ocr_qr import ocr_con_qr, datos_con_qr
+from ocr_visual import ANCHO_MINIATURA, DPI_HUELLA, IndiceVisual
+
+base_directory = os.path.dirname(os.path.abspath(__file__))
+
+# --- Procesamiento imagen ---
+
+# Deskew por perfil de proyeccion sobre una copia reducida de la pagina: las lineas
+# de texto alineadas con el eje dan el perfil horizontal mas "picudo".
+ANCHO_DESKEW = 1000        # px de ancho de la copia reducida
+ANGULO_MAX_DESKEW = 10.0   # grados buscados a cada lado
+PASO_DESKEW = 0.5          # barrido grueso
+PASO_FINO_DESKEW = 0.05    # refinamiento alrededor del mejor angulo grueso
+UMBRAL_DESKEW = 0.5        # por debajo no vale la pena rotar
+FRANJA_DESKEW = 8          # px de ancho de las franjas verticales en que se agrupa la tinta
+
+
+def _puntajes_perfil(ys, xs, pesos, angulos, alto):
+    """Suma de cuadrados del perfil horizontal de la tinta inclinada en cada angulo."""
+    tangentes = np.tan(np.radians(angulos))
+    margen = int(np.ceil(np.abs(tangentes).max() * (xs.max() + 1))) + 1
+    puntajes = np.empty(len(angulos))
+    for n, tangente in enumerate(tangentes):
+        filas = np.rint(ys - xs * tangente).astype(np.intp) + margen
+        perfil = np.bincount(filas, weights=pesos, minlength=alto + 2 * margen)
+        puntajes[n] = np.dot(perfil, perfil)
+    return puntajes
+
+
+def estimar_inclinacion(image) -> float:
+    """Grados a rotar (antihorario, como PIL) para enderezar la pagina."""
+    if isinstance(image, Image.Image):
+        # Reducir en PIL antes de pasar a numpy: copiar la pagina completa cuesta mas que estimar
+        factor = round(image.width / ANCHO_DESKEW)
+        if factor > 1:
+            image = image.reduce(factor)
+    gray = np.asarray(image)
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_RGB2GRAY)
+    if gray.shape[1] > ANCHO_DESKEW * 1.5:
+        escala = ANCHO_DESKEW / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+    # Tinta por fila en franjas verticales angostas: cada franja se desplaza como un bloque
+    alto, ancho = thresh.shape
+    columnas = ancho // FRANJA_DESKEW
+    if columnas == 0:
+        return 0.0
+    tinta = np.count_nonzero(
+        thresh[:, :columnas * FRANJA_DESKEW].reshape(alto, columnas, FRANJA_DESKEW), axis=2)
+    ys, cs = np.nonzero(tinta)
+    if len(ys) == 0:
+        return 0.0
+    pesos = tinta[ys, cs].astype(np.float64)
+    xs = (cs + 0.5) * FRANJA_DESKEW
+
+    gruesos = np.arange(-ANGULO_MAX_DESKEW, ANGULO_MAX_DESKEW + PASO_DESKEW / 2, PASO_DESKEW)
+    mejor = gruesos[np.argmax(_puntajes_perfil(ys, xs, pesos, gruesos, alto))]
+    finos = np.arange(mejor - PASO_DESKEW, mejor + PASO_DESKEW + PASO_FINO_DESKEW / 2, PASO_FINO_DESKEW)
+    return float(round(finos[np.argmax(_puntajes_perfil(ys, xs, pesos, finos, alto))], 2))
+
+
+def deskew_fast(gray: np.ndarray) -> np.ndarray:
+    """Endereza la pagina (array en grises) si esta inclinada mas de UMBRAL_DESKEW grados."""
+    angle = estimar_inclinacion(gray)
+    if abs(angle) <= UMBRAL_DESKEW:
+        return gray
+    # Rotacion antihoraria agrandando el lienzo para no recortar las esquinas
+    alto, ancho = gray.shape
+    matriz = cv2.getRotationMatrix2D((ancho / 2, alto / 2), angle, 1.0)
+    cos, sin = abs(matriz[0, 0]), abs(matriz[0, 1])
+    nuevo_ancho, nuevo_alto = int(alto * sin + ancho * cos), int(alto * cos + ancho * sin)
+    matriz[0, 2] += (nuevo_ancho - ancho) / 2
+    matriz[1, 2] += (nuevo_alto - alto) / 2
+    return cv2.warpAffine(gray, matriz, (nuevo_ancho, nuevo_alto), flags=cv2.INTER_CUBIC,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+
+def a_gris(image) -> np.ndarray:
+    """Array uint8 en grises a partir de una imagen PIL o un array (sin copiar si ya es gris)."""
+    if isinstance(image, Image.Image):
+        return np.asarray(image if image.mode == "L" else image.convert("L"))
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+def binarizar(gray):
+    # Thresholding for clean text
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+    )
+    
+    # Reduccion de ruido
+    return cv2.medianBlur(binary, 3)
+
+
+def preprocess_image(image):
+    """Refined preprocessing for OCR accuracy. Devuelve un array binarizado listo para Tesseract."""
+    # Deskew (todo en grises: el color no aporta al OCR) y binarizado
+    return binarizar(deskew_fast(a_gris(image)))
+
+
+def ocr_imagen(img, enderezada=False):
+    """Tesseract sobre la imagen preprocesada: (texto, palabras relativas a la imagen).
+
+    Con `enderezada` la imagen ya es la pagina en grises enderezada y solo se binariza.
+    """
+    return ocr_tesseract.reconocer(binarizar(img) if enderezada else preprocess_image(img))
+
+
+def reconocer_region(recorte, psm):
+    """Tesseract sobre un recorte de la pagina ya enderezada, binarizado por separado."""
+    return ocr_tesseract.reconocer(binarizar(recorte), psm=psm)
+
+
+# Varios recortes chicos en una sola llamada a Tesseract (ocr_mosaico; OCR_MOSAICO=0 los lee de a uno)
+USAR_MOSAICO = os.environ.get("OCR_MOSAICO", "1") != "0"
+
+
+def reconocer_regiones(recortes, psm, caracteres=None):
+    """Tesseract sobre varios recortes ya enderezados, cada uno binarizado por separado.
+
+    Los recortes de bloque (PSM_BLOQUE) se leen todos juntos en un mosaico; los de
+    otro modo (una linea, PSM_LINEA), sin mosaico o con un solo recorte, de a uno
+    con `psm`: el mosaico es un bloque de varias lineas y anularia el modo de una
+    sola linea. Un (texto, palabras) por recorte.
+    """
+    binarios = [binarizar(recorte) for recorte in recortes]
+    if USAR_MOSAICO and psm == PSM_BLOQUE and len(binarios) > 1:
+        return reconocer_mosaico(binarios, lambda mosaico: ocr_tesseract.reconocer(
+            mosaico, psm=PSM_BLOQUE, caracteres=caracteres))
+    return [ocr_tesseract.reconocer(binario, psm=psm, caracteres=caracteres) for binario in binarios]
+
+
+def ocr_regiones(img, plantilla, alineacion=None, enderezada=False):
+    """Tesseract solo sobre las regiones de la plantilla, cada una con su psm.
+
+    La pagina se endereza una vez entera (salvo que ya venga `enderezada`, en
+    grises); cada recorte se binariza por separado.
+    """
+    gray = img if enderezada else deskew_fast(a_gris(img))
+    return ocr_por_regiones(gray, plantilla, reconocer_region, alineacion, reconocer_regiones)
+
+
+def ocr_por_emisor(img, respaldo, emisor):
+    """Tesseract con el layout aprendido del emisor (ocr_emisores).
+
+    Se OCRea el encabezado para leer el CUIT y, si hay cajas guardadas para ese
+    emisor, solo esas; si no, `respaldo(gray, enderezada=True)` sobre la pagina ya
+    enderezada (ocr_imagen u ocr_regiones, sin volver a enderezarla). Cuando se
+    usa el layout, `emisor` queda con el CUIT y los campos que deberian aparecer.
+    """
+    gray = deskew_fast(a_gris(img))
+    texto, palabras = ocr_de_regiones(gray, [REGION_ENCABEZADO], reconocer_region)
+    cuit = EXTRACTORES["factura"](texto)["CUIT Remitente"]
+    layout = obtener_cache().obtener_emisor(cuit) if cuit != "No encontrado" else None
+    if layout is None:
+        return respaldo(gray, enderezada=True)
+    texto_campos, palabras_campos = ocr_de_regiones(gray, regiones_de_emisor(layout["cajas"]), reconocer_region,
+                                                    reconocer_lote=reconocer_regiones)
+    emisor.update(cuit=cuit, campos=layout["campos"])
+    return texto + "\n" + texto_campos, palabras + palabras_campos
+
+
+def _ocr_paddle(img):
+    from ocr_motores import paddle_reconocer
+    return paddle_reconocer(img)
+
+
+def _ocr_trocr(img):
+    from ocr_motores import trocr_reconocer
+    return trocr_reconocer(img)
+
+
+def _sin_ocr(img):
+    return "", []
+
+
+# Motor OCR por nombre; cada uno devuelve (texto, palabras).
+# "texto" usa solo la capa de texto del PDF y nunca OCRea.
+MOTORES = {
+    "tesseract": ocr_imagen,
+    "texto": _sin_ocr,
+    "paddle": _ocr_paddle,
+    "trocr": _ocr_trocr,
+}
+
+# Motores que reciben la pagina renderizada en grises como array (sin pasar por PIL ni RGB)
+MOTORES_GRIS = {"tesseract"}
+
+
+# --- Pipeline por pagina ---
+# Dos etapas: OCR (render, preprocesado, reconocimiento) produce un artefacto con
+# el texto crudo y las palabras con posicion; la extraccion de campos corre sobre
+# ese artefacto y se puede repetir sin volver a OCRear.
+
+# Subir al cambiar render, preprocesado u OCR: invalida los artefactos guardados
+VERSION_OCR = "3"
+# Subir al cambiar reglas de extraccion: alcanza con re-extraer desde los artefactos
+VERSION_EXTRACCION = "2"
+# Clasificacion de extractor "auto" (texto, referencias visuales, encabezado)
+VERSION_CLASIFICACION = "2"
+# Layouts aprendidos por emisor para facturas escaneadas (OCR_EMISORES=0 los desactiva)
+USAR_EMISORES = os.environ.get("OCR_EMISORES", "1") != "0"
+# DPI adaptativo para escaneos con Tesseract: primera pasada a DPI_BAJO y solo las regiones
+# de los campos que faltan o no validan a DPI_ALTO (OCR_DPI_ADAPTATIVO=0: todo al DPI pedido)
+USAR_DPI_ADAPTATIVO = os.environ.get("OCR_DPI_ADAPTATIVO", "1") != "0"
+DPI_BAJO = 200
+DPI_ALTO = 400
+# Subir al cambiar la relectura a DPI_ALTO o como se guarda en el artefacto
+VERSION_ADAPTATIVO = "3"
+# Margen horizontal (relativo a la pagina) del recorte de un valor numerico que se relee
+MARGEN_VALOR = 0.005
+
+
+def version_ocr(dpi=300, motor="tesseract", usar_qr=True, plantilla=None):
+    """Identifica la configuracion que produjo un artefacto de OCR."""
+    qr = "qr" if usar_qr else "sinqr"
+    version = f"ocr{VERSION_OCR}|{motor}|{dpi}dpi|{ocr_tesseract.modelo()}|{qr}"
+    if usa_plantilla(plantilla, motor):
+        version += f"|plantilla:{plantilla}"
+        if plantilla == "auto":
+            version += f"|clasif{VERSION_CLASIFICACION}"
+    if usa_emisores(usar_qr, motor):
+        version += "|emisores"
+    if usa_dpi_adaptativo(dpi, motor):
+        version += f"|adapt{VERSION_ADAPTATIVO}:{DPI_BAJO}-{max(DPI_ALTO, dpi)}"
+    if motor == "trocr":
+        # TrOCR por lineas; la cuantizacion int8 cambia levemente el texto
+        version += "|lineas" + ("|int8" if TROCR_INT8 and not USAR_ONNX else "")
+    if motor in ("trocr", "paddle") and USAR_ONNX:
+        version += "|onnx"
+    if USAR_MOSAICO and motor == "tesseract" and (usa_plantilla(plantilla, motor) or usa_emisores(usar_qr, motor)
+                                                  or usa_dpi_adaptativo(dpi, motor)):
+        version += "|mosaico"
+    return version
+
+
+def usa_plantilla(plantilla, motor):
+    # Las regiones con psm propio solo aplican a Tesseract; "auto" elige segun el tipo
+    return (plantilla in PLANTILLAS or plantilla == "auto") and motor == "tesseract"
+
+
+def usa_emisores(usar_qr, motor):
+    # Solo facturas (las que buscan QR AFIP) y con Tesseract, que recibe las regiones con psm
+    return USAR_EMISORES and usar_qr and motor == "tesseract"
+
+
+def usa_dpi_adaptativo(dpi, motor):
+    # Las regiones con psm propio solo aplican a Tesseract; a DPI_BAJO o menos no hay que bajar
+    return USAR_DPI_ADAPTATIVO and motor == "tesseract" and dpi > DPI_BAJO
+
+
+def plantilla_de(extractor, plantilla=None):
+    """Con extractor "auto" la plantilla sale de la clasificacion de cada pagina."""
+    return "auto" if extractor == "auto" else plantilla
+
+
+def usa_qr(extractor, motor):
+    # El QR AFIP solo aplica a facturas, y el motor "texto" no rasteriza
+    return extractor in ("factura", "auto") and motor != "texto"
+
+
+def version_pipeline(extractor="factura", dpi=300, motor="tesseract", plantilla=None):
+    """Identifica la configuracion que produjo un resultado final (clave de cache)."""
+    plantilla = plantilla_de(extractor, plantilla)
+    return f"{version_ocr(dpi, motor, usa_qr(extractor, motor), plantilla)}|ext{VERSION_EXTRACCION}|{extractor}"
+
+
+# Ultimo PDF abierto por cada hilo: las paginas de un mismo archivo llegan seguidas.
+# Por hilo porque sin pool (un solo worker) la cola de las ventanas procesa varios archivos a la vez
+_local = threading.local()
+
+
+def _abrir_pdf(ruta):
+    import fitz  # PyMuPDF
+    abierta, doc = getattr(_local, "doc_abierto", (None, None))
+    if abierta != ruta:
+        if doc is not None:
+            doc.close()
+        doc = fitz.open(ruta)
+        _local.doc_abierto = (ruta, doc)
+    return doc
+
+
+def ocr_pagina(ruta, indice=None, dpi=300, motor="tesseract", usar_qr=True, plantilla=None, alineacion=None,
+               emisores=True):
+    """Etapa de OCR de una pagina: render -> preprocess_image -> reconocimiento.
+
+    `indice` es la pagina (base 0) de un PDF, o None para una imagen suelta.
+    Con `plantilla` (ocr_plantillas) un escaneo se OCRea solo en sus regiones,
+    ubicadas segun `alineacion` si la clasificacion visual la encontro. Con
+    `emisores`, una factura escaneada de un emisor conocido se OCRea solo en las
+    cajas aprendidas (origen "emisor").
+    Devuelve el artefacto {"texto", "palabras", "qr", "origen"}; las palabras
+    son (x0, y0, x1, y1, palabra, confianza) relativas a la pagina.
+    """
+    ocr = MOTORES[motor]
+    ocr_completa = ocr
+    if usa_plantilla(plantilla, motor):
+        ocr_completa = lambda img, **opciones: ocr_regiones(img, plantilla, alineacion, **opciones)
+    gris = motor in MOTORES_GRIS
+    usar_qr = usar_qr and motor != "texto"
+    artefacto = {"texto": "", "palabras": [], "qr": None, "origen": "ocr"}
+
+    if indice is None:
+        if motor == "texto":
+            artefacto["origen"] = "vacio"
+            return artefacto
+        image = Image.open(ruta)
+    else:
+        page = _abrir_pdf(ruta)[indice]
+        if motor == "texto":
+            texto, palabras = leer_capa_texto(page)
+            if texto_es_valido(texto):
+                artefacto.update(texto=texto, palabras=palabras_relativas(page, palabras), origen="texto")
+            else:
+                artefacto["origen"] = "vacio"
+            return artefacto
+        if not pagina_escaneada(page):
+            # Capa de texto nativa; OCR solo en las regiones que faltan
+            texto, palabras, origen = extraer_texto_pagina(page, ocr, dpi, gris)
+            artefacto.update(texto=texto, palabras=palabras, origen=origen)
+            return artefacto
+        image = renderizar_gris(page, dpi) if gris else renderizar(page, dpi)
+
+    origen = "regiones" if ocr_completa is not ocr else "ocr"
+    emisor = {}
+    if emisores and usa_emisores(usar_qr, motor):
+        respaldo = ocr_completa
+        ocr_completa = lambda img: ocr_por_emisor(img, respaldo, emisor)
+    if usar_qr:
+        # Escaneo: QR AFIP primero, OCR de pagina (o de regiones) solo si no hay
+        texto, palabras, qr = ocr_con_qr(image, ocr, ocr_completa)
+        artefacto.update(texto=texto, palabras=palabras, qr=qr, origen="qr" if qr else origen)
+    else:
+        texto, palabras = ocr_completa(image)
+        artefacto.update(texto=texto, palabras=palabras, origen=origen)
+    if emisor:
+        artefacto.update(origen="emisor", emisor=emisor)
+    return artefacto
+
+
+def leer_valores(gray, cajas):
+    """Relee la caja de cada valor {campo: [cajas]} como una sola linea (PSM_LINEA) y con la
+    lista blanca del campo. Devuelve {campo: valor} con los que ahora validan.
+
+    Cada caja se lee sola, en modo linea; no pasa por el mosaico (reconocer_regiones).
+    """
+    lecturas = {}
+    for campo, cajas_campo in cajas.items():
+        for x0, y0, x1, y1 in cajas_campo:
+            alto = y1 - y0
+            recorte = recortar(gray, (max(x0 - MARGEN_VALOR, 0.0), max(y0 - alto / 2, 0.0),
+                                      min(x1 + MARGEN_VALOR, 1.0), min(y1 + alto / 2, 1.0)))
+            if recorte.size:
+                lecturas.setdefault(CARACTERES_CAMPO[campo], []).append((campo, recorte))
+    leidos = {}
+    for caracteres, recortes in lecturas.items():
+        resultados = reconocer_regiones([recorte for _, recorte in recortes], PSM_LINEA, caracteres)
+        for (campo, _), (texto, _) in zip(recortes, resultados):
+            valor = leer_valor(campo, texto)
+            if campo not in leidos and not campos_invalidos({campo: valor}):
+                leidos[campo] = valor
+    return leidos
+
+
+def ocr_campos_en_alta(ruta, indice, plantilla, campos, dpi=DPI_ALTO, alineacion=None, cajas=None):
+    """Re-OCR a `dpi` de los campos que faltan o no validan.
+
+    Los valores numericos leidos pero invalidos con caja conocida (`cajas`, de las
+    palabras de la primera pasada) se releen solos con su lista blanca; los demas
+    campos, y los que asi tampoco validan, en las regiones donde suelen estar
+    (ocr_plantillas). Para la segunda pasada del DPI adaptativo: devuelve (texto,
+    palabras, valores) con las palabras relativas a la pagina enderezada.
+    """
+    gray = deskew_fast(np.ascontiguousarray(renderizar_gris(_abrir_pdf(ruta)[indice], dpi)))
+    valores = leer_valores(gray, cajas or {})
+    resto = [campo for campo in campos if campo not in valores]
+    if not resto:
+        return "", [], valores
+    texto, palabras = ocr_de_regiones(gray, regiones_de_campos(plantilla, resto), reconocer_region, alineacion,
+                                      reconocer_regiones)
+    return texto, palabras, valores
+
+
+# --- Clasificacion ---
+
+DPI_CLASIFICACION = 150     # alcanza para leer titulos y codigos del encabezado
+ALTO_ENCABEZADO = 0.25      # fraccion superior de la pagina que se OCRea para clasificar
+ANCHO_ENCABEZADO = 1250     # px; imagenes sueltas se reducen a ~150 DPI sobre A4
+
+
+CARPETA_REFERENCIAS = os.environ.get("OCR_REFERENCIAS", os.path.join(base_directory, "facturas"))
+_indices_visuales = {}
+_indice_lock = threading.Lock()
+
+
+def clasificar_encabezado(page=None, image=None, motor="tesseract"):
+    """Tipo de documento por la capa de texto o, si no alcanza, por el OCR del encabezado.
+
+    Se pasa la pagina PDF (`page`) o la imagen suelta (`image`). Si la pagina pega
+    un escaneo debajo de un titulo nativo se OCRea igual la franja superior.
+    """
+    texto = ""
+    if page is not None:
+        texto, palabras = leer_capa_texto(page)
+        if motor == "texto" or (texto_es_valido(texto) and not regiones_sin_texto(page, palabras)):
+            return clasificar_texto(texto)
+        render = renderizar_gris if motor in MOTORES_GRIS else renderizar
+        encabezado = render(page, DPI_CLASIFICACION, clip=franja_superior(page, ALTO_ENCABEZADO))
+    else:
+        if motor == "texto":
+            return TIPO_DESCONOCIDO
+        encabezado = image.crop((0, 0, image.width, int(image.height * ALTO_ENCABEZADO)))
+        factor = round(image.width / ANCHO_ENCABEZADO)
+        if factor > 1:
+            encabezado = encabezado.reduce(factor)
+    texto_ocr, _ = MOTORES[motor](encabezado)
+    return clasificar_texto(texto + "\n" + texto_ocr)
+
+
+def miniatura(page=None, image=None) -> np.ndarray:
+    """Pagina enderezada en grises, ANCHO_MINIATURA px de ancho (clasificacion visual)."""
+    if page is not None:
+        gray = renderizar_gris(page, 72 * ANCHO_MINIATURA / page.rect.width)
+    else:
+        factor = image.width // ANCHO_MINIATURA
+        gray = a_gris(image.reduce(factor) if factor > 1 else image)
+    alto, ancho = gray.shape[:2]
+    gray = cv2.resize(np.ascontiguousarray(gray), (ANCHO_MINIATURA, round(alto * ANCHO_MINIATURA / ancho)),
+                      interpolation=cv2.INTER_AREA)
+    return deskew_fast(gray)
+
+
+def _primera_pagina(ruta, funcion):
+    # Referencias: se abren aparte para no cerrar el PDF que este procesando el hilo
+    if not ruta.lower().endswith(".pdf"):
+        return funcion(image=Image.open(ruta))
+    import fitz  # PyMuPDF
+    with fitz.open(ruta) as doc:
+        return funcion(page=doc[0])
+
+
+def indice_visual(motor="tesseract"):
+    """Indice de referencias (ocr_visual), cargado una vez por proceso y motor.
+
+    Las referencias se etiquetan por el nombre del archivo; las que no tienen un
+    tipo en el nombre, como cualquier pagina (capa de texto u OCR del encabezado
+    con `motor`), asi que cada motor guarda su propio indice.
+    """
+    with _indice_lock:
+        if motor not in _indices_visuales:
+            _indices_visuales[motor] = IndiceVisual.cargar(
+                CARPETA_REFERENCIAS, os.path.join(CACHE_DIR, f"referencias-{motor}.npz"),
+                lambda ruta: _primera_pagina(ruta, miniatura),
+                lambda ruta: _primera_pagina(ruta, lambda **pagina: clasificar_encabezado(motor=motor, **pagina)))
+        return _indices_visuales[motor]
+
+
+def clasificar_pagina(ruta, indice=None, motor="tesseract"):
+    """Tipo de documento (ocr_clasificador) sin OCRear la pagina completa.
+
+    Con capa de texto completa alcanza el texto. Un escaneo se compara primero con
+    las referencias visuales (milisegundos, sin OCR), que ademas dan la alineacion
+    de la plantilla; si ninguna coincide se OCRea la franja superior a baja
+    resolucion. Devuelve (tipo, alineacion o None).
+    """
+    if indice is None:
+        page, image = None, Image.open(ruta)
+    else:
+        page, image = _abrir_pdf(ruta)[indice], None
+        texto, palabras = leer_capa_texto(page)
+        if texto_es_valido(texto) and not regiones_sin_texto(page, palabras):
+            return clasificar_texto(texto), None
+    coincidencia = indice_visual(motor).clasificar(miniatura(page, image))
+    if coincidencia:
+        return coincidencia
+    return clasificar_encabezado(page, image, motor), None
+
+
+# --- Paginas en blanco y copias ---
+
+def revisar_pagina(detector, ruta, indice, motor="tesseract"):
+    """Compara una pagina de un PDF con las anteriores (ocr_visual.DetectorRepetidas).
+
+    Con capa de texto completa se compara el texto; si no, la pagina enderezada a
+    DPI_HUELLA. None si es nueva, ("blanca", None) o ("copia", indice original).
+    """
+    page = _abrir_pdf(ruta)[indice]
+    texto, palabras = leer_capa_texto(page)
+    if texto_es_valido(texto) and not regiones_sin_texto(page, palabras):
+        return detector.revisar(indice, texto=texto)
+    if motor == "texto":
+        return None
+    return detector.revisar(indice, deskew_fast(np.ascontiguousarray(renderizar_gris(page, DPI_HUELLA))))
+
+
+def artefacto_repetido(motivo, original=None, indice_original=None):
+    """Artefacto de una pagina que no se OCReo: en blanco o copia del artefacto `original`."""
+    if motivo == "blanca":
+        return {"texto": "", "palabras": [], "qr": None, "origen": "blanca"}
+    return {**original, "origen": "copia", "copia_de": indice_original}
+
+
+# --- Extraccion ---
+
+def extraer_datos(artefacto, extractor="factura"):
+    """Etapa de extraccion: campos a partir del artefacto de OCR.
+
+    Con extractor "auto" se usa el extractor del tipo clasificado y el tipo
+    encabeza los datos ("Tipo Documento"). Los campos que faltaban o no validaban
+    y se releyeron a mas DPI se toman de esa lectura: el valor solo ("valores_alta")
+    o el texto de sus regiones ("texto_alta"). Las copias y
+    las paginas en blanco que no se OCRearon lo indican al final ("Copia de",
+    "Pagina en blanco").
+    """
+    tipo = None
+    if extractor == "auto":
+        tipo = artefacto.get("tipo") or clasificar_texto(artefacto["texto"])
+        extractor = TIPOS[tipo]["extractor"]
+    extraer = EXTRACTORES[extractor]
+    if artefacto.get("qr") and extractor == "factura":
+        datos = datos_con_qr(artefacto["qr"], artefacto["texto"], extraer)
+    else:
+        datos = extraer(artefacto["texto"])
+    for campo, valor in artefacto.get("valores_alta", {}).items():
+        if campo in campos_invalidos(datos):
+            datos[campo] = valor
+    if artefacto.get("texto_alta"):
+        # Campos re-OCReados a mas DPI: su texto primero y el resto como contexto (orden de los CUIT)
+        alta = extraer(artefacto["texto_alta"] + "\n" + artefacto["texto"])
+        invalidos_alta = campos_invalidos(alta)
+        for campo in campos_invalidos(datos):
+            if campo in alta and campo not in invalidos_alta:
+                datos[campo] = alta[campo]
+    if tipo is not None:
+        datos.pop("Tipo Documento", None)
+        datos = {"Tipo Documento": tipo, **datos}
+    if artefacto["origen"] == "copia":
+        datos["Copia de"] = f"Pagina {artefacto['copia_de'] + 1}"
+    elif artefacto["origen"] == "blanca":
+        datos["Pagina en blanco"] = "Si"
+    return datos
+
+
+def aprender_emisor(datos, artefacto, olvidados=()):
+    """Cajas de los campos de una factura OCReada (o con capa de texto) entera, o None.
+
+    Solo si el emisor todavia no tiene layout aprendido. `olvidados`: CUITs cuyo
+    layout esta pagina descarta (el borrado lo hace despues aplicar_emisores, asi
+    que la cache todavia los tiene): se reaprenden.
+    """
+    if artefacto["origen"] not in ("ocr", "regiones", "texto"):
+        return None
+    cuit = datos.get("CUIT Remitente", "No encontrado")
+    if cuit == "No encontrado" or (cuit not in olvidados and obtener_cache().obtener_emisor(cuit)):
+        return None
+    return aprender_layout(datos, artefacto["palabras"], EXTRACTORES["factura"])
+
+
+def aplicar_emisores(cache, artefacto):
+    """Saca del artefacto los cambios de layouts por emisor de procesar_pagina y los guarda en `cache`.
+
+    Los workers del pool solo leen los layouts: los escribe el proceso que junta los resultados.
+    """
+    for accion, cuit, layout in artefacto.pop("emisores_pendientes", []):
+        if accion == "olvidar":
+            cache.olvidar_emisor(cuit)
+        elif accion == "usar":
+            cache.usar_emisor(cuit)
+        else:
+            cache.guardar_emisor(cuit, layout)
+
+
+def procesar_pagina(ruta, indice=None, extractor="factura", dpi=300, motor="tesseract", plantilla=None,
+                    emisores=True):
+    """Render -> preprocess_image -> OCR -> extraccion de una pagina.
+
+    Con extractor "auto" primero se clasifica la pagina y el tipo decide el
+    extractor, la plantilla de regiones y si se busca el QR AFIP. Si el layout
+    aprendido del emisor dejo de coincidir se descarta y se OCRea la pagina
+    completa; si la plantilla no alcanzo para algun campo obligatorio, tambien.
+    Con DPI adaptativo el escaneo se OCRea a DPI_BAJO y, si falta o no valida un
+    campo obligatorio del extractor, los campos que fallaron se re-OCRean a
+    DPI_ALTO: los numericos en la caja de su valor, con lista blanca, y el resto
+    solo en sus regiones.
+    Con `emisores` se usan los layouts por emisor y las facturas OCReadas enteras
+    los alimentan: los cambios quedan en artefacto["emisores_pendientes"] y los
+    guarda aplicar_emisores en el proceso que junta los resultados.
+    Devuelve (texto, datos, artefacto).
+    """
+    usar_qr = usa_qr(extractor, motor)
+    tipo = alineacion = None
+    if extractor == "auto":
+        tipo, alineacion = clasificar_pagina(ruta, indice, motor)
+        plantilla = TIPOS[tipo]["plantilla"]
+        usar_qr = usar_qr and es_factura(tipo)
+    adaptativo = indice is not None and usa_dpi_adaptativo(dpi, motor)
+    dpi_ocr = DPI_BAJO if adaptativo else dpi
+
+    artefacto = ocr_pagina(ruta, indice, dpi_ocr, motor, usar_qr, plantilla, alineacion, emisores)
+    artefacto["tipo"] = refinar_tipo(tipo, artefacto["texto"]) if tipo else None
+    datos = extraer_datos(artefacto, extractor)
+    pendientes = []
+    if artefacto["origen"] == "emisor" and not layout_vigente(datos, artefacto["emisor"]):
+        pendientes.append(("olvidar", artefacto["emisor"]["cuit"], None))
+        artefacto = ocr_pagina(ruta, indice, dpi_ocr, motor, usar_qr, emisores=False)
+        artefacto["tipo"] = refinar_tipo(tipo, artefacto["texto"]) if tipo else None
+        datos = extraer_datos(artefacto, extractor)
+    elif artefacto["origen"] == "regiones" and faltan_campos(datos, plantilla):
+        artefacto = ocr_pagina(ruta, indice, dpi_ocr, motor, usar_qr, emisores=False)
+        artefacto["tipo"] = refinar_tipo(tipo, artefacto["texto"]) if tipo else None
+        datos = extraer_datos(artefacto, extractor)
+
+    # Con QR los campos salen del QR (y una factura C no tiene base imponible que buscar).
+    # Solo un campo obligatorio faltante o invalido justifica la segunda pasada; hecha,
+    # se releen tambien los opcionales que fallaron, que salen casi gratis
+    ocreada = artefacto["origen"] in ("ocr", "regiones", "emisor", "mixto")
+    extractor_tipo = TIPOS[artefacto["tipo"]]["extractor"] if extractor == "auto" else extractor
+    campos = []
+    if adaptativo and ocreada and requeridos_invalidos(datos, extractor_tipo):
+        campos = campos_invalidos(datos)
+    if campos:
+        if extractor != "auto" and plantilla not in PLANTILLAS:
+            plantilla = PLANTILLA_DE_EXTRACTOR.get(extractor)
+        # Valores numericos leidos pero invalidos (un digito mal): se relee solo su caja
+        cajas = {campo: cajas_de_valor(datos[campo], artefacto["palabras"]) for campo in campos
+                 if campo in CARACTERES_CAMPO and datos[campo] != "No encontrado"}
+        texto_alta, palabras_alta, valores = ocr_campos_en_alta(
+            ruta, indice, plantilla, campos, max(DPI_ALTO, dpi), alineacion if plantilla else None,
+            {campo: cajas_campo for campo, cajas_campo in cajas.items() if cajas_campo})
+        artefacto["valores_alta"] = valores
+        if texto_alta:
+            # "texto" queda como el de la primera pasada: extraer_datos y texto_de suman el alta
+            artefacto.update(texto_alta=texto_alta, palabras=artefacto["palabras"] + palabras_alta)
+        datos = extraer_datos(artefacto, extractor)
+    if artefacto["origen"] == "emisor":
+        pendientes.append(("usar", artefacto["emisor"]["cuit"], None))
+    elif emisores and usa_emisores(usar_qr, motor):
+        olvidados = {cuit for accion, cuit, _ in pendientes if accion == "olvidar"}
+        layout = aprender_emisor(datos, artefacto, olvidados)
+        if layout:
+            pendientes.append(("guardar", datos["CUIT Remitente"], layout))
+    artefacto["emisores_pendientes"] = pendientes
+    return texto_de(artefacto), datos, artefacto
+
+
+def texto_de(artefacto):
+    """Texto completo de la pagina para la salida: el OCR y, si hubo, la relectura a mas DPI."""
+    if artefacto.get("texto_alta"):
+        return artefacto["texto"] + "\n" + artefacto["texto_alta"]
+    return artefacto["texto"]
+
+
+def guardar_resultado(file_path, text_completo, info, carpeta, suffix=""):
+    """Escribe el .txt de salida con los datos extraidos arriba y el texto completo abajo."""
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_path = os.path.join(carpeta, f"{file_name}{suffix}.txt")
+
+    tipo = f" ({info['Tipo Documento']})" if "Tipo Documento" in info else ""
+    contenido = f"=== DATOS EXTRAÍDOS{tipo} ===\n"
+    for campo, valor in info.items():
+        contenido += f"{campo}: {valor}\n"
+    contenido += "="*40 + "\n\n" + "--- TEXTO COMPLETO ---\n" + text_completo
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(contenido)
+    return output_path
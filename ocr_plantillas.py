@@ -0,0 +1,173 @@
+from collections import namedtuple
+
+# --- Plantillas de regiones por tipo de documento ---
+# Los comprobantes AFIP tienen los campos en recuadros fijos de encabezado y pie:
+# en lugar de OCRear la pagina completa se recortan solo esas regiones, cada una
+# con el modo de segmentacion (psm) de Tesseract que le corresponde. Menos pixeles
+# por Tesseract y menos coincidencias falsas con el cuerpo (detalle de items).
+#
+# Cajas (x0, y0, x1, y1) relativas a la pagina enderezada, medidas sobre las
+# muestras de facturas/. Las regiones se OCRean en el orden de la lista: los
+# extractores toman el primer CUIT como remitente, asi que el emisor va primero.
+
+# Modos de segmentacion de Tesseract usados en las plantillas
+PSM_AUTO = 3          # columnas y bloques sueltos (encabezados irregulares, escritura a mano)
+PSM_COLUMNA = 4       # una columna de lineas de distinto tamano (pares "Etiqueta: valor")
+PSM_BLOQUE = 6        # un bloque uniforme de texto (recuadros chicos)
+PSM_LINEA = 7         # una sola linea (el valor de un campo, sin etiqueta)
+
+Region = namedtuple("Region", "nombre caja psm")
+
+PLANTILLAS = {
+    # Factura / nota electronica AFIP (A, B, C, E, M): recuadro del comprobante a la
+    # derecha, emisor a la izquierda, receptor debajo y totales al pie
+    "factura": {
+        "regiones": [
+            Region("comprobante", (0.50, 0.00, 1.00, 0.20), PSM_BLOQUE),
+            Region("emisor", (0.00, 0.00, 0.50, 0.20), PSM_BLOQUE),
+            Region("receptor", (0.00, 0.18, 1.00, 0.27), PSM_BLOQUE),
+            Region("importes", (0.40, 0.60, 1.00, 0.95), PSM_BLOQUE),
+        ],
+        "requeridos": ("Fecha de Comprobante", "Nro. Comprobante", "CUIT Remitente"),
+        # Donde buscar cada campo al re-OCRearlo (ver regiones_de_campos). Los CUIT se asignan
+        # por orden de aparicion: para el del receptor tambien hace falta el del emisor
+        "campos": {
+            "Fecha de Comprobante": ("comprobante",),
+            "Pto. de Venta": ("comprobante",),
+            "Nro. Comprobante": ("comprobante",),
+            "CUIT Remitente": ("comprobante", "emisor"),
+            "CUIT Destinatario": ("comprobante", "emisor", "receptor"),
+            "Base Imponible": ("importes",),
+        },
+    },
+    # Remito preimpreso (R): todo lo necesario esta en el encabezado, a veces a mano
+    "remito": {
+        "regiones": [
+            Region("encabezado", (0.00, 0.00, 1.00, 0.33), PSM_AUTO),
+        ],
+        "requeridos": ("Fecha de Comprobante", "Nro. Comprobante", "CUIT Remitente"),
+    },
+    # Carta de Porte Electronica: numero/fecha/CTG arriba a la derecha, intervinientes
+    # en columna debajo y tarifa en el bloque de transporte
+    "cpe": {
+        "regiones": [
+            Region("encabezado", (0.40, 0.00, 1.00, 0.12), PSM_BLOQUE),
+            Region("intervinientes", (0.00, 0.11, 1.00, 0.36), PSM_COLUMNA),
+            Region("transporte", (0.00, 0.52, 1.00, 0.66), PSM_BLOQUE),
+        ],
+        "requeridos": ("CTG", "Nro. Comprobante"),
+        "campos": {
+            "Fecha de Comprobante": ("encabezado",),
+            "CTG": ("encabezado",),
+            "Pto. de Venta": ("encabezado",),
+            "Nro. Comprobante": ("encabezado",),
+            "CUIT Remitente": ("intervinientes",),
+            "CUIT Destinatario": ("intervinientes",),
+            "CUIT Destino": ("intervinientes",),
+            "Base Imponible / Tarifa": ("transporte",),
+        },
+    },
+    # Documentos SENASA (DTVe, MIC, DT-e) y Permiso de Transito: numero, fecha y
+    # partes intervinientes en el tercio superior
+    "senasa": {
+        "regiones": [
+            Region("encabezado", (0.00, 0.00, 1.00, 0.32), PSM_AUTO),
+        ],
+        "requeridos": ("Fecha de Comprobante",),
+    },
+    # Remitos electronicos de rubro (carnico, harinero, tabacalero): encabezado y origen
+    "remito_rubro": {
+        "regiones": [
+            Region("encabezado", (0.00, 0.00, 1.00, 0.40), PSM_AUTO),
+        ],
+        "requeridos": ("Fecha de Comprobante", "CUIT Remitente"),
+    },
+}
+
+
+# Plantilla con la que se re-OCRean los campos de cada extractor cuando no hay una elegida
+PLANTILLA_DE_EXTRACTOR = {"factura": "factura", "remito": "remito", "cpe": "cpe"}
+# Sin plantilla (tipo sin regiones conocidas) se re-OCRea la pagina entera
+REGION_PAGINA = Region("pagina", (0.0, 0.0, 1.0, 1.0), PSM_AUTO)
+
+
+def recortar(image, caja):
+    """Recorte de un array (alto, ancho[, canales]) segun una caja relativa."""
+    alto, ancho = image.shape[:2]
+    x0, y0, x1, y1 = caja
+    return image[int(y0 * alto):int(y1 * alto), int(x0 * ancho):int(x1 * ancho)]
+
+
+def alinear_caja(caja, alineacion):
+    """Ubica una caja de la plantilla sobre el escaneo (alineacion de ocr_visual)."""
+    escala_x, escala_y, dx, dy = alineacion
+    x0, y0, x1, y1 = caja
+    return (min(max(escala_x * x0 + dx, 0.0), 1.0), min(max(escala_y * y0 + dy, 0.0), 1.0),
+            min(max(escala_x * x1 + dx, 0.0), 1.0), min(max(escala_y * y1 + dy, 0.0), 1.0))
+
+
+def palabras_a_pagina(caja, palabras):
+    """Pasa palabras relativas a un recorte a coordenadas relativas de la pagina."""
+    x0, y0, x1, y1 = caja
+    ancho, alto = x1 - x0, y1 - y0
+    return [(round(x0 + px0 * ancho, 4), round(y0 + py0 * alto, 4), round(x0 + px1 * ancho, 4),
+             round(y0 + py1 * alto, 4), palabra, conf) for px0, py0, px1, py1, palabra, conf in palabras]
+
+
+def ocr_por_regiones(image, plantilla, reconocer, alineacion=None, reconocer_lote=None):
+    """OCR solo de las regiones de la plantilla.
+
+    `image` es la pagina enderezada como array; `reconocer(recorte, psm)` devuelve
+    (texto, palabras) con palabras relativas al recorte. Con `alineacion` las cajas
+    se desplazan y escalan segun la referencia que coincidio con el escaneo.
+    Devuelve (texto, palabras) con las palabras relativas a la pagina.
+    """
+    return ocr_de_regiones(image, PLANTILLAS[plantilla]["regiones"], reconocer, alineacion, reconocer_lote)
+
+
+def ocr_de_regiones(image, regiones, reconocer, alineacion=None, reconocer_lote=None):
+    """OCR de una lista de regiones (de una plantilla o aprendidas, ver ocr_emisores).
+
+    Con `reconocer_lote(recortes, psm)` las regiones de bloque (PSM_BLOQUE) se
+    reconocen juntas (ver ocr_mosaico); las de layout propio, de a una.
+    """
+    cajas, recortes = [], []
+    for region in regiones:
+        caja = alinear_caja(region.caja, alineacion) if alineacion else region.caja
+        recorte = recortar(image, caja)
+        if recorte.size == 0:
+            continue
+        cajas.append(caja)
+        recortes.append((recorte, region.psm))
+    resultados = [None] * len(recortes)
+    juntas = [n for n, (_, psm) in enumerate(recortes) if psm == PSM_BLOQUE]
+    if reconocer_lote is not None and len(juntas) > 1:
+        for n, resultado in zip(juntas, reconocer_lote([recortes[n][0] for n in juntas], PSM_BLOQUE)):
+            resultados[n] = resultado
+    partes = []
+    palabras = []
+    for caja, (recorte, psm), resultado in zip(cajas, recortes, resultados):
+        texto, palabras_region = resultado or reconocer(recorte, psm)
+        partes.append(texto)
+        palabras.extend(palabras_a_pagina(caja, palabras_region))
+    return "\n".join(partes), palabras
+
+
+def faltan_campos(datos, plantilla):
+    """True si la extraccion sobre las regiones no encontro algun campo obligatorio."""
+    return any(datos.get(campo) == "No encontrado" for campo in PLANTILLAS[plantilla]["requeridos"])
+
+
+def regiones_de_campos(plantilla, campos):
+    """Regiones de la plantilla donde suelen estar `campos`, en el orden de la plantilla.
+
+    Un campo sin ubicacion en la plantilla se busca en todas sus regiones.
+    """
+    if plantilla is None:
+        return [REGION_PAGINA]
+    regiones = PLANTILLAS[plantilla]["regiones"]
+    ubicacion = PLANTILLAS[plantilla].get("campos", {})
+    nombres = set()
+    for campo in campos:
+        nombres.update(ubicacion.get(campo, [region.nombre for region in regiones]))
+    return [region for region in regiones if region.nombre in nombres]
@@ -0,0 +1,162 @@
+import base64
+import json
+import math
+import re
+import cv2
+import numpy as np
+
+# --- QR de comprobantes electronicos AFIP/ARCA ---
+
+# https://www.afip.gob.ar/fe/qr/?p=<base64 JSON>  (hoy tambien www.arca.gob.ar)
+_URL_QR = re.compile(r"https?://(?:www\.)?(?:afip|arca)\.gob\.ar/fe/qr/?\?p=([A-Za-z0-9+/=_\-]+)")
+
+# Ancho maximo (px) sobre el que se busca el QR; 300 DPI sobre A4 alcanza para leerlo
+ANCHO_MAX_QR = 2500
+
+# Comprobantes clase C: sin IVA discriminado, el importe del QR es la base imponible
+COMPROBANTES_C = {11, 12, 13, 15}
+
+# tipoDocRec que corresponden a una CUIT/CUIL
+DOCUMENTOS_CUIT = {80, 86}
+
+# Fecha ISO (AAAA-MM-DD), como la define la especificacion del QR
+_FECHA_QR = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Fraccion de la altura donde empieza el pie con los importes
+INICIO_ZONA_IMPORTES = 0.6
+
+_detector = None
+
+
+def _a_gris(image):
+    arr = np.asarray(image)
+    if arr.ndim == 3:
+        return cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY if arr.shape[2] == 3 else cv2.COLOR_RGBA2GRAY)
+    return arr
+
+
+def decodificar_payload(contenido):
+    """JSON del QR AFIP a partir del texto leido, o None si no es un QR de comprobante."""
+    match = _URL_QR.search(contenido or "")
+    if not match:
+        return None
+    crudo = match.group(1)
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(
+            crudo.replace("+", "-").replace("/", "_") + "=" * (-len(crudo) % 4)))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    campos = ("fecha", "cuit", "ptoVta", "nroCmp")
+    if not isinstance(datos, dict) or not all(c in datos for c in campos):
+        return None
+    # Un QR que se lee pero no respeta la especificacion se descarta: queda el OCR
+    if not _FECHA_QR.match(str(datos["fecha"])):
+        return None
+    if not all(_es_entero(datos[c]) for c in ("cuit", "ptoVta", "nroCmp")):
+        return None
+    if "importe" in datos and not _es_numero(datos["importe"]):
+        return None
+    return datos
+
+
+def _es_entero(valor):
+    if isinstance(valor, bool):
+        return False
+    return isinstance(valor, int) or (isinstance(valor, str) and valor.isdigit())
+
+
+def _es_numero(valor):
+    # float() acepta "nan", "inf" y "1e400" (inf): no son importes
+    try:
+        return not isinstance(valor, bool) and math.isfinite(float(valor))
+    except (TypeError, ValueError):
+        return False
+
+
+def _importe(valor):
+    """Importe como lo imprime el comprobante y lo lee el OCR: 1.234,56."""
+    return f"{float(valor):,.2f}".translate(str.maketrans(",.", ".,"))
+
+
+def leer_qr_afip(image):
+    """Busca el QR AFIP en la pagina (PIL o numpy) y devuelve su payload, o None."""
+    global _detector
+    if _detector is None:
+        _detector = cv2.QRCodeDetector()
+
+    gray = _a_gris(image)
+    if gray.shape[1] > ANCHO_MAX_QR:
+        escala = ANCHO_MAX_QR / gray.shape[1]
+        gray = cv2.resize(gray, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+
+    # Puede haber varios QR (p. ej. SENASA + AFIP): nos quedamos con el de AFIP
+    ok, contenidos, _, _ = _detector.detectAndDecodeMulti(gray)
+    if not ok:
+        return None
+    for contenido in contenidos:
+        payload = decodificar_payload(contenido)
+        if payload:
+            return payload
+    return None
+
+
+def datos_desde_qr(payload):
+    """Campos de `extraer_datos_factura` completados con los valores exactos del QR."""
+    datos = {
+        "Fecha de Comprobante": "No encontrado",
+        "Pto. de Venta": "No encontrado",
+        "Nro. Comprobante": "No encontrado",
+        "CUIT Remitente": "No encontrado",
+        "CUIT Destinatario": "No encontrado",
+        "Base Imponible": "No encontrado"
+    }
+    anio, mes, dia = str(payload["fecha"])[:10].split("-")
+    datos["Fecha de Comprobante"] = f"{dia}/{mes}/{anio}"
+    datos["Pto. de Venta"] = str(int(payload["ptoVta"]))
+    datos["Nro. Comprobante"] = str(int(payload["nroCmp"])).zfill(8)
+    datos["CUIT Remitente"] = str(payload["cuit"])
+    if payload.get("tipoDocRec") in DOCUMENTOS_CUIT and payload.get("nroDocRec"):
+        datos["CUIT Destinatario"] = str(payload["nroDocRec"])
+    if payload.get("tipoCmp") in COMPROBANTES_C and "importe" in payload:
+        datos["Base Imponible"] = _importe(payload["importe"])
+    return datos
+
+
+def zona_importes(image):
+    """Recorte del pie de pagina, donde van Neto Gravado / Subtotal (PIL o numpy)."""
+    if isinstance(image, np.ndarray):
+        return image[int(image.shape[0] * INICIO_ZONA_IMPORTES):]
+    ancho, alto = image.size
+    return image.crop((0, int(alto * INICIO_ZONA_IMPORTES), ancho, alto))
+
+
+def ocr_con_qr(image, ocr_imagen, ocr_pagina=None):
+    """Lee el QR antes de preprocesar; el OCR de pagina completa queda como respaldo.
+
+    `ocr_imagen` devuelve (texto, palabras); `ocr_pagina`, si se indica, reemplaza
+    al OCR de pagina completa (p. ej. solo las regiones de una plantilla).
+    Devuelve (texto, palabras, payload): con QR valido solo se OCRea el pie, y
+    solo si hace falta la base imponible.
+    """
+    payload = leer_qr_afip(image)
+    if payload is None:
+        texto, palabras = (ocr_pagina or ocr_imagen)(image)
+        return texto, palabras, None
+    if payload.get("tipoCmp") in COMPROBANTES_C:
+        return "", [], payload
+
+    # El QR trae el total, no el neto: basta con OCRear la zona de importes
+    texto, palabras = ocr_imagen(zona_importes(image))
+    alto = 1 - INICIO_ZONA_IMPORTES
+    palabras = [(x0, round(INICIO_ZONA_IMPORTES + y0 * alto, 4), x1,
+                 round(INICIO_ZONA_IMPORTES + y1 * alto, 4), palabra, conf)
+                for x0, y0, x1, y1, palabra, conf in palabras]
+    return texto, palabras, payload
+
+
+def datos_con_qr(payload, texto, extraer):
+    """Campos del QR; la base imponible, si el QR no la da, sale del texto del pie."""
+    datos = datos_desde_qr(payload)
+    if datos["Base Imponible"] == "No encontrado":
+        datos["Base Imponible"] = extraer(texto)["Base Imponible"]
+    return datos
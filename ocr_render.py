@@ -0,0 +1,85 @@
+import queue
+import threading
+
+# --- Render de paginas en streaming ---
+
+# Paginas renderizadas que pueden esperar en memoria mientras se OCRea la actual
+PAGINAS_EN_MEMORIA = 2
+
+_FIN = object()
+
+
+def contar_paginas(pdf_path, backend="poppler"):
+    if backend == "pymupdf":
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    from pdf2image import pdfinfo_from_path
+    return pdfinfo_from_path(pdf_path)["Pages"]
+
+
+def _renderizar_poppler(pdf_path, dpi, total):
+    from pdf2image import convert_from_path
+    for numero in range(1, total + 1):
+        yield convert_from_path(pdf_path, dpi, first_page=numero, last_page=numero)[0]
+
+
+def _renderizar_pymupdf(pdf_path, dpi):
+    import fitz  # PyMuPDF
+    from ocr_pdf import renderizar  # los escaneos salen de la imagen embebida, sin re-renderizar
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            yield renderizar(page, dpi)
+
+
+def iterar_paginas(pdf_path, dpi=300, backend="poppler", en_memoria=PAGINAS_EN_MEMORIA):
+    """Genera las paginas del PDF de a una, como imagenes PIL.
+
+    Un hilo renderiza por delante del consumidor mientras este OCRea, pero nunca
+    mas de `en_memoria` paginas listas a la vez, asi el uso de RAM no crece con
+    el largo del documento.
+    """
+    if backend == "pymupdf":
+        paginas = _renderizar_pymupdf(pdf_path, dpi)
+    else:
+        paginas = _renderizar_poppler(pdf_path, dpi, contar_paginas(pdf_path, backend))
+
+    cola = queue.Queue(maxsize=max(1, en_memoria))
+    detener = threading.Event()
+
+    def productor():
+        try:
+            for pagina in paginas:
+                while not detener.is_set():
+                    try:
+                        cola.put(pagina, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if detener.is_set():
+                    return
+        except Exception as exc:
+            cola.put(exc)
+            return
+        finally:
+            paginas.close()
+        cola.put(_FIN)
+
+    hilo = threading.Thread(target=productor, daemon=True)
+    hilo.start()
+    try:
+        while True:
+            item = cola.get()
+            if item is _FIN:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Si el consumidor corta antes (error, cancelacion) liberamos al productor
+        detener.set()
+        while hilo.is_alive():
+            try:
+                cola.get_nowait()
+            except queue.Empty:
+                hilo.join(0.1)
@@ -0,0 +1,204 @@
+import os
+import sys
+import threading
+import numpy as np
+
+# --- Motor Tesseract en proceso ---
+# Con tesserocr (API C de Tesseract) cada hilo mantiene sus motores cargados y los
+# reutiliza entre paginas y archivos: no se lanza un proceso por llamada, no se
+# relee el traineddata y la imagen pasa como buffer, sin archivo temporal.
+# Si tesserocr no esta instalado se usa pytesseract con la misma interfaz.
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+PSM_AUTO = 3
+PSM_OSD = 0
+OEM_LSTM = 1
+
+# --- Modos velocidad / precision ---
+# "fast": modelos tessdata_fast (LSTM entero, varias veces mas rapido); "best":
+# tessdata_best (LSTM en punto flotante, mas preciso en impresiones malas). Los dos
+# en castellano. Cada modo lee su carpeta de modelos de OCR_TESSDATA_FAST /
+# OCR_TESSDATA_BEST; sin carpeta se usa el tessdata instalado con Tesseract.
+MODOS = {
+    "fast": {"lang": "spa", "tessdata": os.environ.get("OCR_TESSDATA_FAST")},
+    "best": {"lang": "spa", "tessdata": os.environ.get("OCR_TESSDATA_BEST")},
+}
+MODO_POR_DEFECTO = "fast"
+MODO = os.environ.get("OCR_MODO", MODO_POR_DEFECTO)
+if MODO not in MODOS:
+    print(f"OCR_MODO={MODO!r} no es un modo conocido ({', '.join(MODOS)}): se usa {MODO_POR_DEFECTO!r}",
+          file=sys.stderr)
+    MODO = MODO_POR_DEFECTO
+LANG = MODOS[MODO]["lang"]
+
+_local = threading.local()
+
+
+def en_proceso() -> bool:
+    return tesserocr is not None
+
+
+def elegir_modo(modo):
+    """Cambia el modo del proceso (antes de crear el pool: los workers lo heredan por el entorno)."""
+    global MODO, LANG
+    if modo not in MODOS:
+        raise ValueError(f"Modo de Tesseract desconocido: {modo!r} (modos: {', '.join(MODOS)})")
+    if modo != MODO_POR_DEFECTO and not MODOS[modo]["tessdata"]:
+        print(f"Sin OCR_TESSDATA_{modo.upper()} no hay modelos {modo!r}: se usan los instalados con Tesseract",
+              file=sys.stderr)
+    MODO, LANG = modo, MODOS[modo]["lang"]
+    os.environ["OCR_MODO"] = modo
+
+
+def modelo() -> str:
+    """Identifica idioma y modelos en uso (para las versiones de la cache).
+
+    Sin carpeta de modelos propia el modo usa el tessdata instalado: todos los modos
+    en esa situacion dan el mismo texto y comparten la version.
+    """
+    return f"{LANG}-{MODO}" if MODOS[MODO]["tessdata"] else LANG
+
+
+def _config(lang, psm, caracteres):
+    """Parametros de linea de comandos de pytesseract equivalentes a los del motor en proceso."""
+    config = f"--psm {psm}"
+    if lang != "osd":
+        config += f" --oem {OEM_LSTM}"
+        if MODOS[MODO]["tessdata"]:
+            config += f' --tessdata-dir "{MODOS[MODO]["tessdata"]}"'
+    if caracteres:
+        config += f" -c tessedit_char_whitelist={caracteres}"
+    return config
+
+
+def _motor(lang, psm, caracteres=None):
+    """Motor del hilo actual para (modo, lang, psm, caracteres); se crea en el primer uso.
+
+    Con `caracteres` el reconocedor solo puede devolver esos caracteres (campos numericos).
+    """
+    motores = getattr(_local, "motores", None)
+    if motores is None:
+        motores = _local.motores = {}
+    clave = (MODO, lang, psm, caracteres)
+    api = motores.get(clave)
+    if api is None:
+        if lang == "osd":
+            # OSD no tiene modelo LSTM: usa el osd.traineddata instalado con Tesseract
+            api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+        else:
+            tessdata = MODOS[MODO]["tessdata"]
+            opciones = {"path": tessdata} if tessdata else {}
+            api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm, oem=OEM_LSTM, **opciones)
+        if caracteres:
+            api.SetVariable("tessedit_char_whitelist", caracteres)
+        motores[clave] = api
+    return api
+
+
+def _cargar_imagen(api, image):
+    """Pasa una imagen PIL o un array numpy (gris o RGB) al motor."""
+    if getattr(image, "mode", None) not in (None, "L", "RGB"):
+        image = image.convert("RGB")
+    arr = np.ascontiguousarray(image)
+    if arr.dtype == bool:
+        arr = arr.astype(np.uint8) * 255
+    alto, ancho = arr.shape[:2]
+    canales = 1 if arr.ndim == 2 else arr.shape[2]
+    api.SetImageBytes(arr.tobytes(), ancho, alto, canales, ancho * canales)
+
+
+def cerrar_motores():
+    """Libera los motores del hilo actual (al terminar un worker)."""
+    for api in getattr(_local, "motores", {}).values():
+        api.End()
+    _local.motores = {}
+
+
+def image_to_string(image, lang=None, psm=PSM_AUTO) -> str:
+    lang = lang or LANG
+    if tesserocr is None:
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=lang, config=_config(lang, psm, None))
+    api = _motor(lang, psm)
+    _cargar_imagen(api, image)
+    return api.GetUTF8Text()
+
+
+def _tamano(image):
+    if hasattr(image, "size") and not isinstance(image, np.ndarray):
+        return image.size
+    return image.shape[1], image.shape[0]
+
+
+def _texto_desde_data(data):
+    """Reconstruye el texto (lineas y parrafos) a partir de la salida de image_to_data."""
+    lineas = {}
+    for n, palabra in enumerate(data["text"]):
+        if palabra and palabra.strip():
+            clave = (data["block_num"][n], data["par_num"][n], data["line_num"][n])
+            lineas.setdefault(clave, []).append(palabra)
+    partes = []
+    parrafo_anterior = None
+    for (bloque, parrafo, _), palabras in lineas.items():
+        if parrafo_anterior is not None and (bloque, parrafo) != parrafo_anterior:
+            partes.append("")
+        partes.append(" ".join(palabras))
+        parrafo_anterior = (bloque, parrafo)
+    return "\n".join(partes) + "\n"
+
+
+def reconocer(image, lang=None, psm=PSM_AUTO, caracteres=None):
+    """Texto y palabras con posicion en una sola pasada de reconocimiento.
+
+    Las palabras son tuplas (x0, y0, x1, y1, palabra, confianza) con coordenadas
+    relativas (0-1) al tamano de la imagen recibida. `caracteres` limita los
+    caracteres reconocibles (lista blanca).
+    """
+    lang = lang or LANG
+    ancho, alto = _tamano(image)
+    palabras = []
+
+    def agregar(x0, y0, x1, y1, palabra, conf):
+        palabras.append((round(x0 / ancho, 4), round(y0 / alto, 4), round(x1 / ancho, 4),
+                         round(y1 / alto, 4), palabra, round(float(conf), 1)))
+
+    if tesserocr is None:
+        import pytesseract
+        data = pytesseract.image_to_data(image, lang=lang, config=_config(lang, psm, caracteres),
+                                         output_type=pytesseract.Output.DICT)
+        for n, palabra in enumerate(data["text"]):
+            if palabra and palabra.strip():
+                x, y, w, h = data["left"][n], data["top"][n], data["width"][n], data["height"][n]
+                agregar(x, y, x + w, y + h, palabra, data["conf"][n])
+        return _texto_desde_data(data), palabras
+
+    api = _motor(lang, psm, caracteres)
+    _cargar_imagen(api, image)
+    api.Recognize()
+    texto = api.GetUTF8Text()
+    nivel = tesserocr.RIL.WORD
+    iterador = api.GetIterator()
+    if iterador is not None:
+        for r in tesserocr.iterate_level(iterador, nivel):
+            palabra = r.GetUTF8Text(nivel)
+            if palabra and palabra.strip():
+                agregar(*r.BoundingBox(nivel), palabra, r.Confidence(nivel))
+    return texto, palabras
+
+
+def image_to_osd(image) -> dict:
+    """Orientacion de la pagina: {"rotate": grados a girar para corregirla, "orientation_conf": ...}."""
+    if tesserocr is None:
+        import pytesseract
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+        return {"rotate": osd.get("rotate", 0), "orientation_conf": osd.get("orientation_conf", 0.0)}
+    api = _motor("osd", PSM_OSD)
+    _cargar_imagen(api, image)
+    osd = api.DetectOrientationScript()
+    if not osd:
+        raise RuntimeError("OSD sin resultado")
+    return {"rotate": (360 - osd["orient_deg"]) % 360, "orientation_conf": osd["orient_conf"]}
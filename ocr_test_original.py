@@ -1,9 +1,9 @@
 import os
-from tkinter import Label, Frame, filedialog, messagebox, Text
+from tkinter import Label, Frame, filedialog, messagebox
 from tkinterdnd2 import TkinterDnD, DND_FILES
 from PIL import Image, ImageEnhance
-from pdf2image import convert_from_path
-import pytesseract
+from ocr_trabajos import ColaTrabajos, VistaLote, imagenes_de_archivo
+import ocr_tesseract
 import ttkbootstrap as ttk
 import cv2
 import numpy as np
@@ -36,71 +36,31 @@ def preprocess_image(image):
     
     return enhanced_image
 
-# Función para extraer texto de imágenes PNG
-def extract_text_from_png(png_path):
-    file_name = os.path.splitext(os.path.basename(png_path))[0]
-    image = Image.open(png_path)
-    
-    # Mejorar la imagen antes del OCR
-    enhanced_image = preprocess_image(image)
-    
-    # Extraer texto usando Tesseract
-    text = pytesseract.image_to_string(enhanced_image)
-    txt_filename = os.path.join(output_folder, f"{file_name}.txt")
-    with open(txt_filename, 'w', encoding='utf-8') as f:
-        f.write(text)
-    
-    show_success_message(png_path)  # Mostrar mensaje de éxito después de procesar PNG
-
-# Función para extraer texto de PDFs
-def extract_text_from_pdf(pdf_path):
-    file_name = os.path.splitext(os.path.basename(pdf_path))[0]
-    pages = convert_from_path(pdf_path, 300)
-    
-    progress_text.delete(1.0, "end")  # Limpiar texto previo
-    progress_text.insert("end", f"Procesando archivo: {file_name}\n")
-    progress_text.insert("end", f"Total de páginas: {len(pages)}\n")
-    
-    progress_bar["value"] = 0
-    progress_bar["maximum"] = len(pages)
-    progress_bar.pack(pady=10)
-    progress_text.pack(pady=10)
-    root.update_idletasks()
+# Función que arma las páginas del archivo para la cola de trabajos (el OCR corre en un hilo de fondo)
+def procesar_archivo(file_path):
+    total, imagenes = imagenes_de_archivo(file_path, 300)
+    return total, paginas_ocr(imagenes)
 
-    for page_num, page in enumerate(pages):
+def paginas_ocr(imagenes):
+    for page_num, page in imagenes:
         # Mejorar la imagen antes del OCR
         enhanced_page = preprocess_image(page)
-        
-        # Extraer texto usando Tesseract
-        text = pytesseract.image_to_string(enhanced_page)
-        txt_filename = os.path.join(output_folder, f"{file_name}_pagina_{page_num + 1}.txt")
-        with open(txt_filename, 'w', encoding='utf-8') as f:
-            f.write(text)
-        
-        progress_bar["value"] = page_num + 1
-        root.update_idletasks()
-        
-        progress_text.insert("end", f"Página {page_num + 1} procesada\n")
-        progress_text.yview_scroll(1, "units")
-
-    show_success_message(pdf_path)  # Mostrar mensaje de éxito después de procesar PDF
-
-# Función para manejar archivos arrastrados y soltados
-def on_drop(event):
-    file_path = event.data
-    # Verificar si el archivo es PDF o PNG
-    if file_path.endswith('.pdf'):
-        extract_text_from_pdf(file_path)
-    elif file_path.endswith('.png'):
-        extract_text_from_png(file_path)
-    else:
-        messagebox.showwarning("Tipo de archivo no soportado", "Por favor, arrastre archivos PDF o PNG.")
-
-# Función para mostrar el mensaje de éxito con el botón de abrir carpeta
-def show_success_message(file_path):
-    file_name = os.path.basename(file_path)
-    result = messagebox.askyesno("Proceso completado", 
-                                f"El archivo '{file_name}' se ha procesado correctamente.\n¿Deseas abrir la carpeta de salida?")
+
+        # Extraer texto usando Tesseract (sin extracción de campos)
+        yield page_num, ocr_tesseract.image_to_string(enhanced_page), {}
+
+# Función para guardar el texto de cada página procesada
+def guardar_texto(file_path, page_num, total, text, datos):
+    file_name = os.path.splitext(os.path.basename(file_path))[0]
+    # Los PDFs llevan el número de página; las imágenes sueltas no tienen índice
+    suffix = f"_pagina_{page_num + 1}" if page_num is not None else ""
+    txt_filename = os.path.join(output_folder, f"{file_name}{suffix}.txt")
+    with open(txt_filename, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+# Función para mostrar el resumen del lote con el botón de abrir carpeta
+def show_success_message(resumen):
+    result = messagebox.askyesno("Proceso completado", f"{resumen}\n¿Deseas abrir la carpeta de salida?")
     if result:
         open_output_folder()
 
@@ -110,34 +70,31 @@ def open_output_folder():
 
 # Función para cargar archivos PDF
 def load_files_pdf():
-    file_paths = filedialog.askopenfilenames(filetypes=[("Archivos PDF", "*.pdf")])
-    if file_paths:
-        for pdf_path in file_paths:
-            extract_text_from_pdf(pdf_path)
+    vista.encolar(filedialog.askopenfilenames(filetypes=[("Archivos PDF", "*.pdf")]))
 
 # Función para cargar archivos PNG
 def load_files_png():
-    file_paths = filedialog.askopenfilenames(filetypes=[("Archivos PNG", "*.png")])
-    if file_paths:
-        for png_path in file_paths:
-            extract_text_from_png(png_path)
+    vista.encolar(filedialog.askopenfilenames(filetypes=[("Archivos PNG", "*.png")]))
 
 ############
 # INTERFAZ #
 ############
 
+# El OCR corre en hilos de fondo: la ventana sigue respondiendo y se puede cancelar
+trabajos = ColaTrabajos(procesar=procesar_archivo)
+
 # Configuración de la interfaz gráfica
 root = TkinterDnD.Tk()  # Usamos TkinterDnD.Tk directamente
 root.title("DatacenterTDF | Extractor de Texto OCR")
-root.geometry("500x350")  # Definir tamaño de ventana
+root.geometry("600x480")  # Definir tamaño de ventana
 
 # Obtener las dimensiones de la pantalla
 screen_width = root.winfo_screenwidth()
 screen_height = root.winfo_screenheight()
 
 # Establecer el tamaño de la ventana
-window_width = 500
-window_height = 350
+window_width = 600
+window_height = 480
 
 # Calcular la posición de la ventana para que se abra centrada
 position_top = int((screen_height / 2) - (window_height / 2))
@@ -170,15 +127,17 @@ png_button.grid(row=0, column=1, padx=10, pady=10)
 output_button = ttk.Button(frame, text="Abrir carpeta de salida", bootstyle="light", command=open_output_folder)
 output_button.grid(row=0, column=2, padx=10, pady=10)
 
-# Crear una barra de progreso
-progress_bar = ttk.Progressbar(root, length=400, mode='determinate')
+# Botón para cortar el archivo en curso y vaciar la cola
+cancel_button = ttk.Button(frame, text="Cancelar", bootstyle="danger", command=trabajos.cancelar)
+cancel_button.grid(row=0, column=3, padx=10, pady=10)
 
-# Crear un widget Text para mostrar el progreso
-progress_text = Text(root, height=6, width=50)
+# Barra de progreso, estado y avance por archivo
+vista = VistaLote(root, trabajos, al_pagina=guardar_texto, al_terminar=show_success_message,
+                  alto_tabla=6, ancho_archivo=220)
 
 # Registrar la ventana para aceptar archivos arrastrados
 root.drop_target_register(DND_FILES)
-root.dnd_bind('<<Drop>>', on_drop)
+root.dnd_bind('<<Drop>>', vista.encolar_soltados)
 
 # Iniciar la interfaz gráfica
 root.mainloop()
\ No newline at end of file
@@ -1,15 +1,11 @@
 import os
 import json
 import re
-import requests
-import cv2
-import numpy as np
-from tkinter import Label, Frame, filedialog, messagebox, Text, Scrollbar, RIGHT, Y
+from tkinter import Label, Frame, filedialog, Text, Scrollbar, RIGHT, Y
 from tkinterdnd2 import TkinterDnD, DND_FILES
-from PIL import Image
-from pdf2image import convert_from_path
+from ocr_motores import motor_cargado, paddle_ocr_image, precalentar
+from ocr_trabajos import ColaTrabajos, VistaLote, imagenes_de_archivo
 import ttkbootstrap as ttk
-from paddleocr import PaddleOCR
 
 # ======================
 # OLLAMA CONFIG
@@ -36,11 +32,8 @@ Text:
 # ======================
 # OCR CONFIG (PaddleOCR)
 # ======================
-
-ocr = PaddleOCR(
-    lang="es",
-    use_textline_orientation=True
-)
+# PaddleOCR (lang="es", con orientacion de linea) se carga en ocr_motores: en segundo
+# plano una vez que la ventana esta visible, o en el primer uso
 
 # ======================
 # PATHS
@@ -56,16 +49,9 @@ if not os.path.exists(output_folder):
 # OCR FUNCTIONS
 # ======================
 
-def paddle_ocr_image(pil_image):
-    img = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-    result = ocr.ocr(img)
-
-    lines = []
-    for block in result:
-        for line in block:
-            lines.append(line[1][0])
-
-    return "\n".join(lines)
+def avisar_carga():
+    if not motor_cargado("paddle"):
+        result_text.insert("end", "Cargando PaddleOCR...\n")
 
 # ======================
 # LLM FUNCTIONS
@@ -84,6 +70,8 @@ def clean_json_from_llm(text):
     return match.group(0)
 
 def extract_fields_with_llm(ocr_text):
+    import requests
+
     payload = {
         "model": OLLAMA_MODEL,
         "prompt": PROMPT_TEMPLATE.format(ocr_text=ocr_text),
@@ -109,53 +97,53 @@ def append_result(title, data):
 # ======================
 # FILE HANDLERS
 # ======================
+# OCR + LLM corren en un hilo de la cola de trabajos; la ventana solo muestra resultados
 
-def extract_text_from_png(png_path):
-    image = Image.open(png_path)
-    text = paddle_ocr_image(image)
+def procesar_archivo(path):
+    total, imagenes = imagenes_de_archivo(path, 300)
+    return total, paginas_ocr(imagenes)
 
-    data = extract_fields_with_llm(text)
-    append_result(os.path.basename(png_path), data)
+def paginas_ocr(imagenes):
+    for idx, page in imagenes:
+        ocr_text = paddle_ocr_image(page)
+        yield idx, ocr_text, extract_fields_with_llm(ocr_text)
 
-def extract_text_from_pdf(pdf_path):
-    pages = convert_from_path(pdf_path, 300)
+def mostrar_pagina(path, idx, total, ocr_text, data):
+    title = os.path.basename(path) if idx is None else f"{os.path.basename(path)} - Página {idx + 1}"
+    append_result(title, data)
 
-    for idx, page in enumerate(pages):
-        ocr_text = paddle_ocr_image(page)
-        data = extract_fields_with_llm(ocr_text)
-        append_result(f"{os.path.basename(pdf_path)} - Página {idx + 1}", data)
+def mostrar_resumen(resumen):
+    result_text.insert("end", f"\n--- Lote terminado ---\n{resumen}\n")
+    result_text.yview_moveto(1)
 
 # ======================
 # UI CALLBACKS
 # ======================
 
-def on_drop(event):
-    path = event.data.strip("{}")
+def process_files(paths):
+    avisar_carga()
+    vista.encolar(paths)
 
-    if path.lower().endswith(".pdf"):
-        extract_text_from_pdf(path)
-    elif path.lower().endswith(".png"):
-        extract_text_from_png(path)
-    else:
-        messagebox.showwarning("Archivo no soportado", "Solo PDF o PNG")
+def on_drop(event):
+    # tkdnd manda una lista Tcl: rutas separadas por espacios, entre llaves si tienen espacios
+    process_files(root.tk.splitlist(event.data))
 
 def load_files_pdf():
-    paths = filedialog.askopenfilenames(filetypes=[("PDF", "*.pdf")])
-    for p in paths:
-        extract_text_from_pdf(p)
+    process_files(filedialog.askopenfilenames(filetypes=[("PDF", "*.pdf")]))
 
 def load_files_png():
-    paths = filedialog.askopenfilenames(filetypes=[("PNG", "*.png")])
-    for p in paths:
-        extract_text_from_png(p)
+    process_files(filedialog.askopenfilenames(filetypes=[("PNG", "*.png")]))
 
 # ======================
 # UI
 # ======================
 
+# PaddleOCR en un solo hilo de fondo: la ventana responde y el lote se puede cancelar
+trabajos = ColaTrabajos(procesar=procesar_archivo, hilos=1)
+
 root = TkinterDnD.Tk()
 root.title("DatacenterTDF | OCR Facturas")
-root.geometry("700x500")
+root.geometry("700x640")
 
 style = ttk.Style()
 style.theme_use("superhero")
@@ -173,6 +161,10 @@ frame.pack()
 
 ttk.Button(frame, text="Cargar PDFs", bootstyle="success", command=load_files_pdf).grid(row=0, column=0, padx=5)
 ttk.Button(frame, text="Cargar PNGs", bootstyle="info", command=load_files_png).grid(row=0, column=1, padx=5)
+ttk.Button(frame, text="Cancelar", bootstyle="danger", command=trabajos.cancelar).grid(row=0, column=2, padx=5)
+
+# Barra de progreso, estado y avance por archivo; los errores se listan al terminar el lote
+vista = VistaLote(root, trabajos, al_pagina=mostrar_pagina, al_terminar=mostrar_resumen, alto_tabla=4)
 
 # Result box with scrollbar
 result_frame = Frame(root)
@@ -189,4 +181,7 @@ scrollbar.config(command=result_text.yview)
 root.drop_target_register(DND_FILES)
 root.dnd_bind("<<Drop>>", on_drop)
 
+# Con la ventana ya dibujada, PaddleOCR se carga en segundo plano
+root.after(200, precalentar, "paddle")
+
 root.mainloop()
@@ -0,0 +1,255 @@
+import os
+import queue
+import threading
+from ocr_paralelo import expandir_entradas, procesar_en_paralelo, tareas_de_archivos
+from ocr_pipeline import guardar_resultado
+
+# --- Cola de trabajos para las ventanas ---
+# El OCR corre en hilos de fondo; la ventana sigue respondiendo y puede seguir
+# recibiendo archivos. Los resultados vuelven como eventos que la UI lee con
+# root.after (Tk no se puede tocar desde otro hilo):
+#   ("inicio", ruta, total_paginas)
+#   ("pagina", ruta, indice, total_paginas, texto, datos)
+#   ("fin", ruta)
+#   ("cancelado", ruta)
+#   ("error", ruta, mensaje)
+#   ("vacia", None)            la cola quedo sin trabajos (fin del lote)
+# Varios archivos se procesan a la vez: cada hilo alimenta el mismo pool de
+# paginas, asi un PDF de una pagina no espera a que termine uno de cincuenta.
+# Las ventanas con su propio OCR (PaddleOCR, TrOCR, Tesseract directo) pasan
+# `procesar(ruta) -> (total_paginas, paginas)`, con paginas (indice, texto, datos)
+# que se generan en el hilo de trabajo.
+
+# Archivos en curso al mismo tiempo
+ARCHIVOS_EN_PARALELO = int(os.environ.get("OCR_ARCHIVOS_EN_PARALELO", "3"))
+
+
+class ColaTrabajos:
+    def __init__(self, extractor="factura", cache=None, dpi=300, motor="tesseract",
+                 hilos=ARCHIVOS_EN_PARALELO, plantilla=None, procesar=None):
+        self.procesar = procesar or self._paginas_pipeline
+        self.extractor = extractor
+        self.cache = cache
+        self.dpi = dpi
+        self.motor = motor
+        self.plantilla = plantilla
+        self.trabajos = queue.Queue()
+        self.eventos = queue.Queue()
+        # Cancelar sube la generacion: se descartan el trabajo actual y los encolados antes
+        self._generacion = 0
+        self._lock = threading.Lock()
+        # Trabajos agregados que todavia no terminaron (en cola o en curso)
+        self._sin_terminar = 0
+        self._hilos = [threading.Thread(target=self._trabajar, daemon=True) for _ in range(max(1, hilos))]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def agregar(self, ruta):
+        with self._lock:
+            self._sin_terminar += 1
+            self.trabajos.put((self._generacion, ruta))
+
+    def cancelar(self):
+        """Corta el archivo en curso y vacia la cola."""
+        with self._lock:
+            self._generacion += 1
+
+    def pendientes(self):
+        """Trabajos que esperan en cola (sin contar el que se esta procesando)."""
+        return self.trabajos.qsize()
+
+    def eventos_nuevos(self):
+        """Eventos acumulados desde la ultima consulta, sin bloquear."""
+        nuevos = []
+        while True:
+            try:
+                nuevos.append(self.eventos.get_nowait())
+            except queue.Empty:
+                return nuevos
+
+    def _cancelado(self, generacion):
+        return generacion != self._generacion
+
+    def _trabajar(self):
+        while True:
+            generacion, ruta = self.trabajos.get()
+            try:
+                if self._cancelado(generacion):
+                    self.eventos.put(("cancelado", ruta))
+                else:
+                    self._procesar(generacion, ruta)
+            except Exception as exc:
+                self.eventos.put(("error", ruta, str(exc)))
+            with self._lock:
+                self._sin_terminar -= 1
+                if self._sin_terminar == 0:
+                    self.eventos.put(("vacia", None))
+
+    def _procesar(self, generacion, ruta):
+        total, paginas = self.procesar(ruta)
+        self.eventos.put(("inicio", ruta, total))
+        try:
+            for indice, texto, datos in paginas:
+                if self._cancelado(generacion):
+                    self.eventos.put(("cancelado", ruta))
+                    return
+                self.eventos.put(("pagina", ruta, indice, total, texto, datos))
+        finally:
+            # Cierra el generador: cancela en el pool las paginas que no llegaron a empezar
+            cerrar = getattr(paginas, "close", None)
+            if cerrar is not None:
+                cerrar()
+        self.eventos.put(("fin", ruta))
+
+    def _paginas_pipeline(self, ruta):
+        tareas = tareas_de_archivos([ruta])
+        return len(tareas), self._resultados(tareas)
+
+    def _resultados(self, tareas):
+        resultados = procesar_en_paralelo(tareas, self.extractor, self.dpi, motor=self.motor,
+                                          cache=self.cache, plantilla=self.plantilla)
+        try:
+            for _, indice, texto, datos in resultados:
+                yield indice, texto, datos
+        finally:
+            resultados.close()
+
+
+def imagenes_de_archivo(ruta, dpi=300):
+    """(total_paginas, paginas (indice, imagen PIL)) de un PDF o de una imagen suelta.
+
+    Para las ventanas con OCR propio; las paginas del PDF se renderizan de a una.
+    """
+    from PIL import Image
+    from ocr_render import contar_paginas
+    if ruta.lower().endswith(".pdf"):
+        return contar_paginas(ruta), _paginas_pdf(ruta, dpi)
+    return 1, iter([(None, Image.open(ruta))])
+
+
+def _paginas_pdf(ruta, dpi):
+    from ocr_render import iterar_paginas
+    paginas = iterar_paginas(ruta, dpi)
+    try:
+        yield from enumerate(paginas)
+    finally:
+        # Cancelado a mitad del PDF: se detiene el render por delante
+        paginas.close()
+
+
+# --- Avance del lote en la ventana ---
+# Barra de progreso, estado y tabla por archivo, comunes a las ventanas que usan la
+# cola. Tk se importa al crear la vista: este modulo no exige ventana.
+
+class VistaLote:
+    """Widgets y eventos de una ColaTrabajos dentro de la ventana `root`.
+
+    Cada pagina terminada se guarda en `carpeta` con guardar_resultado (si hay
+    carpeta) y se pasa a `al_pagina(ruta, indice, total, texto, datos)`. Al vaciarse
+    la cola se llama una vez a `al_terminar(resumen)` con el resumen del lote.
+    Los widgets se empaquetan en `root` en el orden en que se crea la vista.
+    """
+
+    def __init__(self, root, trabajos, carpeta=None, al_pagina=None, al_terminar=None,
+                 largo_barra=400, alto_tabla=8, ancho_archivo=300):
+        import ttkbootstrap as ttk
+        from tkinter import Label, END
+        self._fin = END
+        self.root = root
+        self.trabajos = trabajos
+        self.carpeta = carpeta
+        self.al_pagina = al_pagina
+        self.al_terminar = al_terminar
+        self.reiniciar_lote()
+
+        self.barra = ttk.Progressbar(root, length=largo_barra, mode="determinate")
+        self.barra.pack(pady=(15, 5))
+        self.estado = Label(root, text="", font=("Segoe UI", 9), bg="#343a40", fg="white")
+        self.estado.pack()
+        self.tabla = ttk.Treeview(root, columns=("paginas", "estado"), height=alto_tabla)
+        self.tabla.heading("#0", text="Archivo")
+        self.tabla.heading("paginas", text="Páginas")
+        self.tabla.heading("estado", text="Estado")
+        self.tabla.column("#0", width=ancho_archivo)
+        self.tabla.column("paginas", width=70, anchor="center")
+        self.tabla.column("estado", width=160)
+        self.tabla.pack(padx=20, pady=5, fill="x")
+        # Los resultados de los hilos de trabajo se leen desde el loop de Tk
+        root.after(100, self.revisar_eventos)
+
+    def encolar(self, rutas):
+        """Agrega archivos y carpetas a la cola; el OCR corre en segundo plano."""
+        for ruta in expandir_entradas(rutas):
+            # Un archivo que ya esta en cola o en curso no se vuelve a agregar
+            if self.tabla.exists(ruta) and self.tabla.set(ruta, "estado") in ("En cola", "Procesando"):
+                continue
+            if self.tabla.exists(ruta):
+                self.tabla.item(ruta, values=("-", "En cola"))
+            else:
+                self.tabla.insert("", self._fin, iid=ruta, text=os.path.basename(ruta), values=("-", "En cola"))
+            self.trabajos.agregar(ruta)
+        self.actualizar_estado()
+
+    def encolar_soltados(self, event):
+        """Handler de <<Drop>>: tkdnd manda una lista Tcl (entre llaves las rutas con espacios)."""
+        self.encolar(self.root.tk.splitlist(event.data))
+
+    def cancelar(self):
+        self.trabajos.cancelar()
+
+    def actualizar_estado(self):
+        self.estado.config(text=f"En cola: {self.trabajos.pendientes()}  |  "
+                                f"Páginas: {self.lote['hechas']}/{self.lote['paginas']}")
+
+    def reiniciar_lote(self):
+        self.lote = {"listos": 0, "errores": [], "cancelados": 0, "paginas": 0, "hechas": 0}
+
+    def resumen_lote(self):
+        resumen = f"Archivos procesados: {self.lote['listos']}"
+        if self.lote["errores"]:
+            resumen += f"\nCon error: {len(self.lote['errores'])}\n" + "\n".join(
+                f"  - {os.path.basename(ruta)}: {mensaje}" for ruta, mensaje in self.lote["errores"])
+        if self.lote["cancelados"]:
+            resumen += f"\nCancelados: {self.lote['cancelados']}"
+        return resumen
+
+    def revisar_eventos(self):
+        """Lee los resultados de los hilos de trabajo y actualiza la ventana."""
+        for evento in self.trabajos.eventos_nuevos():
+            tipo, ruta = evento[0], evento[1]
+            if tipo == "inicio":
+                self.lote["paginas"] += evento[2]
+                self.barra["maximum"] = self.lote["paginas"]
+                self.tabla.item(ruta, values=(f"0/{evento[2]}", "Procesando"))
+            elif tipo == "pagina":
+                _, _, indice, total, texto, datos = evento
+                try:
+                    if self.carpeta is not None:
+                        guardar_resultado(ruta, texto, datos, self.carpeta, f"_pag_{indice+1}" if total > 1 else "")
+                    if self.al_pagina is not None:
+                        self.al_pagina(ruta, indice, total, texto, datos)
+                except OSError as exc:
+                    # No se pudo escribir la salida: se informa en el resumen y se sigue
+                    self.lote["errores"].append((ruta, str(exc)))
+                # Las imagenes sueltas no tienen indice de pagina
+                self.tabla.set(ruta, "paginas", f"{(indice or 0) + 1}/{total}")
+                self.lote["hechas"] += 1
+                self.barra["value"] = self.lote["hechas"]
+            elif tipo == "fin":
+                self.tabla.set(ruta, "estado", "Listo")
+                self.lote["listos"] += 1
+            elif tipo == "cancelado":
+                self.tabla.set(ruta, "estado", "Cancelado")
+                self.lote["cancelados"] += 1
+            elif tipo == "error":
+                self.tabla.set(ruta, "estado", f"Error: {evento[2]}")
+                self.lote["errores"].append((ruta, evento[2]))
+            elif tipo == "vacia":
+                # Un solo aviso al terminar todo lo encolado, no uno por archivo
+                resumen = self.resumen_lote()
+                self.reiniciar_lote()
+                self.barra["value"] = 0
+                if self.al_terminar is not None:
+                    self.al_terminar(resumen)
+        self.actualizar_estado()
+        self.root.after(100, self.revisar_eventos)
@@ -0,0 +1,278 @@
+import hashlib
+import io
+import json
+import os
+import re
+from collections import namedtuple
+import cv2
+import numpy as np
+from ocr_clasificador import TIPO_DESCONOCIDO, TIPOS
+
+# --- Clasificacion visual (sin OCR) ---
+# Una miniatura enderezada de la pagina se compara con las referencias de
+# facturas/: primero por dHash (distancia de Hamming, microsegundos) para elegir
+# unas pocas candidatas y despues por puntos ORB contra esas candidatas. La
+# transformacion estimada entre referencia y escaneo da la alineacion con la que
+# se ubican las regiones de la plantilla sobre el escaneo.
+#
+# El indice (hashes, puntos y descriptores de cada referencia) se guarda en
+# disco y se reconstruye solo si cambian los archivos de referencia.
+
+ANCHO_MINIATURA = 480      # px; las miniaturas se normalizan a este ancho
+LADO_HASH = 16             # dHash de 16x16 = 256 bits
+CANDIDATOS = 4             # referencias mas cercanas por hash que se comparan con ORB
+PUNTOS_ORB = 300
+MIN_INLIERS = 30           # coincidencias geometricas minimas para aceptar una referencia
+TOLERANCIA_RANSAC = 3.0    # px sobre la miniatura
+ESCALA_MIN, ESCALA_MAX = 0.75, 1.33
+GIRO_MAX = 2.0             # grados; las miniaturas ya estan enderezadas
+VERSION_INDICE = "3"
+
+# Prefijo del nombre de archivo -> tipo; el nombre manda sobre la clasificacion por texto
+_ALIAS_ARCHIVO = {"DTe": "DT-e", "Factura B-C": "Factura B"}
+
+# Transformacion de coordenadas relativas referencia -> escaneo: x' = escala_x * x + dx
+Alineacion = namedtuple("Alineacion", "escala_x escala_y dx dy")
+
+
+def contenido(gray):
+    """Recorte de la miniatura a la zona con tinta (sin margenes ni manchas sueltas)."""
+    ys, xs = np.nonzero(gray < 128)
+    if len(ys) < 100:
+        return gray
+    y0, y1 = np.percentile(ys, [0.5, 99.5]).astype(int)
+    x0, x1 = np.percentile(xs, [0.5, 99.5]).astype(int)
+    return gray[y0:y1 + 1, x0:x1 + 1]
+
+
+def dhash(gray):
+    """Hash perceptual por diferencias horizontales (LADO_HASH x LADO_HASH bits, empaquetado).
+
+    Se calcula sobre la zona con tinta para que un escaneo corrido o reducido
+    quede cerca de su referencia.
+    """
+    chica = cv2.resize(contenido(gray), (LADO_HASH + 1, LADO_HASH), interpolation=cv2.INTER_AREA)
+    return np.packbits(chica[:, 1:] > chica[:, :-1])
+
+
+def puntos_orb(gray):
+    """(puntos (n, 2) float32, descriptores (n, 32) uint8) de la miniatura."""
+    orb = cv2.ORB_create(PUNTOS_ORB)
+    keypoints, descriptores = orb.detectAndCompute(gray, None)
+    if descriptores is None:
+        return np.empty((0, 2), np.float32), np.empty((0, 32), np.uint8)
+    return np.float32([k.pt for k in keypoints]), descriptores
+
+
+def tipo_por_nombre(ruta):
+    """Tipo segun el nombre del archivo de referencia ("Remito R - Ejemplo 1.pdf" -> "Remito R")."""
+    prefijo = os.path.basename(ruta).split(" - ")[0].strip()
+    return _ALIAS_ARCHIVO.get(prefijo, prefijo)
+
+
+def _clave(rutas):
+    firma = [(os.path.basename(r), os.path.getsize(r), int(os.path.getmtime(r))) for r in rutas]
+    return json.dumps([VERSION_INDICE, ANCHO_MINIATURA, PUNTOS_ORB, firma])
+
+
+class IndiceVisual:
+    """Referencias de layout conocidas, con su tipo, dHash y puntos ORB."""
+
+    def __init__(self, tipos, formas, hashes, puntos, descriptores):
+        self.tipos = tipos
+        self.formas = formas                # (alto, ancho) de cada miniatura
+        self.hashes = hashes                # (n, LADO_HASH**2 / 8) uint8
+        self.puntos = puntos                # lista de (m, 2) float32
+        self.descriptores = descriptores    # lista de (m, 32) uint8
+
+    @classmethod
+    def construir(cls, rutas, miniatura, etiquetar):
+        """Indexa la primera pagina de cada archivo.
+
+        `miniatura(ruta)` devuelve la miniatura enderezada en grises. El tipo sale
+        del nombre del archivo ("Remito Tabacalero - ejemplo.pdf"); si el nombre no
+        es un tipo conocido, de `etiquetar(ruta)` (clasificacion por texto, que
+        puede confundir variantes). Los archivos identicos se indexan una vez.
+        """
+        tipos, formas, hashes, puntos, descriptores = [], [], [], [], []
+        vistos = set()
+        for ruta in rutas:
+            with open(ruta, "rb") as f:
+                contenido = hashlib.md5(f.read()).hexdigest()
+            if contenido in vistos:
+                continue
+            vistos.add(contenido)
+            tipo = tipo_por_nombre(ruta)
+            if tipo not in TIPOS:
+                tipo = etiquetar(ruta)
+            if tipo not in TIPOS or tipo == TIPO_DESCONOCIDO:
+                continue
+            gray = miniatura(ruta)
+            pts, des = puntos_orb(gray)
+            tipos.append(tipo)
+            formas.append(gray.shape[:2])
+            hashes.append(dhash(gray))
+            puntos.append(pts)
+            descriptores.append(des)
+        hashes = np.array(hashes, np.uint8).reshape(len(tipos), -1)
+        return cls(tipos, formas, hashes, puntos, descriptores)
+
+    @classmethod
+    def cargar(cls, carpeta, ruta_indice, miniatura, etiquetar):
+        """Indice de `carpeta`, desde `ruta_indice` si sigue vigente o reconstruido."""
+        from ocr_paralelo import expandir_entradas  # importa ocr_pipeline, que usa este modulo
+        rutas = sorted(expandir_entradas([carpeta])) if os.path.isdir(carpeta) else []
+        clave = _clave(rutas)
+        if os.path.exists(ruta_indice):
+            with np.load(ruta_indice, allow_pickle=False) as datos:
+                if str(datos["clave"]) == clave:
+                    return cls._desde_arrays(datos)
+        indice = cls.construir(rutas, miniatura, etiquetar)
+        indice.guardar(ruta_indice, clave)
+        return indice
+
+    @classmethod
+    def _desde_arrays(cls, datos):
+        cortes = datos["cortes"]
+        puntos = [datos["puntos"][a:b] for a, b in zip(cortes[:-1], cortes[1:])]
+        descriptores = [datos["descriptores"][a:b] for a, b in zip(cortes[:-1], cortes[1:])]
+        formas = [tuple(f) for f in datos["formas"]]
+        return cls(list(datos["tipos"]), formas, datos["hashes"], puntos, descriptores)
+
+    def guardar(self, ruta_indice, clave):
+        cortes = np.cumsum([0] + [len(p) for p in self.puntos])
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, clave=clave, tipos=np.array(self.tipos, dtype=str),
+            formas=np.array(self.formas, np.int32).reshape(-1, 2), hashes=self.hashes, cortes=cortes,
+            puntos=np.concatenate(self.puntos) if self.puntos else np.empty((0, 2), np.float32),
+            descriptores=np.concatenate(self.descriptores) if self.descriptores else np.empty((0, 32), np.uint8))
+        # Escritura atomica: varios procesos pueden reconstruir el indice a la vez
+        os.makedirs(os.path.dirname(ruta_indice), exist_ok=True)
+        temporal = f"{ruta_indice}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temporal, ruta_indice)
+
+    def clasificar(self, gray):
+        """(tipo, Alineacion) de la referencia que coincide con la miniatura, o None."""
+        if not self.tipos:
+            return None
+        distancias = np.unpackbits(self.hashes ^ dhash(gray), axis=1).sum(axis=1)
+        pts, des = puntos_orb(gray)
+        if len(des) < MIN_INLIERS:
+            return None
+
+        # Las candidatas van de la mas parecida por hash a la menos: la primera que
+        # coincide geometricamente decide (las que no coinciden dan un punado de inliers)
+        matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        for i in np.argsort(distancias, kind="stable")[:CANDIDATOS]:
+            if len(self.descriptores[i]) < MIN_INLIERS:
+                continue
+            coincidencias = matcher.match(self.descriptores[i], des)
+            if len(coincidencias) < MIN_INLIERS:
+                continue
+            origen = self.puntos[i][[c.queryIdx for c in coincidencias]]
+            destino = pts[[c.trainIdx for c in coincidencias]]
+            matriz, inliers = cv2.estimateAffinePartial2D(origen, destino, method=cv2.RANSAC,
+                                                          ransacReprojThreshold=TOLERANCIA_RANSAC)
+            if matriz is None or inliers.sum() < MIN_INLIERS:
+                continue
+            escala = float(np.hypot(matriz[0, 0], matriz[1, 0]))
+            giro = abs(np.degrees(np.arctan2(matriz[1, 0], matriz[0, 0])))
+            if not (ESCALA_MIN <= escala <= ESCALA_MAX and giro <= GIRO_MAX):
+                continue
+            # De pixeles de miniatura a coordenadas relativas de cada pagina
+            alto_ref, ancho_ref = self.formas[i]
+            alto, ancho = gray.shape[:2]
+            alineacion = Alineacion(float(escala * ancho_ref / ancho), float(escala * alto_ref / alto),
+                                    float(matriz[0, 2] / ancho), float(matriz[1, 2] / alto))
+            return str(self.tipos[i]), alineacion
+        return None
+
+
+# --- Paginas en blanco y copias ---
+# Los comprobantes suelen venir en el mismo PDF como ORIGINAL, DUPLICADO y
+# TRIPLICADO, y los escaneos traen hojas en blanco de separacion. Antes de OCRear
+# cada pagina se compara con las anteriores del mismo documento: por densidad de
+# tinta (en blanco) y por dHash; los candidatos por hash se confirman pixel a
+# pixel, porque dos comprobantes distintos del mismo emisor tienen hashes casi
+# iguales. Entre dos copias solo cambia la leyenda de la copia.
+
+DPI_HUELLA = 100              # resolucion de las paginas que se comparan
+CONTRASTE_TINTA = 60          # tinta: mas oscura que la mediana (el papel) en al menos esto
+DENSIDAD_BLANCA = 0.002       # fraccion de tinta por debajo de la cual la pagina esta en blanco
+DISTANCIA_COPIA = 32          # bits de dHash (de 256) para considerar dos paginas candidatas
+MAX_ZONAS_COPIA = 2           # zonas distintas toleradas entre copias (leyenda, sello)
+MAX_DIFERENCIA_COPIA = 0.005  # fraccion de la pagina que puede diferir entre copias
+
+_LEYENDA_COPIA = re.compile(r"\b(?:ORIGINAL|DUPLICADO|TRIPLICADO|CUADRUPLICADO)\b", re.IGNORECASE)
+
+
+def densidad_tinta(gray):
+    """Fraccion de pixeles con tinta, relativa al tono del papel (escaneos grises o amarillentos)."""
+    return float(np.mean(gray < np.median(gray) - CONTRASTE_TINTA))
+
+
+def texto_sin_copia(texto):
+    """Texto sin la leyenda de la copia ni diferencias de espacios, para comparar copias."""
+    return " ".join(_LEYENDA_COPIA.sub(" ", texto).split())
+
+
+def zonas_distintas(a, b):
+    """Zonas (en pixeles de area) donde difiere la tinta de dos paginas, ya alineadas entre si.
+
+    El corrimiento entre escaneos se corrige por correlacion de fase; un trazo
+    corrido un pixel no cuenta como diferencia.
+    """
+    alto, ancho = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+    a, b = a[:alto, :ancho], b[:alto, :ancho]
+    (dx, dy), _ = cv2.phaseCorrelate(a.astype(np.float32), b.astype(np.float32))
+    b = cv2.warpAffine(b, np.float32([[1, 0, -dx], [0, 1, -dy]]), (ancho, alto), borderValue=255)
+    tinta_a, tinta_b = (a < 128).astype(np.uint8), (b < 128).astype(np.uint8)
+    vecindad = np.ones((3, 3), np.uint8)
+    diferencia = (tinta_a & ~cv2.dilate(tinta_b, vecindad) & 1) | (tinta_b & ~cv2.dilate(tinta_a, vecindad) & 1)
+    diferencia = cv2.morphologyEx(diferencia, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    # Las letras de una misma palabra o renglon se agrupan en una zona
+    grupos = cv2.dilate(diferencia, np.ones((9, 25), np.uint8))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(grupos)
+    return [int(area) for area in stats[1:, cv2.CC_STAT_AREA]]
+
+
+def son_copias(a, b):
+    """True si dos paginas (grises a DPI_HUELLA, enderezadas) son copias del mismo comprobante."""
+    zonas = zonas_distintas(a, b)
+    return len(zonas) <= MAX_ZONAS_COPIA and sum(zonas) <= MAX_DIFERENCIA_COPIA * a.size
+
+
+class DetectorRepetidas:
+    """Paginas ya vistas de un documento, para no OCRear blancas ni copias.
+
+    Las paginas se revisan en orden; cada una se compara con las anteriores
+    que resultaron nuevas. Con capa de texto valida alcanza comparar el texto
+    sin la leyenda de la copia.
+    """
+
+    def __init__(self):
+        self.vistas = []    # (clave, dHash, gris) de las paginas escaneadas nuevas
+        self.textos = {}    # texto sin leyenda -> clave de la pagina nueva
+
+    def revisar(self, clave, gray=None, texto=None):
+        """None si la pagina es nueva; ("blanca", None) o ("copia", clave de la original) si no."""
+        if texto is not None:
+            normalizado = texto_sin_copia(texto)
+            if normalizado in self.textos:
+                return "copia", self.textos[normalizado]
+            self.textos[normalizado] = clave
+            return None
+        if densidad_tinta(gray) < DENSIDAD_BLANCA:
+            return "blanca", None
+        huella = dhash(gray)
+        distancias = [int(np.unpackbits(huella ^ h).sum()) for _, h, _ in self.vistas]
+        for n in np.argsort(distancias, kind="stable"):
+            if distancias[n] > DISTANCIA_COPIA:
+                break
+            if son_copias(self.vistas[n][2], gray):
+                return "copia", self.vistas[n][0]
+        self.vistas.append((clave, huella, gray))
+        return None